@@ -0,0 +1,71 @@
+"""
+Compare memory and lookup cost of the dict alias view with CompactAliasStore.
+
+Usage: python benchmarks/bench_alias_store.py [number_of_aliases]
+"""
+
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from tiny_redirect import data  # noqa: E402
+from tiny_redirect.store import CompactAliasStore  # noqa: E402
+
+
+def make_database(count):
+    """Create a database with count synthetic aliases"""
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    data.database_init(db_path)
+    rng = random.Random(42)
+    connection = sqlite3.connect(db_path)
+    rows = []
+    for index in range(count):
+        alias = f"{''.join(rng.choices(string.ascii_lowercase, k=6))}{index}"
+        target = f"https://intranet.example/{''.join(rng.choices(string.ascii_lowercase, k=24))}"
+        rows.append((alias, target, alias.lower()))
+    connection.executemany("INSERT INTO redirects (alias, redirect, alias_key) VALUES (?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+    return db_path, [row[0] for row in rows]
+
+
+def measure(build):
+    """Return (object, bytes still allocated after build, peak bytes during build)"""
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    db_path, aliases = make_database(count)
+    probes = random.Random(7).sample(aliases, min(10_000, count))
+    try:
+        print(f"{count} aliases")
+        print(f"{'store':<10}{'bytes/alias':>14}{'peak MB':>10}{'lookup ns':>12}")
+        builders = {
+            "dict": lambda: data.load_redirects({"redirects": {}}, db_path)["redirects"],
+            "compact": lambda: CompactAliasStore(data.iter_redirects(db_path)),
+        }
+        for name, build in builders.items():
+            store, current, peak = measure(build)
+            seconds = timeit.timeit(lambda: [store.get(alias) for alias in probes], number=5)
+            lookup_ns = seconds / (5 * len(probes)) * 1e9
+            print(f"{name:<10}{current / count:>14.1f}{peak / 1e6:>10.1f}{lookup_ns:>12.0f}")
+            del store
+    finally:
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
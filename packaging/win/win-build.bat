@@ -6,6 +6,8 @@ pyinstaller --version >nul 2>&1
 
 rem Check the ERRORLEVEL
 if %ERRORLEVEL% equ 0 (
+    rem Precompile the page templates into views\templates.bytecode
+    python "%currentDir%\src\tiny_redirect\templates.py" "%currentDir%\src\tiny_redirect\views"
     pyinstaller --noconfirm --onedir --windowed --icon "%currentDir%\src\tiny_redirect\static\img\icon.ico" --name "TinyRedirect" --add-data "%currentDir%\src\tiny_redirect\static;static/" --add-data "%currentDir%\src\tiny_redirect\views;views/"  "%currentDir%\src\tiny_redirect\app.py"
 ) else (
     echo PyInstaller is NOT callable or recognized.
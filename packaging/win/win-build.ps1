@@ -5,6 +5,8 @@ $currentDir = (Get-Location).Path
 pyinstaller --version *> $null
 
 if ($LASTEXITCODE -eq 0) {
+    # Precompile the page templates into views\templates.bytecode
+    python "$currentDir\src\tiny_redirect\templates.py" "$currentDir\src\tiny_redirect\views"
     pyinstaller `
         --noconfirm `
         --onedir `
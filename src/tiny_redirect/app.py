@@ -1,6 +1,10 @@
 from tiny_redirect import data
+from tiny_redirect.cache import AliasCache, NamespaceCaches
+from tiny_redirect.compress import CompressionPlugin, DEFAULT_GZIP_LEVEL, DEFAULT_MIN_SIZE, DEFAULT_ZSTD_LEVEL
 from tiny_redirect.data import ValidationError, str_to_bool
-from bottle import Bottle, request, redirect, template, static_file, response, TEMPLATE_PATH
+from tiny_redirect.ratelimit import RateLimitPlugin, parse_limits, parse_proxies
+from tiny_redirect.trie import expand_target
+from bottle import Bottle, HTTPResponse, request, redirect, template, static_file, response, TEMPLATE_PATH, html_escape
 from threading import Thread
 from loguru import logger
 import signal
@@ -8,17 +12,22 @@ import time
 import os
 import sys
 import sqlite3
-import webbrowser as wb
 import secrets
+import atexit
 import hashlib
-import requests
 import tempfile
 import subprocess
-import atexit
+
+# webbrowser, pystray and PIL are imported inside the functions that need
+# them so that a plain server start does not pay for them.
 
 # Global variable to store log directory path for crash handler
 _log_dir = None
 
+# Loguru handler ids and levels added by setup_logging, by sink name
+# ("console", "file"), so set_log_level can re-add them at a new level
+_log_handlers = {}
+
 
 def get_log_path():
     """
@@ -61,27 +70,17 @@ def setup_logging(enable_info_logging=False):
 
     # Remove default logger
     logger.remove()
+    _log_handlers.clear()
 
     # Add console logger only if stderr is available (not available in PyInstaller windowed mode)
     if sys.stderr is not None:
-        logger.add(
-            sys.stderr,
-            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-            level="INFO"
-        )
+        _add_log_handler("console", "INFO")
 
     # Determine file log level based on flag
     file_log_level = "DEBUG" if enable_info_logging else "WARNING"
 
     # Add file logger with rotation
-    logger.add(
-        log_file,
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level=file_log_level,
-        rotation="10 MB",
-        retention="7 days",
-        compression="zip"
-    )
+    _add_log_handler("file", file_log_level)
 
     if enable_info_logging:
         logger.info(f"Logging initialized with INFO level enabled. Log file: {log_file}")
@@ -91,6 +90,44 @@ def setup_logging(enable_info_logging=False):
     return log_file
 
 
+def _add_log_handler(sink, level):
+    """Add the console or file handler at level, replacing any previous one"""
+    previous = _log_handlers.get(sink)
+    if previous is not None:
+        logger.remove(previous[0])
+    if sink == "console":
+        handler_id = logger.add(
+            sys.stderr,
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+            level=level
+        )
+    else:
+        handler_id = logger.add(
+            get_log_path(),
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
+            level=level,
+            rotation="10 MB",
+            retention="7 days",
+            compression="zip"
+        )
+    # The level setup_logging chose is kept so an empty level can restore it
+    default_level = previous[2] if previous is not None else level
+    _log_handlers[sink] = (handler_id, level, default_level)
+
+
+def set_log_level(level):
+    """
+    Change the level of the handlers added by setup_logging while running
+
+    An empty level restores the levels picked at startup (see --info).
+    Does nothing before setup_logging has run.
+    """
+    for sink, (_, current, default_level) in list(_log_handlers.items()):
+        new_level = level or default_level
+        if new_level != current:
+            _add_log_handler(sink, new_level)
+
+
 def open_log_folder_on_crash():
     """Open the log folder when the app crashes (Windows only)."""
     global _log_dir
@@ -136,9 +173,91 @@ csrf_tokens = {}
 tray_icon = None
 server_url = None
 
+# Bearer token for the JSON API; the API is disabled when unset
+api_token = os.environ.get("TINYREDIRECT_API_TOKEN")
+
+# Largest JSON body accepted by the API (bytes)
+API_MAX_BODY = 16 * 1024 * 1024
+
+# Not-found page rendered once around NOALIAS_MARKER, see noalias_page
+NOALIAS_MARKER = "__tinyredirect_alias__"
+noalias_parts = None
+
+# Opt-in per-client token buckets per route class ("redirect", "admin",
+# "import"), e.g. TINYREDIRECT_RATE_LIMITS="redirect=100:200,import=0:1"
+# (rate per second:burst, rate 0 = unlimited), plus a cap on requests
+# handled at once. The rate-limits and trusted-proxies settings are used
+# when the variables are not set, see configure_rate_limits.
+rate_limiter = RateLimitPlugin(
+    {}, max_in_flight=int(os.environ.get("TINYREDIRECT_MAX_IN_FLIGHT", "64"))
+)
+app.install(rate_limiter)
+
+
+def configure_rate_limits(settings=None):
+    """Apply the rate limits from the environment, else from the settings, to the running app"""
+    spec = os.environ.get("TINYREDIRECT_RATE_LIMITS", settings.rate_limits if settings else "")
+    proxies = os.environ.get("TINYREDIRECT_TRUSTED_PROXIES", settings.trusted_proxies if settings else "")
+    try:
+        trusted_proxies = parse_proxies(proxies)
+    except ValueError as e:
+        logger.error(f"{e}; trusting no proxies")
+        trusted_proxies = ()
+    if not spec.strip():
+        # Off unless asked for: behind NAT or a proxy many users share one address
+        rate_limiter.configure({}, trusted_proxies=trusted_proxies)
+        return
+    try:
+        rate_limiter.configure(parse_limits(spec), trusted_proxies=trusted_proxies)
+    except ValueError as e:
+        logger.error(f"{e}; using the default rate limits")
+        rate_limiter.configure(None, trusted_proxies=trusted_proxies)
+
+
+configure_rate_limits()
+
+# gzip/zstd compression of pages and API answers over
+# TINYREDIRECT_COMPRESS_MIN_SIZE bytes; TINYREDIRECT_COMPRESS=0 turns it off
+if str_to_bool(os.environ.get("TINYREDIRECT_COMPRESS", "1")):
+    app.install(CompressionPlugin(
+        min_size=int(os.environ.get("TINYREDIRECT_COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)),
+        gzip_level=int(os.environ.get("TINYREDIRECT_GZIP_LEVEL", DEFAULT_GZIP_LEVEL)),
+        zstd_level=int(os.environ.get("TINYREDIRECT_ZSTD_LEVEL", DEFAULT_ZSTD_LEVEL)),
+    ))
+
+# Scheduled online backups (see backup.py), enabled by TINYREDIRECT_BACKUP_DIR;
+# TINYREDIRECT_BACKUP_INTERVAL (seconds, 0 = only on request),
+# TINYREDIRECT_BACKUP_KEEP and TINYREDIRECT_BACKUP_COMPRESS tune them.
+backup_dir = os.environ.get("TINYREDIRECT_BACKUP_DIR")
+backup_worker = None
+
+# Change history retention (see history.py): TINYREDIRECT_HISTORY_KEEP entries
+# per alias (default 50) and TINYREDIRECT_HISTORY_MAX_AGE days (default 365),
+# enforced every TINYREDIRECT_HISTORY_COMPACT_INTERVAL seconds; 0 = no limit.
+history_compactor = None
+
+# Background threads started by main() (backups, history compaction, expiry
+# sweeps, link checks); each has a stop() method, see stop_background_workers
+background_workers = []
+
 # Database path (can be overridden for testing)
 db_path = "redirects.db"
 
+# In-memory view of the redirects table, rebuilt after writes. Set
+# TINYREDIRECT_COMPACT_STORE=1 to pack it for very large tables.
+alias_cache = AliasCache(compact=str_to_bool(os.environ.get("TINYREDIRECT_COMPACT_STORE", "")))
+
+# Optional memory-mapped alias snapshot shared by every worker process on
+# the host (see snapshot.py); enabled by TINYREDIRECT_SNAPSHOT_PATH.
+snapshot_path = os.environ.get("TINYREDIRECT_SNAPSHOT_PATH")
+if snapshot_path:
+    from tiny_redirect.snapshot import SnapshotReader
+    alias_cache.snapshot = SnapshotReader(snapshot_path)
+
+# Per-namespace caches for virtual hosts: a request for wiki.example.com is
+# answered from the "wiki" namespace if it has aliases, else from alias_cache
+alias_caches = NamespaceCaches(alias_cache)
+
 
 def get_db_path():
     """
@@ -207,9 +326,10 @@ def generate_csrf_token():
     csrf_tokens[token_hash] = time.time()
     # Clean up old tokens (older than 1 hour)
     current_time = time.time()
-    expired = [k for k, v in csrf_tokens.items() if current_time - v > 3600]
+    # Requests run on several threads; iterate over a copy
+    expired = [k for k, v in list(csrf_tokens.items()) if current_time - v > 3600]
     for k in expired:
-        del csrf_tokens[k]
+        csrf_tokens.pop(k, None)
     return token
 
 
@@ -236,6 +356,7 @@ def create_tray_icon(shortname, port):
     try:
         logger.info("create_tray_icon: Importing pystray and PIL...")
         import pystray
+        import webbrowser as wb
         from PIL import Image
 
         server_url = f"http://{shortname}:{port}/"
@@ -343,55 +464,152 @@ def stop_tray_icon():
         logger.info("stop_tray_icon: No tray icon to stop")
 
 
+@app.hook("before_request")
+def attribute_changes():
+    """Record the client in the history of anything this request changes"""
+    interface = "api" if request.path.startswith("/api/") else "web"
+    data.set_change_source(f"{interface} {request.environ.get('REMOTE_ADDR', '')}".rstrip())
+
+
+@app.hook("after_request")
+def end_change_attribution():
+    data.set_change_source(None)
+
+
 # Static File Routes
-@app.route("/img/<filename>")
+@app.route("/img/<filename>", skip=["ratelimit"])
 def serve_img(filename):
     return static_file(filename, root=os.path.join(STATIC_DIR, "img"))
 
 
-@app.route("/js/<filename>")
+@app.route("/js/<filename>", skip=["ratelimit"])
 def serve_js(filename):
     return static_file(filename, root=os.path.join(STATIC_DIR, "js"))
 
 
-@app.route("/css/<filename>")
+@app.route("/css/<filename>", skip=["ratelimit"])
 def serve_css(filename):
     return static_file(filename, root=os.path.join(STATIC_DIR, "css"))
 
 
-@app.get("/favicon.ico")
+@app.get("/favicon.ico", skip=["ratelimit"])
 def get_favicon():
     return static_file("favicon.ico", root=os.path.join(STATIC_DIR, "img"))
 
 
+# Health Routes
+@app.route("/healthz", skip=["ratelimit"])
+def healthz():
+    """Liveness probe - answers without touching the database"""
+    response.content_type = "text/plain"
+    return "ok"
+
+
+@app.route("/readyz", skip=["ratelimit"])
+def readyz():
+    """Readiness probe - database reachable and alias cache loaded"""
+    database_ok = data.ping(db_path)
+    cache_warm = alias_cache.is_warm(db_path)
+    if not (database_ok and cache_warm):
+        response.status = 503
+    age = alias_cache.age()
+    status = {
+        "status": "ready" if response.status_code == 200 else "not ready",
+        "database": "ok" if database_ok else "unreachable",
+        "cache": "warm" if cache_warm else "cold",
+        "cache_age_seconds": round(age, 3) if age is not None else None,
+    }
+    if alias_cache.snapshot is not None:
+        # How long ago the shared snapshot this worker reads was written
+        snapshot_current = alias_cache.snapshot.current(db_path) is not None
+        snapshot_age = alias_cache.snapshot.age()
+        status["snapshot"] = "current" if snapshot_current else "missing"
+        status["snapshot_age_seconds"] = round(snapshot_age, 3) if snapshot_age is not None else None
+    return status
+
+
 # App Routes
 @app.route("/")
 def index():
-    app_database_data = data.load_data(db_path)
-    if app_database_data["redirects"]:
+    cached_redirects = alias_cache.redirects(db_path)
+    if cached_redirects:
         page_data = {
             "title": "TinyRedirect - List Redirects",
-            "redirects": app_database_data["redirects"].items(),
+            "redirects": cached_redirects.items(),
         }
         return template("root", page_data)
     return redirect("/redirects", 303)
 
 
-@app.route("/about")
+@app.route("/about", rate_limit="redirect")
 def about():
     return redirect("https://sethstenzel.me/portfolio/tinyredirect/", 303)
 
 
-@app.route("/<alias>")
+@app.route("/<alias>", rate_limit="redirect")
 def alias_redirection(alias):
-    app_database_data = data.load_data(db_path)
-    alias_redirect = app_database_data["redirects"].get(alias)
+    alias_redirect = host_alias_cache().get(alias, db_path)
     if not alias_redirect:
-        page_data = {"title": "TinyRedirect - Alias Not Found!", "alias": alias}
-        return template("noalias", page_data)
-    if "://" not in alias_redirect:
-        alias_redirect = "http://" + alias_redirect
-    return redirect(alias_redirect, 303)
+        # A path-forwarding alias requested without a trailing path
+        return forward_prefix_alias(alias)
+    return send_redirect(alias_redirect)
+
+
+@app.route("/<alias>/<rest:path>", rate_limit="redirect")
+def prefix_alias_redirection(alias, rest):
+    return forward_prefix_alias(f"{alias}/{rest}")
+
+
+def host_alias_cache():
+    """The alias cache of the namespace the request's Host header names"""
+    return alias_caches.for_host(request.environ.get("HTTP_HOST"), db_path)
+
+
+def forward_prefix_alias(path):
+    """Redirect path through the longest matching path-forwarding alias"""
+    match = host_alias_cache().match_prefix(path, db_path)
+    if not match:
+        return noalias_page(path)
+    target_template, rest = match
+    return send_redirect(expand_target(target_template, rest, request.query_string))
+
+
+def noalias_page(alias):
+    """
+    Return the alias-not-found page for alias
+
+    Only the alias varies between misses, so the template is rendered once
+    around a marker and each miss joins the cached pieces with the escaped
+    alias instead of running the template engine.
+    """
+    global noalias_parts
+    if noalias_parts is None:
+        page = template("noalias", {"title": "TinyRedirect - Alias Not Found!", "alias": NOALIAS_MARKER})
+        noalias_parts = page.split(NOALIAS_MARKER)
+    return html_escape(alias).join(noalias_parts)
+
+
+def warm_up_templates():
+    """Compile every view and pre-render the pages served to many clients"""
+    from tiny_redirect.templates import warm_templates
+
+    reused = warm_templates(VIEWS_DIR)
+    noalias_page("")
+    template("error", {"title": "TinyRedirect - Error", "error": ""})
+    logger.info(f"Templates compiled ({reused} from prebuilt bytecode)")
+
+
+def send_redirect(location):
+    """
+    Answer with a 303 to a stored redirect target
+
+    Targets are canonical absolute URLs (see data.canonicalize_redirect), so
+    they go out as the Location header unchanged, without the urljoin and
+    response copy done by bottle.redirect.
+    """
+    response.status = 303
+    response.headers["Location"] = location
+    return ""
 
 
 @app.route("/add", method="GET")
@@ -413,10 +631,14 @@ def add_alias():
 
     new_alias = request.forms.get("alias", "").strip()
     new_redirect = request.forms.get("redirect", "").strip()
+    expires_at = request.forms.get("expires_at", "").strip()
     goto = request.forms.get("goto", "/")
 
     try:
-        data.add_alias(new_alias, new_redirect, db_path)
+        # datetime-local fields carry the browser's wall-clock time, which
+        # for this desktop app is the server's local time
+        expires_at = data.parse_time(expires_at, local=True) if expires_at else None
+        data.add_alias(new_alias, new_redirect, db_path, expires_at)
     except ValidationError as e:
         return template("error", {
             "title": "TinyRedirect - Error",
@@ -489,24 +711,12 @@ def edit_alias():
     goto = request.forms.get("goto", "/redirects")
 
     try:
-        # Load current data to get the existing redirect URL
-        app_database_data = data.load_data(db_path)
-        current_redirect = app_database_data["redirects"].get(old_alias)
-
-        if not current_redirect:
-            return template("error", {
-                "title": "TinyRedirect - Error",
-                "error": f"Alias '{old_alias}' not found."
-            })
-
-        # If alias changed, delete old and add new
+        # Each edit is a single UPDATE, so the alias never disappears
+        # for concurrent readers and a failed rename leaves it intact.
         if new_alias and new_alias != old_alias:
-            data.delete_alias(old_alias, db_path)
-            data.add_alias(new_alias, new_redirect if new_redirect else current_redirect, db_path)
-        # If only redirect URL changed, update the existing alias
-        elif new_redirect and new_redirect != current_redirect:
-            data.delete_alias(old_alias, db_path)
-            data.add_alias(old_alias, new_redirect, db_path)
+            data.rename_alias(old_alias, new_alias, new_redirect or None, db_path)
+        elif new_redirect:
+            data.update_alias(old_alias, new_redirect, db_path)
 
     except ValidationError as e:
         return template("error", {
@@ -526,16 +736,21 @@ def edit_alias():
 
 @app.route("/settings")
 def settings():
-    app_database_data = data.load_data(db_path)
+    settings = data.get_settings(db_path)
 
     page_data = {
         "title": "TinyRedirect - Server Settings",
-        "current_host": app_database_data["settings"]["hostname"],
-        "current_port": app_database_data["settings"]["port"],
-        "current_debug": str_to_bool(app_database_data["settings"]["bottle-debug"]),
-        "current_reloader": str_to_bool(app_database_data["settings"]["bottle-reloader"]),
-        "current_console": str_to_bool(app_database_data["settings"]["hide-console"]),
-        "current_shortname": app_database_data["settings"]["shortname"],
+        "current_host": settings.hostname,
+        "current_port": settings.port,
+        "current_debug": settings.bottle_debug,
+        "current_reloader": settings.bottle_reloader,
+        "current_console": settings.hide_console,
+        "current_shortname": settings.shortname,
+        "current_case_insensitive": settings.case_insensitive,
+        "current_rate_limits": settings.rate_limits,
+        "current_trusted_proxies": settings.trusted_proxies,
+        "current_log_level": settings.log_level,
+        "log_levels": data.LOG_LEVELS,
         "csrf_token": generate_csrf_token(),
     }
     return template("settings", page_data)
@@ -559,27 +774,30 @@ def update_setting():
         })
 
     try:
-        update_hostname = request.forms.get("hostname", "").strip()
-        if update_hostname:
-            data.update_setting("hostname", update_hostname, db_path)
-
-        update_port = request.forms.get("port", "").strip()
-        if update_port:
-            data.update_setting("port", update_port, db_path)
-
-        update_shortname = request.forms.get("shortname", "").strip()
-        if update_shortname:
-            data.update_setting("shortname", update_shortname, db_path)
+        changes = {}
+        for setting, field in (("hostname", "hostname"), ("port", "port"), ("shortname", "shortname")):
+            value = request.forms.get(field, "").strip()
+            if value:
+                changes[setting] = value
 
         # Handle boolean settings - checkbox sends value if checked, empty if not
-        update_debug = request.forms.get("debug", "")
-        data.update_setting("bottle-debug", update_debug, db_path)
-
-        update_reloader = request.forms.get("reloader", "")
-        data.update_setting("bottle-reloader", update_reloader, db_path)
-
-        update_console = request.forms.get("console", "")
-        data.update_setting("hide-console", update_console, db_path)
+        changes["bottle-debug"] = request.forms.get("debug", "")
+        changes["bottle-reloader"] = request.forms.get("reloader", "")
+        changes["hide-console"] = request.forms.get("console", "")
+        changes["case-insensitive"] = request.forms.get("case_insensitive", "")
+        # Empty restores the default, so only fields the form sent are applied
+        for setting, field in (("rate-limits", "rate_limits"), ("trusted-proxies", "trusted_proxies"),
+                               ("log-level", "log_level")):
+            if field in request.forms:
+                changes[setting] = request.forms.get(field)
+
+        # Validated together and written in one transaction, so a bad field
+        # leaves every setting unchanged
+        previous = data.get_settings(db_path)
+        data.update_settings(changes, db_path)
+        current = data.get_settings(db_path)
+        moved_to = apply_settings(previous, current)
+        pending = restart_required(previous, current)
 
     except ValidationError as e:
         return template("error", {
@@ -592,18 +810,102 @@ def update_setting():
             "error": f"Failed to update settings: {str(e)}"
         })
 
+    if pending:
+        return template("error", {
+            "title": "TinyRedirect - Restart Required",
+            "heading": "Restart Required",
+            "alert": "warning",
+            "error": f"Settings saved. Changing {', '.join(pending)} takes effect after TinyRedirect is restarted."
+        })
+    if moved_to:
+        # The old listener is draining; send the browser to the new one
+        return redirect(f"{request.urlparts.scheme}://{request.urlparts.hostname}:{moved_to[1]}/settings", 303)
     return redirect("/settings", 303)
 
 
+def listen_address(settings):
+    """Host and port to listen on; the environment overrides the settings"""
+    return (
+        os.environ.get('TINYREDIRECT_HOST', settings.hostname),
+        str(os.environ.get('TINYREDIRECT_PORT', settings.port)),
+    )
+
+
+# Settings (column, Settings field) that only a new process picks up: the
+# socket hand-over cannot start Bottle's reloader or another engine on the
+# inherited listener
+RESTART_SETTINGS = (("bottle-engine", "bottle_engine"), ("bottle-reloader", "bottle_reloader"))
+
+
+def apply_settings(previous, current):
+    """
+    Apply changed server settings to the running process
+
+    The debug flag, rate limits and log level take effect at once. A new
+    hostname or port binds the new listener before the old one stops
+    accepting. A new engine or reloader mode is only stored; it needs a
+    full restart, see RESTART_SETTINGS. Returns the new (host, port) if
+    the listener moved, else None.
+    """
+    from tiny_redirect import server
+    import bottle
+
+    if current.bottle_debug != previous.bottle_debug:
+        bottle.debug(current.bottle_debug)
+        logger.info(f"Debug mode now {current.bottle_debug}")
+
+    if (current.rate_limits, current.trusted_proxies) != (previous.rate_limits, previous.trusted_proxies):
+        configure_rate_limits(current)
+        logger.info(f"Rate limits now '{current.rate_limits or 'off'}', "
+                    f"trusted proxies '{current.trusted_proxies or 'none'}'")
+
+    if current.log_level != previous.log_level:
+        set_log_level(current.log_level)
+        logger.info(f"Log level now {current.log_level or 'default'}")
+
+    moved_to = None
+    old_address, new_address = listen_address(previous), listen_address(current)
+    if new_address != old_address:
+        try:
+            if server.request_rebind(*new_address):
+                moved_to = new_address
+                logger.info(f"Listener moved from {old_address[0]}:{old_address[1]} "
+                            f"to {new_address[0]}:{new_address[1]}")
+        except OSError as e:
+            # Keep the stored address in line with where the server listens
+            data.update_settings({"hostname": previous.hostname, "port": previous.port}, db_path)
+            raise ValidationError(f"Could not listen on {new_address[0]}:{new_address[1]}: {e}")
+
+    for setting in restart_required(previous, current):
+        logger.info(f"{setting} changed, takes effect after a restart")
+    return moved_to
+
+
+def restart_required(previous, current):
+    """Names of changed settings that the running process cannot apply"""
+    return [
+        setting for setting, field in RESTART_SETTINGS
+        if getattr(current, field) != getattr(previous, field)
+    ]
+
+
 @app.route("/redirects")
 def redirects():
-    app_database_data = data.load_data(db_path)
+    cached_redirects = alias_cache.redirects(db_path)
     csrf_token = generate_csrf_token()
 
-    if app_database_data["redirects"]:
+    if cached_redirects:
+        link_status = data.load_link_status(db_path)
+        for status in link_status.values():
+            status["checked"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(status["checked_at"]))
         page_data = {
             "title": "TinyRedirect - Modify Redirects",
-            "redirects": app_database_data["redirects"].items(),
+            "redirects": cached_redirects.items(),
+            "expiries": {
+                alias: time.strftime("%Y-%m-%d %H:%M", time.localtime(expires_at))
+                for alias, expires_at in data.load_expiries(db_path).items()
+            },
+            "link_status": link_status,
             "csrf_token": csrf_token,
         }
         return template("redirects", page_data)
@@ -617,7 +919,7 @@ def redirects():
     return redirect("/redirects", 303)
 
 
-@app.route("/export_redirects")
+@app.route("/export_redirects", rate_limit="import")
 def export_redirects():
     """Export all redirects to tredirects.json file"""
     try:
@@ -642,7 +944,7 @@ def import_redirects_form():
     return redirect("/settings", 303)
 
 
-@app.route("/import_redirects", method="POST")
+@app.route("/import_redirects", method="POST", rate_limit="import")
 def import_redirects():
     """Import redirects from uploaded tredirects.json file"""
     csrf_token = request.forms.get("csrf_token")
@@ -668,6 +970,9 @@ def import_redirects():
         # Read the file content
         json_data = upload.file.read().decode('utf-8')
 
+        if request.forms.get("dry_run", "") == "on":
+            return import_diff_page(data.diff_import(json_data, db_path, replace=replace_mode, limit=10))
+
         # Import the redirects
         stats = data.import_redirects(json_data, db_path, replace=replace_mode)
 
@@ -681,6 +986,15 @@ def import_redirects():
         if stats["duplicates"] > 0:
             message_parts.append(f"Skipped (duplicates): {stats['duplicates']}")
 
+        # Aliases that differ from an existing alias only by case
+        if stats["collisions"]:
+            message_parts.append("")
+            message_parts.append("Case-insensitive collisions:")
+            for collision in stats["collisions"][:10]:
+                message_parts.append(f"  • {collision}")
+            if len(stats["collisions"]) > 10:
+                message_parts.append(f"  ... and {len(stats['collisions']) - 10} more collisions")
+
         # Show errors if any
         if stats["errors"]:
             message_parts.append("")
@@ -697,6 +1011,9 @@ def import_redirects():
         if stats["errors"]:
             title = "TinyRedirect - Import Completed with Errors"
             alert_type = "warning"
+        elif stats["collisions"]:
+            title = "TinyRedirect - Import Completed with Collisions"
+            alert_type = "warning"
         elif stats["duplicates"] > 0 and stats["imported"] > 0:
             title = "TinyRedirect - Import Completed"
             alert_type = "info"
@@ -728,6 +1045,318 @@ def import_redirects():
         })
 
 
+def import_diff_page(diff):
+    """Render the first page of a dry-run import diff (see data.diff_import)"""
+    counts = diff["counts"]
+    message_parts = [
+        f"Total in file: {diff['total']}",
+        f"Unchanged: {counts['identical']}",
+        "Dry run: nothing was imported.",
+    ]
+    labels = {
+        "added": "New aliases",
+        "conflicting": "Overwritten" if diff["replace"] else "Different target (skipped)",
+        "invalid": "Invalid (skipped)",
+        "removed": "Removed",
+    }
+    for category, label in labels.items():
+        if not counts[category]:
+            continue
+        message_parts.append("")
+        message_parts.append(f"{label}: {counts[category]}")
+        for entry in diff[category]:
+            if category == "invalid":
+                message_parts.append(f"  • {entry['alias']}: {entry['error']}")
+            elif category == "conflicting":
+                message_parts.append(f"  • {entry['alias']}: {entry['current']} → {entry['redirect']}")
+            else:
+                message_parts.append(f"  • {entry['alias']}: {entry['redirect']}")
+        if counts[category] > len(diff[category]):
+            message_parts.append(f"  ... and {counts[category] - len(diff[category])} more")
+
+    return template("import_result", {
+        "title": "TinyRedirect - Import Dry Run",
+        "message": "\n".join(message_parts),
+        "alert_type": "warning" if counts["invalid"] else "info",
+    })
+
+# JSON API Routes
+def api_error(status, message):
+    """Set an error status and return a JSON error body"""
+    response.status = status
+    return {"error": message}
+
+
+def api_authorized():
+    """Check the request's bearer token against TINYREDIRECT_API_TOKEN"""
+    if not api_token:
+        return False
+    scheme, _, token = request.get_header("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    return secrets.compare_digest(token.strip(), api_token)
+
+
+def read_json_body():
+    """Parse the request body as JSON, raising ValidationError on bad input"""
+    import json
+    if request.content_length > API_MAX_BODY:
+        raise ValidationError(f"Request body larger than {API_MAX_BODY} bytes")
+    try:
+        return json.loads(request.body.read(API_MAX_BODY) or b"null")
+    except ValueError as e:
+        raise ValidationError(f"Invalid JSON body: {e}")
+
+
+@app.route("/api/v1/redirects", method="GET")
+def api_list_redirects():
+    """List all redirects as JSON, or with ?since=<version> only what changed since"""
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    try:
+        namespace = api_namespace()
+    except ValidationError as e:
+        return api_error(400, str(e))
+    if "since" in request.query:
+        return api_redirect_changes(namespace)
+    cache = alias_caches.cache(namespace, db_path)
+    return {
+        "redirects": [
+            {"alias": alias, "redirect": target}
+            for alias, target in (cache.redirects(db_path).items() if cache is not None else ())
+        ]
+    }
+
+
+@app.route("/api/v1/namespaces", method="GET")
+def api_list_namespaces():
+    """List the namespaces that have aliases, besides the default one"""
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    return {"namespaces": sorted(alias_caches.namespaces(db_path))}
+
+
+def api_namespace(value=None):
+    """The namespace an API request names (?namespace=, or value), validated"""
+    if value is None:
+        value = request.query.getunicode("namespace", data.DEFAULT_NAMESPACE)
+    return data.validate_namespace(value)
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against etag, as RFC 9110 asks for"""
+    if if_none_match.strip() == "*":
+        return True
+    strip_weak = lambda tag: tag.strip().removeprefix("W/")
+    return any(strip_weak(tag) == strip_weak(etag) for tag in if_none_match.split(","))
+
+
+def api_redirect_changes(namespace=data.DEFAULT_NAMESPACE):
+    """Delta sync: aliases of namespace added, changed or deleted after ?since=<version>"""
+    try:
+        since = int(request.query.since)
+    except ValueError:
+        return api_error(400, "'since' must be an integer")
+    if since < 0:
+        return api_error(400, "'since' must not be negative")
+    # The ETag is the version, so a poll with nothing new is answered
+    # without reading any rows
+    if_none_match = request.get_header("If-None-Match")
+    if if_none_match:
+        etag = f'"{data.sync_version(db_path)}"'
+        if etag_matches(if_none_match, etag):
+            return HTTPResponse(status=304, headers={"ETag": etag})
+    changes = data.changes_since(since, db_path, namespace)
+    response.set_header("ETag", f'"{changes["version"]}"')
+    return {"since": since, **changes}
+
+
+def get_backup_worker():
+    """Return the backup worker, creating it on first use; None if backups are off"""
+    global backup_worker
+    if backup_worker is None and backup_dir:
+        from tiny_redirect.backup import BackupWorker, DEFAULT_KEEP
+        backup_worker = BackupWorker(
+            db_path,
+            backup_dir,
+            interval=float(os.environ.get("TINYREDIRECT_BACKUP_INTERVAL", 24 * 60 * 60)),
+            compress=str_to_bool(os.environ.get("TINYREDIRECT_BACKUP_COMPRESS", "")),
+            keep=int(os.environ.get("TINYREDIRECT_BACKUP_KEEP", DEFAULT_KEEP)),
+        )
+    return backup_worker
+
+
+def start_history_compactor():
+    """Enforce the history retention limits in the background"""
+    global history_compactor
+    from tiny_redirect.history import HistoryCompactor, DEFAULT_KEEP, DEFAULT_MAX_AGE
+    interval = float(os.environ.get("TINYREDIRECT_HISTORY_COMPACT_INTERVAL", 60 * 60))
+    if interval <= 0:
+        return
+    history_compactor = HistoryCompactor(
+        db_path,
+        interval,
+        keep=int(os.environ.get("TINYREDIRECT_HISTORY_KEEP", DEFAULT_KEEP)),
+        max_age=float(os.environ.get("TINYREDIRECT_HISTORY_MAX_AGE", DEFAULT_MAX_AGE / 86400)) * 86400,
+    )
+    history_compactor.start()
+    background_workers.append(history_compactor)
+
+
+def start_link_checker():
+    """Check redirect targets in the background if TINYREDIRECT_LINK_CHECK is on"""
+    # Off by default: the checker sends requests to every stored target
+    if not str_to_bool(os.environ.get("TINYREDIRECT_LINK_CHECK", "False")):
+        return
+    from tiny_redirect.linkcheck import LinkChecker, DEFAULT_WORKERS, DEFAULT_PER_HOST, DEFAULT_TIMEOUT
+    checker = LinkChecker(
+        db_path,
+        workers=int(os.environ.get("TINYREDIRECT_LINK_CHECK_WORKERS", DEFAULT_WORKERS)),
+        per_host=int(os.environ.get("TINYREDIRECT_LINK_CHECK_PER_HOST", DEFAULT_PER_HOST)),
+        timeout=float(os.environ.get("TINYREDIRECT_LINK_CHECK_TIMEOUT", DEFAULT_TIMEOUT)),
+    )
+    checker.start()
+    background_workers.append(checker)
+
+
+def stop_background_workers(timeout=5.0):
+    """Stop the threads started by main() and wait up to timeout seconds for each"""
+    while background_workers:
+        worker = background_workers.pop()
+        worker.stop()
+        thread = getattr(worker, "_thread", None)
+        if thread is not None:
+            thread.join(timeout)
+
+
+@app.route("/api/v1/backup", method="POST", rate_limit="import")
+def api_backup():
+    """Take an online backup now"""
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    worker = get_backup_worker()
+    if worker is None:
+        return api_error(409, "Backups are disabled; set TINYREDIRECT_BACKUP_DIR")
+    try:
+        path = worker.run_once()
+    except ValidationError as e:
+        return api_error(400, str(e))
+    except Exception as e:
+        logger.error(f"API backup failed: {e}")
+        return api_error(500, f"Backup failed: {str(e)}")
+    response.status = 201
+    return {
+        "backup": os.path.basename(path),
+        "bytes": os.path.getsize(path),
+        "compressed": path.endswith(".zst"),
+    }
+
+
+@app.route("/api/v1/history", method="GET")
+def api_alias_history():
+    """Changes to ?alias=<alias>, newest first, paged with before=<id>&limit=<n>"""
+    from tiny_redirect import history
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    # A query parameter rather than a path segment: aliases can contain
+    # slashes, and /<alias>/<rest:path> would claim the path first
+    alias = request.query.getunicode("alias")
+    if not alias:
+        return api_error(400, "'alias' is required")
+    try:
+        limit = max(1, min(int(request.query.get("limit", 100)), history.MAX_PAGE_SIZE))
+        before = int(request.query["before"]) if request.query.get("before") else None
+    except ValueError:
+        return api_error(400, "'limit' and 'before' must be integers")
+    try:
+        namespace = api_namespace()
+    except ValidationError as e:
+        return api_error(400, str(e))
+    entries = history.alias_history(alias, db_path, limit, before, namespace)
+    return {
+        "alias": alias,
+        "history": entries,
+        # A full page may have more after it
+        "next": entries[-1]["id"] if len(entries) == limit else None,
+    }
+
+
+@app.route("/api/v1/restore", method="POST")
+def api_restore_alias():
+    """Put an alias back the way it was at a point in time"""
+    from tiny_redirect import history
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    try:
+        body = read_json_body()
+        if not isinstance(body, dict) or not isinstance(body.get("alias"), str) or "at" not in body:
+            raise ValidationError("Body must be a JSON object with 'alias' and 'at'")
+        namespace = api_namespace(body.get("namespace", data.DEFAULT_NAMESPACE))
+        target = history.restore_alias(body["alias"], data.parse_time(body["at"]), db_path, namespace)
+    except ValidationError as e:
+        return api_error(400, str(e))
+    except Exception as e:
+        logger.error(f"API restore failed: {e}")
+        return api_error(500, f"Failed to restore alias: {str(e)}")
+    return {"alias": body["alias"], "redirect": target}
+
+
+@app.route("/api/v1/import/diff", method="POST", rate_limit="import")
+def api_import_diff():
+    """
+    Dry-run an import of the tredirects.json body: what would be added,
+    conflict, stay identical, be rejected or (with ?replace=1) removed,
+    paged with offset=<n>&limit=<n>. Nothing is written.
+    """
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    try:
+        if request.content_length > API_MAX_BODY:
+            raise ValidationError(f"Request body larger than {API_MAX_BODY} bytes")
+        try:
+            offset = int(request.query.get("offset", 0))
+            limit = int(request.query.get("limit", data.DEFAULT_DIFF_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError("'offset' and 'limit' must be integers")
+        return data.diff_import(
+            request.body.read(API_MAX_BODY).decode("utf-8", errors="replace"),
+            db_path,
+            replace=str_to_bool(request.query.get("replace", False)),
+            offset=offset,
+            limit=limit,
+        )
+    except ValidationError as e:
+        return api_error(400, str(e))
+    except Exception as e:
+        logger.error(f"API import diff failed: {e}")
+        return api_error(500, f"Failed to diff import: {str(e)}")
+
+@app.route("/api/v1/redirects/batch", method="POST", rate_limit="import")
+def api_batch_redirects():
+    """Apply a batch of create/update/delete operations in one transaction"""
+    if not api_authorized():
+        return api_error(401, "Missing or invalid API token")
+    try:
+        body = read_json_body()
+        if not isinstance(body, dict):
+            raise ValidationError("Body must be a JSON object with an 'operations' list")
+        result = data.apply_batch(
+            body.get("operations"),
+            db_path,
+            atomic=str_to_bool(body.get("atomic", False)),
+            namespace=api_namespace(body.get("namespace", data.DEFAULT_NAMESPACE)),
+        )
+    except ValidationError as e:
+        return api_error(400, str(e))
+    except Exception as e:
+        logger.error(f"API batch failed: {e}")
+        return api_error(500, f"Failed to apply batch: {str(e)}")
+
+    if not result["committed"]:
+        response.status = 422
+    return result
+
+
 @app.route("/shutdown")
 def shutdown():
     page_data = {
@@ -739,10 +1368,16 @@ def shutdown():
 
 def shutdown_server():
     logger.info("shutdown_server: Shutdown sequence initiated...")
-    logger.info("shutdown_server: Waiting 3 seconds before stopping...")
-    time.sleep(3)
     logger.info("shutdown_server: Stopping tray icon...")
     stop_tray_icon()
+    from tiny_redirect import server
+    if server.request_shutdown():
+        # The server stops accepting, finishes this and any other request
+        # in flight, then main() returns
+        logger.info("shutdown_server: Draining requests in flight...")
+        return
+    logger.info("shutdown_server: Waiting 3 seconds before stopping...")
+    time.sleep(3)
     global MAIN_APP_PID
     logger.info(f"shutdown_server: Attempting to terminate process {MAIN_APP_PID}...")
     try:
@@ -751,6 +1386,7 @@ def shutdown_server():
     except Exception as e:
         logger.warning(f"shutdown_server: Unable to kill process {MAIN_APP_PID}: {e}")
         logger.warning("shutdown_server: Opening shutdown URL as fallback...")
+        import webbrowser as wb
         wb.open_new_tab(f"http://{shortname}:{port}/shutdown")
 
 
@@ -760,12 +1396,25 @@ def open_webpage(shortname, port):
     url = f"http://{shortname}:{port}/"
     logger.info(f"open_webpage: Opening browser tab for {url}")
     try:
+        import webbrowser as wb
         wb.open_new_tab(url)
         logger.info("open_webpage: Browser opened successfully")
     except Exception as e:
         logger.error(f"open_webpage: Failed to open browser: {e}")
 
 
+def compile_alias_snapshot(changed_db_path):
+    """Recompile the shared alias snapshot after a write to the served database"""
+    if changed_db_path != db_path:
+        return
+    from tiny_redirect.snapshot import compile_snapshot
+    try:
+        compile_snapshot(db_path, snapshot_path)
+        logger.info(f"compile_alias_snapshot: Wrote alias snapshot {snapshot_path}")
+    except Exception as e:
+        logger.error(f"compile_alias_snapshot: Failed to write alias snapshot: {e}")
+
+
 def check_single_instance():
     """
     Check if another instance of TinyRedirect is already running (Windows only).
@@ -874,28 +1523,74 @@ def main():
         db_path = get_db_path()
         logger.info(f"Using database: {db_path}")
 
-        logger.info("Initializing database...")
-        if not data.database_init(db_path) and not data.load_data(db_path)["settings"]:
-            logger.error("Database not found; redirects.db could not be found or created.")
-            sys.exit(1)
-
         try:
+            logger.info("Initializing database...")
+            if not data.database_init(db_path):
+                logger.error("Database not found; redirects.db could not be found or created.")
+                sys.exit(1)
+
+            # Only the settings row and a count are needed to start serving;
+            # the redirects table is read on demand by the routes.
             logger.info("Loading database settings...")
-            initial_database_load = data.load_data(db_path)
-            logger.info(f"Database loaded successfully. Redirects count: {len(initial_database_load['redirects'])}")
+            settings = data.get_settings(db_path)
+            logger.info(f"Database loaded successfully. Redirects count: {data.count_redirects(db_path)}")
         except sqlite3.OperationalError as e:
             logger.error(f"Database tables missing or damaged: {e}")
             logger.error("Expected database tables missing or damaged,\ndelete redirects.db and run again.")
             sys.exit(1)
 
+        configure_rate_limits(settings)
+        set_log_level(settings.log_level)
+        warm_up_templates()
+
+        from tiny_redirect import server
+
+        # A process taking over a listening socket must run GracefulServer
+        # to adopt it; Bottle's reloader child would not inherit it
+        handover = server.inherited_listen_fd() is not None
+        use_defaults = len(sys.argv) > 1 and sys.argv[1] == "--defaults"
+        use_reloader = settings.bottle_reloader and not handover and not use_defaults
+
         # is_reloader_child was already checked at the start of main()
         logger.info(f"Reloader child process: {is_reloader_child}")
 
-        # Check for --startup flag to suppress browser opening
-        suppress_browser = "--startup" in sys.argv
+        # With the reloader on, this process only watches the source files
+        # and a child process serves; workers run only where requests are served
+        if is_reloader_child or not use_reloader:
+            worker = get_backup_worker()
+            if worker is not None and worker.interval > 0:
+                logger.info(f"Backing up to {worker.backup_dir} every {worker.interval:.0f}s")
+                worker.start()
+                background_workers.append(worker)
+
+            start_history_compactor()
+
+            from tiny_redirect.expiry import ExpirySweeper
+            sweeper = ExpirySweeper(db_path)
+            sweeper.start()
+            background_workers.append(sweeper)
+
+            start_link_checker()
+
+            # Fill the alias cache (or compile the shared snapshot) in the
+            # background so /readyz reports ready once lookups are served from
+            # memory, without delaying the listener.
+            if snapshot_path:
+                data.add_write_listener(compile_alias_snapshot)
+                Thread(target=compile_alias_snapshot, args=(db_path,), daemon=True).start()
+            else:
+                Thread(target=alias_cache.warm, args=(db_path,), daemon=True).start()
+
+        # Run shutdown hooks (flushing the log queue last) once requests drain
+        server.add_shutdown_hook(stop_background_workers)
+        server.add_shutdown_hook(logger.complete)
+
+        # Check for --startup flag to suppress browser opening; a process
+        # started by a zero-downtime restart never opens one either
+        suppress_browser = "--startup" in sys.argv or handover
         logger.info(f"Suppress browser opening: {suppress_browser}")
 
-        if len(sys.argv) > 1 and sys.argv[1] == "--defaults":
+        if use_defaults:
             logger.info("Starting server with defaults: host=127.0.0.1, port=80")
             logger.info("Starting Server with Defaults\n\n")
             logger.info('host="127.0.0.1"')
@@ -916,13 +1611,12 @@ def main():
                 port="80",
                 debug=False,
                 reloader=False,
+                server=server.GracefulServer,
             )
         else:
-            app_database_data = initial_database_load
-
             # Start browser with configured settings
-            shortname = app_database_data["settings"]["shortname"]
-            port = app_database_data["settings"]["port"]
+            shortname = settings.shortname
+            port = settings.port
             logger.info(f"Configured shortname: {shortname}")
             logger.info(f"Configured port: {port}")
 
@@ -936,22 +1630,22 @@ def main():
                 Thread(target=create_tray_icon, args=(shortname, port), daemon=True).start()
 
             # Allow environment variable override for host (useful for Docker)
-            host = os.environ.get('TINYREDIRECT_HOST', app_database_data["settings"]["hostname"])
-            port = os.environ.get('TINYREDIRECT_PORT', app_database_data["settings"]["port"])
+            host = os.environ.get('TINYREDIRECT_HOST', settings.hostname)
+            port = os.environ.get('TINYREDIRECT_PORT', settings.port)
 
             logger.info(f"Final server configuration: host={host}, port={port}")
-            logger.info(f"Debug mode: {str_to_bool(app_database_data['settings']['bottle-debug'])}")
-            logger.info(f"Reloader mode: {str_to_bool(app_database_data['settings']['bottle-reloader'])}")
-            logger.info(f"Server engine: {app_database_data['settings']['bottle-engine']}")
+            logger.info(f"Debug mode: {settings.bottle_debug}")
+            logger.info(f"Reloader mode: {settings.bottle_reloader}")
+            logger.info(f"Server engine: {settings.bottle_engine}")
             logger.info("Starting Bottle server...")
             logger.info("=" * 80)
 
             app.run(
                 host=host,
                 port=port,
-                debug=str_to_bool(app_database_data["settings"]["bottle-debug"]),
-                reloader=str_to_bool(app_database_data["settings"]["bottle-reloader"]),
-                server=app_database_data["settings"]["bottle-engine"],
+                debug=settings.bottle_debug,
+                reloader=use_reloader,
+                server=server.GracefulServer if handover else server.resolve_server(settings.bottle_engine),
             )
 
     except KeyboardInterrupt:
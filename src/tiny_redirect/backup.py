@@ -0,0 +1,239 @@
+"""
+Online backups of the redirects database.
+
+backup_database copies a live database with the SQLite backup API a few
+pages at a time, pausing between steps, so readers and writers are never
+blocked for more than one short step and the copy is always consistent.
+BackupWorker runs it on a schedule and keeps the newest few backups.
+restore_database checks a backup with PRAGMA integrity_check before copying
+it over the live database, again through the backup API.
+
+    python -m tiny_redirect.backup backup <db> <backup dir> [--compress] [--keep N]
+    python -m tiny_redirect.backup restore <backup file> <db>
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from loguru import logger
+
+from tiny_redirect import data
+from tiny_redirect.data import ValidationError
+
+BACKUP_PREFIX = "redirects-"
+BACKUP_SUFFIX = ".db"
+COMPRESSED_SUFFIX = ".zst"
+
+# Pages copied per backup step and seconds slept between steps
+DEFAULT_PAGES_PER_STEP = 64
+DEFAULT_STEP_PAUSE = 0.005
+
+DEFAULT_KEEP = 7
+ZSTD_LEVEL = 10
+
+
+def _copy_online(source_path, target_path, pages, pause):
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(
+            target,
+            pages=pages,
+            progress=(lambda status, remaining, total: time.sleep(pause)) if pause else None,
+        )
+    finally:
+        target.close()
+        source.close()
+
+
+def _compress(source_path, target_path):
+    import zstandard
+
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(source, target)
+
+
+def _decompress(source_path, target_path):
+    import zstandard
+
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        zstandard.ZstdDecompressor().copy_stream(source, target)
+
+
+def backup_name(compress=False, now=None):
+    """File name for a backup taken at now (UTC)"""
+    now = now or datetime.now(timezone.utc)
+    name = f"{BACKUP_PREFIX}{now:%Y%m%d-%H%M%S-%f}{BACKUP_SUFFIX}"
+    return name + COMPRESSED_SUFFIX if compress else name
+
+
+def list_backups(backup_dir):
+    """Backup files in backup_dir, oldest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted(
+        os.path.join(backup_dir, name) for name in os.listdir(backup_dir)
+        if name.startswith(BACKUP_PREFIX)
+        and (name.endswith(BACKUP_SUFFIX) or name.endswith(BACKUP_SUFFIX + COMPRESSED_SUFFIX))
+    )
+
+
+def prune_backups(backup_dir, keep=DEFAULT_KEEP):
+    """Delete all but the newest keep backups; returns the deleted paths"""
+    backups = list_backups(backup_dir)
+    removed = backups[:-keep] if keep > 0 else []
+    for path in removed:
+        os.unlink(path)
+    return removed
+
+
+def backup_database(db_path, backup_dir, compress=False, keep=DEFAULT_KEEP,
+                    pages=DEFAULT_PAGES_PER_STEP, pause=DEFAULT_STEP_PAUSE):
+    """
+    Copy db_path into a new file in backup_dir while it stays in use
+
+    The copy is written under a temporary name and renamed into place when
+    complete, so a backup file is never torn. Returns the backup path.
+    """
+    if not os.path.exists(db_path):
+        raise ValidationError(f"Database '{db_path}' not found")
+    os.makedirs(backup_dir, exist_ok=True)
+    final_path = os.path.join(backup_dir, backup_name(compress))
+    fd, temp_path = tempfile.mkstemp(prefix=".backup-", dir=backup_dir)
+    os.close(fd)
+    try:
+        _copy_online(db_path, temp_path, pages, pause)
+        if compress:
+            compressed_path = temp_path + COMPRESSED_SUFFIX
+            try:
+                _compress(temp_path, compressed_path)
+            except BaseException:
+                if os.path.exists(compressed_path):
+                    os.unlink(compressed_path)
+                raise
+            os.unlink(temp_path)
+            temp_path = compressed_path
+        os.replace(temp_path, final_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    prune_backups(backup_dir, keep)
+    return final_path
+
+
+def verify_database(path):
+    """Raise ValidationError unless path is an intact TinyRedirect database"""
+    try:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            (result,) = connection.execute("PRAGMA integrity_check").fetchone()
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            connection.close()
+    except sqlite3.DatabaseError as e:
+        raise ValidationError(f"'{path}' is not a valid database: {e}")
+    if result != "ok":
+        raise ValidationError(f"'{path}' failed the integrity check: {result}")
+    missing = {"settings", "redirects"} - tables
+    if missing:
+        raise ValidationError(f"'{path}' is missing tables: {', '.join(sorted(missing))}")
+
+
+def restore_database(backup_path, db_path, pages=DEFAULT_PAGES_PER_STEP, pause=DEFAULT_STEP_PAUSE):
+    """
+    Replace the contents of db_path with a verified backup
+
+    Compressed backups are expanded next to db_path first. The copy goes
+    through the backup API, so connections already open on db_path see
+    either the old or the restored database, never a mix.
+    """
+    if not os.path.exists(backup_path):
+        raise ValidationError(f"Backup '{backup_path}' not found")
+    directory = os.path.dirname(os.path.abspath(db_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".restore-", dir=directory)
+    os.close(fd)
+    try:
+        if backup_path.endswith(COMPRESSED_SUFFIX):
+            _decompress(backup_path, temp_path)
+        else:
+            shutil.copyfile(backup_path, temp_path)
+        verify_database(temp_path)
+        # Older backups may predate columns added since
+        data.migrate_database(temp_path)
+        _copy_online(temp_path, db_path, pages, pause)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    data.database_changed(db_path)
+
+
+class BackupWorker:
+    """Background thread taking a backup every interval seconds"""
+
+    def __init__(self, db_path, backup_dir, interval, compress=False, keep=DEFAULT_KEEP):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.compress = compress
+        self.keep = keep
+        self.last_backup = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="backup-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Take a backup now (serialized with the schedule); returns its path"""
+        with self._lock:
+            path = backup_database(self.db_path, self.backup_dir, self.compress, self.keep)
+            self.last_backup = path
+            return path
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                path = self.run_once()
+                logger.info(f"Backup written to {path}")
+            except Exception as e:
+                logger.error(f"Scheduled backup failed: {e}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m tiny_redirect.backup")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser("backup", help="copy a live database into a backup directory")
+    backup_parser.add_argument("db_path")
+    backup_parser.add_argument("backup_dir")
+    backup_parser.add_argument("--compress", action="store_true", help="compress with zstd")
+    backup_parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="backups to keep (0 keeps all)")
+    restore_parser = commands.add_parser("restore", help="verify a backup and copy it over a database")
+    restore_parser.add_argument("backup_path")
+    restore_parser.add_argument("db_path")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "backup":
+            print(backup_database(args.db_path, args.backup_dir, args.compress, args.keep))
+        else:
+            restore_database(args.backup_path, args.db_path)
+            print(f"Restored {args.db_path} from {args.backup_path}")
+    except ValidationError as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
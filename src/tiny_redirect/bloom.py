@@ -0,0 +1,44 @@
+"""Bloom filter used to turn away unknown aliases before a full lookup."""
+
+from array import array
+
+# Bits of memory per key; with four bits set per key this gives roughly a
+# 2% false-positive rate
+BITS_PER_KEY = 10
+
+
+class BloomFilter:
+    """
+    Blocked Bloom filter over strings, with no false negatives.
+
+    Each key sets four bits inside one 64-bit word, all taken from the
+    key's built-in hash, so a probe is one word read and a mask compare
+    with no Python loop. str caches its hash, and the hash is salted per
+    process, so a filter is only valid in the process that built it.
+    """
+
+    __slots__ = ("_words", "_count")
+
+    def __init__(self, capacity):
+        self._count = max(1, (capacity * BITS_PER_KEY + 63) // 64)
+        self._words = array("Q", bytes(8 * self._count))
+
+    def add(self, key):
+        hashed = hash(key)
+        index = (hashed >> 24) % self._count
+        self._words[index] |= (
+            (1 << (hashed & 63)) | (1 << ((hashed >> 6) & 63))
+            | (1 << ((hashed >> 12) & 63)) | (1 << ((hashed >> 18) & 63))
+        )
+
+    def __contains__(self, key):
+        hashed = hash(key)
+        mask = (
+            (1 << (hashed & 63)) | (1 << ((hashed >> 6) & 63))
+            | (1 << ((hashed >> 12) & 63)) | (1 << ((hashed >> 18) & 63))
+        )
+        return self._words[(hashed >> 24) % self._count] & mask == mask
+
+    def nbytes(self):
+        """Bytes held by the bit array"""
+        return self._words.itemsize * len(self._words)
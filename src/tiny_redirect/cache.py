@@ -0,0 +1,313 @@
+"""In-memory view of the redirects table used on the request hot path."""
+
+import ipaddress
+
+import threading
+import time
+
+from tiny_redirect import data
+from tiny_redirect.bloom import BloomFilter
+from tiny_redirect.store import CompactAliasStore
+from tiny_redirect.trie import PrefixTrie, is_prefix_target
+
+
+class AliasCache:
+    """
+    Keeps the alias -> redirect mapping of one database in memory.
+
+    The mapping is rebuilt lazily the first time it is needed after data.py
+    reports a write to the database (see data.generation) or after the
+    database path changes, so the routes never read the full table per request.
+
+    Exact aliases are answered from a dict; path-forwarding aliases (targets
+    containing {rest}) are compiled into a PrefixTrie. When the database has
+    case-insensitive matching enabled, exact lookups go through a dict keyed
+    on the stored alias_key column instead, so a request only folds its own
+    alias and never scans the table.
+
+    With compact=True the views are CompactAliasStore instances instead of
+    dicts, trading a bisect per lookup for a much smaller footprint on very
+    large tables (see store.py). In both modes a BloomFilter over the exact
+    keys is built alongside the view, so most unknown aliases (scanners,
+    typos) are rejected with one word probe before the lookup.
+
+    With a SnapshotReader, alias lookups are answered from the shared
+    memory-mapped snapshot whenever it is current for the database, and the
+    per-process view is only loaded for the listing pages.
+
+    Aliases with an expires_at are kept in a small deadline map next to the
+    view, so an expired alias is treated as missing the moment it expires,
+    with one dict probe and no query. The expiry sweeper (see expiry.py)
+    then deletes the row, which rebuilds the view without it.
+
+    A cache holds the aliases of one namespace (see NamespaceCaches); the
+    snapshot only ever holds the default namespace.
+    """
+
+    def __init__(self, compact=False, snapshot=None, namespace=data.DEFAULT_NAMESPACE):
+        self.compact = compact
+        self.snapshot = snapshot
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db_path = None
+        self._generation = -1
+        self._redirects = {}
+        self._exact = {}
+        self._prefixes = PrefixTrie()
+        self._case_insensitive = False
+        self._exact_has_prefixes = False
+        self._filter = None
+        self._deadlines = {}
+        self._mapped_deadlines = {}
+        self._mapped_deadlines_key = None
+        self._mapped_deadlines_at = 0.0
+        self.loaded_at = None
+
+    def is_warm(self, db_path):
+        """Return True if lookups for db_path are served from memory"""
+        if self.snapshot is not None and self.snapshot.current(db_path) is not None:
+            return True
+        return self._view_is_current(db_path)
+
+    def _view_is_current(self, db_path):
+        return (
+            self.loaded_at is not None
+            and self._db_path == db_path
+            and self._generation == data.generation(db_path)
+        )
+
+    def age(self):
+        """Seconds since the view was last rebuilt, or None if never loaded"""
+        if self.loaded_at is None:
+            return None
+        return time.monotonic() - self.loaded_at
+
+    def warm(self, db_path):
+        """Load the view for db_path if it is cold or stale"""
+        if self._view_is_current(db_path):
+            return
+        with self._lock:
+            if self._view_is_current(db_path):
+                return
+            current = data.generation(db_path)
+            case_insensitive = data.get_settings(db_path).case_insensitive
+            if self.compact:
+                redirects, exact, prefixes = self._build_compact(db_path, case_insensitive, self.namespace)
+            else:
+                redirects, exact, prefixes = self._build_dicts(db_path, case_insensitive, self.namespace)
+            alias_filter = BloomFilter(len(exact))
+            for key in exact:
+                alias_filter.add(key)
+            deadlines = data.load_expiries(db_path, folded=case_insensitive, namespace=self.namespace)
+            # Swap in complete objects so readers never see a partial view
+            self._redirects = redirects
+            self._exact = exact
+            self._prefixes = prefixes
+            self._case_insensitive = case_insensitive
+            self._exact_has_prefixes = self.compact and bool(prefixes)
+            self._filter = alias_filter
+            self._deadlines = deadlines
+            self._db_path = db_path
+            self._generation = current
+            self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _build_dicts(db_path, case_insensitive, namespace=data.DEFAULT_NAMESPACE):
+        redirects = data.load_redirects({"redirects": {}}, db_path, namespace)["redirects"]
+        prefixes = PrefixTrie(
+            ((alias, target) for alias, target in redirects.items()
+             if is_prefix_target(target)),
+            case_insensitive=case_insensitive,
+        )
+        if case_insensitive:
+            exact = {
+                alias_key: target
+                for alias_key, target in data.load_folded_redirects(db_path, namespace).items()
+                if not is_prefix_target(target)
+            }
+        elif prefixes:
+            exact = {
+                alias: target for alias, target in redirects.items()
+                if not is_prefix_target(target)
+            }
+        else:
+            exact = redirects
+        return redirects, exact, prefixes
+
+    @staticmethod
+    def _build_compact(db_path, case_insensitive, namespace=data.DEFAULT_NAMESPACE):
+        # Rows are streamed straight into the packed buffers; path-forwarding
+        # targets stay in the exact store and are filtered out in get().
+        redirects = CompactAliasStore(data.iter_redirects(db_path, namespace=namespace))
+        prefixes = PrefixTrie(
+            ((alias, target) for alias, target in redirects.items()
+             if is_prefix_target(target)),
+            case_insensitive=case_insensitive,
+        )
+        if case_insensitive:
+            exact = CompactAliasStore(data.iter_redirects(db_path, folded=True, namespace=namespace))
+        else:
+            exact = redirects
+        return redirects, exact, prefixes
+
+    def redirects(self, db_path):
+        """Return the alias -> redirect mapping for db_path (do not mutate)"""
+        self.warm(db_path)
+        return self._redirects
+
+    def _snapshot_deadlines(self, db_path, mapped):
+        # The snapshot has no expiry data; the (usually tiny) deadline map is
+        # re-read after local writes and once per snapshot check interval
+        key = (db_path, data.generation(db_path), mapped.case_insensitive)
+        now = time.monotonic()
+        if key != self._mapped_deadlines_key or now - self._mapped_deadlines_at >= self.snapshot.check_interval:
+            self._mapped_deadlines = data.load_expiries(db_path, folded=mapped.case_insensitive)
+            self._mapped_deadlines_key = key
+            self._mapped_deadlines_at = now
+        return self._mapped_deadlines
+
+    @staticmethod
+    def _expired(deadlines, key):
+        deadline = deadlines.get(key)
+        return deadline is not None and deadline <= time.time()
+
+    def get(self, alias, db_path):
+        """Return the redirect for an exact alias, or None if it does not exist or expired"""
+        if self.snapshot is not None:
+            mapped = self.snapshot.current(db_path)
+            if mapped is not None:
+                target = mapped.get(alias)
+                if target is not None:
+                    deadlines = self._snapshot_deadlines(db_path, mapped)
+                    key = data.normalize_alias(alias) if mapped.case_insensitive else alias
+                    if deadlines and self._expired(deadlines, key):
+                        return None
+                return target
+        self.warm(db_path)
+        if self._case_insensitive:
+            alias = data.normalize_alias(alias)
+        alias_filter = self._filter
+        if alias_filter is not None and alias not in alias_filter:
+            return None
+        target = self._exact.get(alias)
+        if self._exact_has_prefixes and target is not None and is_prefix_target(target):
+            return None
+        if self._deadlines and target is not None and self._expired(self._deadlines, alias):
+            return None
+        return target
+
+    def match_prefix(self, path, db_path):
+        """Return (template, rest) for the longest path-forwarding alias, or None"""
+        if self.snapshot is not None:
+            mapped = self.snapshot.current(db_path)
+            if mapped is not None:
+                match = mapped.prefixes.longest_match(path)
+                if match is not None:
+                    deadlines = self._snapshot_deadlines(db_path, mapped)
+                    if deadlines and self._prefix_expired(deadlines, path, match[1], mapped.case_insensitive):
+                        return None
+                return match
+        self.warm(db_path)
+        match = self._prefixes.longest_match(path)
+        if match is not None and self._deadlines and self._prefix_expired(
+                self._deadlines, path, match[1], self._case_insensitive):
+            return None
+        return match
+
+    def _prefix_expired(self, deadlines, path, rest, case_insensitive):
+        alias = path[:len(path) - len(rest)].rstrip("/")
+        return self._expired(deadlines, data.normalize_alias(alias) if case_insensitive else alias)
+
+    def clear(self):
+        """Drop the cached view"""
+        with self._lock:
+            self._db_path = None
+            self._generation = -1
+            self._redirects = {}
+            self._exact = {}
+            self._prefixes = PrefixTrie()
+            self._case_insensitive = False
+            self._exact_has_prefixes = False
+            self._filter = None
+            self._deadlines = {}
+            self.loaded_at = None
+
+
+def namespace_for_host(host):
+    """
+    Return the namespace a Host header value names: its first label, lowercased
+
+    'wiki.example.com:8080' names 'wiki'. IP addresses and empty hosts name
+    the default namespace.
+    """
+    if not host:
+        return data.DEFAULT_NAMESPACE
+    if host.startswith("["):
+        # Bracketed IPv6 literal, with or without a port
+        return data.DEFAULT_NAMESPACE
+    hostname = host.rpartition(":")[0] if ":" in host else host
+    try:
+        ipaddress.ip_address(hostname)
+        return data.DEFAULT_NAMESPACE
+    except ValueError:
+        pass
+    return hostname.partition(".")[0].lower()
+
+
+class NamespaceCaches:
+    """
+    One AliasCache per namespace, picked per request from the Host header.
+
+    The default cache (the one the snapshot, if any, is attached to) serves
+    every host that does not name an existing namespace. Which namespaces
+    exist is re-read only after data.py reports a write, so picking a cache
+    costs a few string operations, a set probe and a dict probe; each cache
+    then answers in O(1) like a single-namespace one. Caches of namespaces
+    that no longer have aliases are dropped at that point too.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._namespaces = frozenset()
+        self._namespaces_key = None
+
+    def namespaces(self, db_path):
+        """Return the set of namespaces, besides the default one, that have aliases"""
+        key = (db_path, data.generation(db_path))
+        if key != self._namespaces_key:
+            with self._lock:
+                if key != self._namespaces_key:
+                    namespaces = frozenset(data.list_namespaces(db_path))
+                    self._caches = {
+                        namespace: cache for namespace, cache in self._caches.items() if namespace in namespaces
+                    }
+                    self._namespaces = namespaces
+                    self._namespaces_key = key
+        return self._namespaces
+
+    def cache(self, namespace, db_path):
+        """Return the AliasCache of namespace, or None if it has no aliases"""
+        if namespace == data.DEFAULT_NAMESPACE:
+            return self.default
+        if namespace not in self.namespaces(db_path):
+            return None
+        cache = self._caches.get(namespace)
+        if cache is None:
+            with self._lock:
+                cache = self._caches.setdefault(
+                    namespace, AliasCache(compact=self.default.compact, namespace=namespace)
+                )
+        return cache
+
+    def for_host(self, host, db_path):
+        """Return the AliasCache serving requests for host"""
+        return self.cache(namespace_for_host(host), db_path) or self.default
+
+    def clear(self):
+        """Drop every cached view"""
+        with self._lock:
+            self._caches = {}
+            self._namespaces_key = None
+        self.default.clear()
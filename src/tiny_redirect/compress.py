@@ -0,0 +1,194 @@
+"""
+Response compression for the Bottle app.
+
+CompressionPlugin compresses route results with zstd or gzip, whichever the
+client prefers in Accept-Encoding, so the large HTML and JSON pages (the
+alias list, exports) travel small over slow links. Redirects and other
+bodiless answers, bodies under min_size, content types that do not shrink
+(images, archives) and responses that already carry a Content-Encoding are
+passed through untouched.
+
+Generator results are compressed as they stream: each chunk is flushed on
+its own, so the client still gets the first part of a page early. Streams
+are only compressed once they reach min_size; shorter ones go out as is.
+"""
+
+import zlib
+
+# zstandard is imported by the first zstd response, so a server whose
+# clients only take gzip (or nothing) never loads it
+from bottle import HTTPResponse, json_dumps, request, response
+
+ENCODINGS = ("zstd", "gzip")
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_ZSTD_LEVEL = 3
+
+# Bottle's default for routes that do not set a content type
+DEFAULT_CONTENT_TYPE = "text/html"
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def negotiate(accept_encoding, encodings=ENCODINGS):
+    """Pick the encoding from encodings the Accept-Encoding value rates highest, or None"""
+    ratings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        ratings[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = ratings.get(encoding, ratings.get("*", 0.0))
+        # Ties go to the earlier, preferred encoding
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(content_type):
+    return content_type.split(";")[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    """Incremental zstd or gzip compressor with a common flush/finish interface"""
+
+    def __init__(self, encoding, gzip_level, zstd_level):
+        if encoding == "zstd":
+            import zstandard
+            self._zstd = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._zstd_flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._zlib = None
+        else:
+            # wbits 31: a gzip header and trailer around the deflate stream
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._zstd = None
+
+    def flush(self, chunk):
+        """Compress chunk and flush it, so it can be decoded before the stream ends"""
+        if self._zstd is not None:
+            return self._zstd.compress(chunk) + self._zstd.flush(self._zstd_flush_block)
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, chunk=b""):
+        if self._zstd is not None:
+            return self._zstd.compress(chunk) + self._zstd.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush()
+
+
+class CompressionPlugin:
+    """
+    Bottle plugin compressing str, bytes and streamed route results
+
+    Routes can opt out with skip=["compress"].
+    """
+
+    name = "compress"
+    api = 2
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, gzip_level=DEFAULT_GZIP_LEVEL,
+                 zstd_level=DEFAULT_ZSTD_LEVEL):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    def apply(self, callback, route):
+        def wrapper(*args, **kwargs):
+            result = callback(*args, **kwargs)
+            if isinstance(result, dict):
+                # Bottle's JSON plugin only runs after this one; serialize
+                # here the same way so API answers are compressed too
+                response.content_type = "application/json"
+                result = json_dumps(result)
+            if isinstance(result, HTTPResponse):
+                result.body = self._compress(result.body, result)
+                return result
+            return self._compress(result, response)
+
+        return wrapper
+
+    def _encoding(self, target):
+        """Encoding to use for a response, or None to leave it alone"""
+        status = target.status_code
+        if status < 200 or 300 <= status < 400 or status in (204, 206):
+            return None
+        if "Content-Encoding" in target.headers:
+            return None
+        if not _compressible(target.headers.get("Content-Type", DEFAULT_CONTENT_TYPE)):
+            return None
+        # Whether or not this client gets it compressed, caches must keep
+        # the variants apart
+        vary = target.headers.get("Vary")
+        if vary is None:
+            target.set_header("Vary", "Accept-Encoding")
+        elif "accept-encoding" not in vary.lower():
+            target.set_header("Vary", f"{vary}, Accept-Encoding")
+        return negotiate(request.environ.get("HTTP_ACCEPT_ENCODING", ""))
+
+    @staticmethod
+    def _mark(target, encoding):
+        target.set_header("Content-Encoding", encoding)
+        if "Content-Length" in target.headers:
+            del target.headers["Content-Length"]
+        etag = target.headers.get("ETag")
+        # The compressed bytes differ, so a strong validator no longer holds
+        if etag and not etag.startswith("W/"):
+            target.set_header("ETag", f"W/{etag}")
+
+    def _compress(self, body, target):
+        if isinstance(body, (str, bytes)):
+            data = body.encode(target.charset or "utf8") if isinstance(body, str) else body
+            if len(data) < self.min_size:
+                return body
+            encoding = self._encoding(target)
+            if encoding is None:
+                return body
+            self._mark(target, encoding)
+            return _Compressor(encoding, self.gzip_level, self.zstd_level).finish(data)
+        if isinstance(body, list) and all(isinstance(part, (str, bytes)) for part in body):
+            if any(isinstance(part, str) for part in body):
+                charset = target.charset or "utf8"
+                body = [part.encode(charset) if isinstance(part, str) else part for part in body]
+            return self._compress(b"".join(body), target)
+        if hasattr(body, "__next__"):
+            return self._stream(body, target)
+        # Files and anything else Bottle serves specially
+        return body
+
+    def _stream(self, chunks, target):
+        """Buffer a generator up to min_size, then compress the rest as it arrives"""
+        charset = target.charset or "utf8"
+        buffered, size = [], 0
+        for chunk in chunks:
+            chunk = chunk.encode(charset) if isinstance(chunk, str) else chunk
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= self.min_size:
+                break
+        else:
+            # Ended below the threshold
+            yield b"".join(buffered)
+            return
+
+        # Headers are read after the first chunk, so they can still change here
+        encoding = self._encoding(target)
+        if encoding is None:
+            yield b"".join(buffered)
+            for chunk in chunks:
+                yield chunk.encode(charset) if isinstance(chunk, str) else chunk
+            return
+        self._mark(target, encoding)
+        compressor = _Compressor(encoding, self.gzip_level, self.zstd_level)
+        yield compressor.flush(b"".join(buffered))
+        for chunk in chunks:
+            chunk = chunk.encode(charset) if isinstance(chunk, str) else chunk
+            if chunk:
+                yield compressor.flush(chunk)
+        yield compressor.finish()
@@ -1,7 +1,15 @@
 import sqlite3
 import re
 import json
-from os.path import exists
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from os import environ, stat
+from os.path import exists, getsize
+from urllib.parse import quote, urlsplit, urlunsplit
+from tiny_redirect.trie import REST_PLACEHOLDER, is_prefix_target
 
 
 class ValidationError(Exception):
@@ -9,6 +17,243 @@ class ValidationError(Exception):
     pass
 
 
+# Write counter per database path, bumped after every committed change to the
+# redirects table so in-memory views (see cache.py) can tell they are stale.
+_generations = {}
+
+# Last seen ((device, inode), change counter) of each database file, and
+# when it was last compared. A change not made through this process (e.g. a
+# restore run from the command line, or another server process) moves the
+# generation forward too, noticed within CHANGE_CHECK_INTERVAL seconds.
+_file_signatures = {}
+_file_checked_at = {}
+CHANGE_CHECK_INTERVAL = 1.0
+
+# Callables run with db_path after each committed redirects write, e.g. to
+# recompile the shared alias snapshot (see snapshot.py)
+_write_listeners = []
+
+# Databases whose write listeners are held back until a bulk write finishes
+_deferred_notifications = {}
+
+# Who is making the current change, stored with each history entry (see
+# history.py); app.py sets it per request, e.g. "web 192.168.1.20"
+_change_source = ContextVar("change_source", default=None)
+
+# Aliases live in namespaces, one per virtual host (see cache.py); the
+# default namespace is the one every alias belonged to before namespaces
+DEFAULT_NAMESPACE = ""
+
+# A namespace is named like a DNS label, so it can be a Host subdomain
+_NAMESPACE_PATTERN = re.compile(r'^[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$')
+
+
+def _file_signature(db_path):
+    """
+    Return ((device, inode), change counter) of the database file, or None
+
+    SQLite bumps the counter in its header on every commit (the database
+    is not in WAL mode), so it moves by exactly one per write transaction.
+    """
+    try:
+        info = stat(db_path)
+        with open(db_path, "rb", buffering=0) as database:
+            database.seek(24)
+            counter = database.read(4)
+    except OSError:
+        return None
+    if len(counter) < 4:
+        return None
+    return (info.st_dev, info.st_ino), int.from_bytes(counter, "big")
+
+
+def _record_own_commit(db_path):
+    """
+    Record the file after a commit by this process; return True if another
+    process wrote to it since the last record (or the file was replaced)
+
+    Comparing the counter against the last record plus one means a write
+    by someone else that landed just before ours is not taken for ours.
+    """
+    seen = _file_signatures.get(db_path)
+    current = _file_signature(db_path)
+    _file_signatures[db_path] = current
+    _file_checked_at[db_path] = time.monotonic()
+    if seen is None or current is None:
+        return False
+    return current[0] != seen[0] or (current[1] - seen[1]) % 2 ** 32 != 1
+
+
+def note_own_write(db_path="redirects.db"):
+    """
+    Record a commit by this process that left the redirects table alone
+
+    Without it the file change would be taken for another process's write
+    and every cached view of db_path rebuilt.
+    """
+    if _record_own_commit(db_path):
+        database_changed(db_path)
+
+
+def _changed_elsewhere(db_path):
+    """Return True if the database file changed since its signature was recorded"""
+    current = _file_signature(db_path)
+    seen = _file_signatures.get(db_path)
+    _file_signatures[db_path] = current
+    return seen is not None and current != seen
+
+
+def _bump_generation(db_path):
+    # This process's own write; the generation moves anyway, so a write by
+    # someone else found alongside it only has to drop the settings
+    if _record_own_commit(db_path):
+        _settings_cache.pop(db_path, None)
+    _advance_generation(db_path)
+
+
+def _advance_generation(db_path):
+    if _deferred_notifications.get(db_path):
+        _deferred_notifications[db_path] += 1
+    else:
+        # Listeners run before the counter moves, so anything keyed on the
+        # generation (e.g. SnapshotReader) only re-checks once they are done
+        _notify_write_listeners(db_path)
+    _generations[db_path] = _generations.get(db_path, 0) + 1
+
+
+def _notify_write_listeners(db_path):
+    for listener in list(_write_listeners):
+        listener(db_path)
+
+
+def add_write_listener(listener):
+    """Call listener(db_path) after every committed write to the redirects table"""
+    _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+
+@contextmanager
+def deferred_write_notifications(db_path="redirects.db"):
+    """Hold back write listeners during a bulk write and notify once at the end"""
+    _deferred_notifications[db_path] = 1
+    try:
+        yield
+    finally:
+        pending = _deferred_notifications.pop(db_path, 1) > 1
+        if pending:
+            _notify_write_listeners(db_path)
+
+
+def generation(db_path="redirects.db"):
+    """
+    Return the redirects write counter for db_path
+
+    Writes by other processes are noticed from the database file's identity
+    and change counter, read at most once per CHANGE_CHECK_INTERVAL, and
+    handled like database_changed.
+    """
+    now = time.monotonic()
+    if now - _file_checked_at.get(db_path, -CHANGE_CHECK_INTERVAL) >= CHANGE_CHECK_INTERVAL:
+        _file_checked_at[db_path] = now
+        if _changed_elsewhere(db_path):
+            database_changed(db_path)
+    return _generations.get(db_path, 0)
+
+
+def database_changed(db_path="redirects.db"):
+    """Drop everything cached for db_path after its file was replaced (e.g. a restore)"""
+    _settings_cache.pop(db_path, None)
+    _file_signatures[db_path] = _file_signature(db_path)
+    _advance_generation(db_path)
+
+
+def set_change_source(source):
+    """Record source as the author of changes made by this thread or task"""
+    _change_source.set(source)
+
+
+@contextmanager
+def change_source(source):
+    """Attribute the changes made inside the block to source"""
+    token = _change_source.set(source)
+    try:
+        yield
+    finally:
+        _change_source.reset(token)
+
+
+def _intern_string(cursor, value):
+    """Return the history_strings id for value, adding it if new"""
+    if value is None:
+        return None
+    cursor.execute('INSERT OR IGNORE INTO history_strings (value) VALUES (?)', (value,))
+    if cursor.rowcount:
+        return cursor.lastrowid
+    cursor.execute('SELECT id FROM history_strings WHERE value = ?', (value,))
+    return cursor.fetchone()[0]
+
+
+def _record_change(cursor, action, alias, before, after, old_alias=None, source=None, namespace=DEFAULT_NAMESPACE):
+    """Append a history entry in the caller's transaction"""
+    cursor.execute(
+        """
+        INSERT INTO history (changed_at, action, alias_id, old_alias_id, before_id, after_id, source_id,
+                             namespace_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (time.time(), action, _intern_string(cursor, alias), _intern_string(cursor, old_alias),
+         _intern_string(cursor, before), _intern_string(cursor, after),
+         _intern_string(cursor, source or _change_source.get()),
+         # NULL for the default namespace, so older entries need no backfill
+         _intern_string(cursor, namespace or None))
+    )
+
+
+def _record_delete_all(cursor, namespace=DEFAULT_NAMESPACE):
+    """Record a delete entry for every alias of a namespace, before it is cleared"""
+    cursor.execute(
+        'INSERT OR IGNORE INTO history_strings (value) '
+        'SELECT alias FROM redirects WHERE namespace = ? UNION SELECT redirect FROM redirects WHERE namespace = ?',
+        (namespace, namespace)
+    )
+    cursor.execute(
+        """
+        INSERT INTO history (changed_at, action, alias_id, before_id, source_id, namespace_id)
+        SELECT ?, 'delete', a.id, r.id, ?, ? FROM redirects
+        JOIN history_strings a ON a.value = redirects.alias
+        JOIN history_strings r ON r.value = redirects.redirect
+        WHERE redirects.namespace = ?
+        """,
+        (time.time(), _intern_string(cursor, _change_source.get()), _intern_string(cursor, namespace or None),
+         namespace)
+    )
+
+
+def _next_version(cursor):
+    """Allocate the next sync version in the caller's transaction (see changes_since)"""
+    cursor.execute('UPDATE sync_state SET version = version + 1 RETURNING version')
+    return cursor.fetchone()[0]
+
+
+def _record_tombstones(cursor, keys):
+    """Mark (namespace, alias) keys as deleted at a new sync version, so delta clients drop them"""
+    version = _next_version(cursor)
+    cursor.executemany(
+        'INSERT OR REPLACE INTO redirect_tombstones (namespace, alias, version) VALUES (?, ?, ?)',
+        [(namespace, alias, version) for namespace, alias in keys]
+    )
+
+
+def _begin_write(cursor):
+    """Take the write lock now, so rows read before a write cannot change under it"""
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+
+
 def dict_factory(cursor, row):
     dictionary = {}
     for idx, col in enumerate(cursor.description):
@@ -25,18 +270,42 @@ def str_to_bool(value):
     return bool(value)
 
 
-def validate_alias(alias):
-    """Validate alias input - alphanumeric, dash, underscore, dot only"""
+def normalize_alias(alias):
+    """Return the case-folded key used for case-insensitive alias matching"""
+    return alias.lower()
+
+
+# Patterns used on every alias and target, compiled once for bulk imports
+_ALIAS_SEGMENT_PATTERN = re.compile(r'^[A-Za-z0-9\-_\.]+$')
+_HOST_CONTROL_PATTERN = re.compile(r'[\s\x00-\x1f\x7f]')
+_HOSTNAME_PATTERN = re.compile(r'^[A-Za-z0-9\-\.]+$')
+
+RESERVED_ALIASES = frozenset([
+    'add', 'del', 'delete', 'settings', 'update_settings', 'shutdown',
+    'about', 'redirects', 'img', 'js', 'css', 'favicon.ico',
+    'healthz', 'readyz', 'api',
+])
+
+
+def validate_alias(alias, allow_segments=False):
+    """
+    Validate alias input - alphanumeric, dash, underscore, dot only
+
+    Path-forwarding aliases (allow_segments=True) may also be several such
+    segments joined by '/', e.g. 'team/wiki'.
+    """
     if not alias:
         raise ValidationError("Alias cannot be empty")
     if len(alias) > 100:
         raise ValidationError("Alias must be 100 characters or less")
-    if not re.match(r'^[A-Za-z0-9\-_\.]+$', alias):
-        raise ValidationError("Alias can only contain letters, numbers, dashes, underscores, and dots")
+    segments = alias.split('/') if allow_segments else [alias]
+    for segment in segments:
+        if not _ALIAS_SEGMENT_PATTERN.match(segment):
+            if allow_segments:
+                raise ValidationError("Alias segments can only contain letters, numbers, dashes, underscores, and dots")
+            raise ValidationError("Alias can only contain letters, numbers, dashes, underscores, and dots")
     # Prevent reserved routes
-    reserved = ['add', 'del', 'delete', 'settings', 'update_settings', 'shutdown',
-                'about', 'redirects', 'img', 'js', 'css', 'favicon.ico']
-    if alias.lower() in reserved:
+    if segments[0].lower() in RESERVED_ALIASES:
         raise ValidationError(f"'{alias}' is a reserved route name")
     return True
 
@@ -45,12 +314,91 @@ def validate_redirect(redirect):
     """Validate redirect URL input"""
     if not redirect:
         raise ValidationError("Redirect URL cannot be empty")
+    if not isinstance(redirect, str):
+        raise ValidationError("Redirect URL must be a string")
     if len(redirect) > 2000:
         raise ValidationError("Redirect URL must be 2000 characters or less")
     # Basic URL validation - allow URLs with or without protocol
     return True
 
 
+# Schemes a redirect target may use. Targets are sent as Location and shown
+# as links on the admin pages, so javascript:, data: and the like are refused;
+# TINYREDIRECT_REDIRECT_SCHEMES (comma-separated) replaces the list.
+REDIRECT_SCHEMES = tuple(
+    scheme.strip().lower()
+    for scheme in environ.get("TINYREDIRECT_REDIRECT_SCHEMES", "http,https").split(",")
+    if scheme.strip()
+)
+
+
+def _check_scheme(scheme):
+    if scheme.lower() not in REDIRECT_SCHEMES:
+        allowed = " or ".join(f"{name}://" for name in REDIRECT_SCHEMES)
+        raise ValidationError(f"Redirect URL must start with {allowed}")
+
+
+# Characters kept as-is when a redirect target is percent-encoded; '%' keeps
+# existing escapes intact so canonicalizing twice changes nothing
+_URL_SAFE = "/:@!$&'()*+,;=-._~%"
+
+# Targets that canonicalize_redirect would return unchanged: a lowercase
+# scheme, a plain ASCII host without port or user, and only characters it
+# keeps as-is. Most stored and exported targets match, and skip the parse.
+_URL_CHARS = r"A-Za-z0-9/:@!$&'()*+,;=\-._~%"
+_CANONICAL_PATTERN = re.compile(
+    rf"^[a-z][a-z0-9+.\-]*://[A-Za-z0-9.\-]+"
+    rf"(?:/[{_URL_CHARS}]*)?(?:\?[{_URL_CHARS}?]+)?(?:#[{_URL_CHARS}?#]+)?$"
+)
+
+
+def _quote_url_part(part, safe=_URL_SAFE):
+    # {rest} placeholders must survive encoding for path-forwarding targets
+    return REST_PLACEHOLDER.join(quote(piece, safe=safe) for piece in part.split(REST_PLACEHOLDER))
+
+
+def canonicalize_redirect(redirect):
+    """
+    Return the form of a redirect target that is stored and sent as Location
+
+    Adds http:// when no scheme is given, checks the scheme against
+    REDIRECT_SCHEMES and the host and port, IDNA encodes an international
+    host and percent-encodes the path, query and fragment. Canonical
+    targets are left unchanged.
+    """
+    validate_redirect(redirect)
+    if _CANONICAL_PATTERN.match(redirect):
+        _check_scheme(redirect.partition("://")[0])
+        return redirect
+    redirect = redirect.strip()
+    if "://" not in redirect:
+        redirect = "http://" + redirect
+    try:
+        parts = urlsplit(redirect)
+        parts.port
+    except ValueError:
+        raise ValidationError("Redirect URL has an invalid host or port")
+    _check_scheme(parts.scheme)
+    netloc = parts.netloc
+    if not parts.hostname or _HOST_CONTROL_PATTERN.search(netloc):
+        raise ValidationError("Redirect URL must include a valid host")
+    if not netloc.isascii():
+        try:
+            netloc = netloc.encode("idna").decode("ascii")
+        except UnicodeError:
+            raise ValidationError("Redirect URL has an invalid host")
+    canonical = urlunsplit((
+        parts.scheme,
+        netloc,
+        _quote_url_part(parts.path),
+        _quote_url_part(parts.query, _URL_SAFE + "?"),
+        _quote_url_part(parts.fragment, _URL_SAFE + "?#"),
+    ))
+    if len(canonical) > 2000:
+        raise ValidationError("Redirect URL must be 2000 characters or less")
+    return canonical
+
+
 def validate_port(port):
     """Validate port number"""
     try:
@@ -69,7 +417,7 @@ def validate_hostname(hostname):
     if len(hostname) > 255:
         raise ValidationError("Hostname must be 255 characters or less")
     # Basic validation - allow IP addresses and hostnames
-    if not re.match(r'^[A-Za-z0-9\-\.]+$', hostname):
+    if not _HOSTNAME_PATTERN.match(hostname):
         raise ValidationError("Invalid hostname format")
     return True
 
@@ -85,6 +433,79 @@ def validate_shortname(shortname):
     return True
 
 
+def validate_rate_limits(spec):
+    """Validate a 'class=rate:burst,...' rate limit spec; empty turns rate limiting off"""
+    from tiny_redirect.ratelimit import parse_limits
+
+    spec = spec.strip()
+    try:
+        parse_limits(spec)
+    except ValueError as e:
+        raise ValidationError(str(e))
+    return spec
+
+
+def validate_trusted_proxies(spec):
+    """Validate a comma-separated list of proxy addresses or networks"""
+    from tiny_redirect.ratelimit import parse_proxies
+
+    spec = ",".join(part.strip() for part in spec.split(",") if part.strip())
+    try:
+        parse_proxies(spec)
+    except ValueError as e:
+        raise ValidationError(str(e))
+    return spec
+
+
+def validate_log_level(level):
+    """Validate a log level name; empty means the level picked at startup"""
+    level = level.strip().upper()
+    if level and level not in LOG_LEVELS:
+        raise ValidationError(f"Log level must be one of {', '.join(LOG_LEVELS)}")
+    return level
+
+
+def validate_namespace(namespace):
+    """Validate a namespace name: empty for the default one, else one lowercase DNS label"""
+    if namespace == DEFAULT_NAMESPACE:
+        return namespace
+    if not isinstance(namespace, str) or not _NAMESPACE_PATTERN.match(namespace):
+        raise ValidationError(
+            "Namespace must be 1-63 lowercase letters, numbers and dashes, not starting or ending with a dash"
+        )
+    return namespace
+
+
+def validate_expires_at(expires_at):
+    """Return expires_at as a Unix timestamp, or None for an alias that never expires"""
+    if expires_at is None or expires_at == "":
+        return None
+    expires_at = parse_time(expires_at)
+    if expires_at <= 0:
+        raise ValidationError("Expiry time must be after 1970-01-01")
+    return expires_at
+
+
+def parse_time(value, local=False):
+    """
+    Accept a Unix timestamp or an ISO 8601 time and return a Unix timestamp
+
+    Times without an offset are UTC, or the server's local time with
+    local=True (e.g. a datetime-local form field).
+    """
+    if isinstance(value, bool):
+        raise ValidationError(f"Invalid time: {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValidationError(f"Invalid time: {value!r}, expected ISO 8601 or a Unix timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone() if local else parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
 def load_settings(data, db_path="redirects.db"):
     connection = sqlite3.connect(db_path)
     connection.row_factory = dict_factory
@@ -97,19 +518,45 @@ def load_settings(data, db_path="redirects.db"):
     return data
 
 
-def load_redirects(data, db_path="redirects.db"):
+def load_redirects(data, db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
     connection = sqlite3.connect(db_path)
     connection.row_factory = dict_factory
     cursor = connection.cursor()
-    sql_query = "SELECT * FROM redirects"
+    sql_query = "SELECT * FROM redirects WHERE namespace = ? ORDER BY rowid"
 
-    cursor.execute(sql_query)
+    cursor.execute(sql_query, (namespace,))
     for redirect in cursor.fetchall():
         data["redirects"].update({redirect["alias"]: redirect["redirect"]})
     connection.close()
     return data
 
 
+def count_redirects(db_path="redirects.db"):
+    """Return the number of redirects without loading the table"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM redirects")
+        return cursor.fetchone()[0]
+    finally:
+        connection.close()
+
+
+def ping(db_path="redirects.db"):
+    """Return True if the database exists and answers a trivial query"""
+    if not exists(db_path):
+        return False
+    try:
+        connection = sqlite3.connect(db_path, timeout=1)
+        try:
+            connection.execute("SELECT 1 FROM settings LIMIT 1").fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
 def load_data(db_path="redirects.db"):
     data = {
         "settings": {},
@@ -120,21 +567,432 @@ def load_data(db_path="redirects.db"):
     return data
 
 
-def add_alias(alias, redirect, db_path="redirects.db"):
-    """Add a new alias redirect with parameterized query"""
-    # Validate inputs
-    validate_alias(alias)
-    validate_redirect(redirect)
+def add_alias(alias, redirect, db_path="redirects.db", expires_at=None, namespace=DEFAULT_NAMESPACE):
+    """Add a new alias redirect, optionally expiring at a Unix timestamp"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        _insert_alias(cursor, alias, redirect, expires_at, namespace)
+        connection.commit()
+        _bump_generation(db_path)
+    except sqlite3.OperationalError as error:
+        connection.rollback()
+        raise error
+    finally:
+        connection.close()
+
+
+def _case_insensitive_enabled(cursor):
+    cursor.execute('SELECT "case-insensitive" FROM settings')
+    return str_to_bool(cursor.fetchone()[0])
+
+
+def _insert_alias(cursor, alias, redirect, expires_at=None, namespace=DEFAULT_NAMESPACE):
+    """Validate and insert one alias on an open cursor (caller commits)"""
+    validate_namespace(namespace)
+    validate_alias(alias, allow_segments=isinstance(redirect, str) and is_prefix_target(redirect))
+    redirect = canonicalize_redirect(redirect)
+    expires_at = validate_expires_at(expires_at)
+
+    alias_key = normalize_alias(alias)
+    if _case_insensitive_enabled(cursor):
+        _check_alias_key_free(cursor, alias, alias_key, namespace=namespace)
+    try:
+        cursor.execute(
+            """
+            INSERT INTO redirects (namespace, alias, redirect, alias_key, expires_at, version)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (namespace, alias, redirect, alias_key, expires_at, _next_version(cursor))
+        )
+    except sqlite3.IntegrityError:
+        raise ValidationError(f"Alias '{alias}' already exists")
+    cursor.execute('DELETE FROM redirect_tombstones WHERE namespace = ? AND alias = ?', (namespace, alias))
+    _record_change(cursor, "add", alias, None, redirect, namespace=namespace)
+
+
+def _update_alias_target(cursor, alias, redirect, namespace=DEFAULT_NAMESPACE):
+    """Point an existing alias at a new redirect on an open cursor (caller commits)"""
+    redirect = canonicalize_redirect(redirect)
+    if "/" in alias and not is_prefix_target(redirect):
+        raise ValidationError(f"Alias '{alias}' has several segments and needs a {REST_PLACEHOLDER} redirect")
+    _begin_write(cursor)
+    cursor.execute('SELECT redirect FROM redirects WHERE namespace = ? AND alias = ?', (namespace, alias))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValidationError(f"Alias '{alias}' not found")
+    if row[0] == redirect:
+        return
+    cursor.execute(
+        'UPDATE redirects SET redirect = ?, version = ? WHERE namespace = ? AND alias = ?',
+        (redirect, _next_version(cursor), namespace, alias)
+    )
+    _record_change(cursor, "edit", alias, row[0], redirect, namespace=namespace)
+
+
+def _delete_alias(cursor, alias, missing_ok=False, namespace=DEFAULT_NAMESPACE):
+    """Delete one alias on an open cursor (caller commits)"""
+    cursor.execute(
+        'DELETE FROM redirects WHERE namespace = ? AND alias = ? RETURNING redirect', (namespace, alias)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        if missing_ok:
+            return
+        raise ValidationError(f"Alias '{alias}' not found")
+    _record_tombstones(cursor, [(namespace, alias)])
+    _record_change(cursor, "delete", alias, row[0], None, namespace=namespace)
+
+
+def _check_alias_key_free(cursor, alias, alias_key, ignore=None, namespace=DEFAULT_NAMESPACE):
+    """Raise if another alias of the namespace already uses alias_key (case-insensitive mode)"""
+    cursor.execute(
+        'SELECT alias FROM redirects WHERE namespace = ? AND alias_key = ? AND alias NOT IN (?, ?) LIMIT 1',
+        (namespace, alias_key, alias, ignore if ignore is not None else alias)
+    )
+    row = cursor.fetchone()
+    if row:
+        raise ValidationError(f"Alias '{alias}' collides with existing alias '{row[0]}'")
+
+
+def find_alias(alias, db_path="redirects.db", case_insensitive=False, namespace=DEFAULT_NAMESPACE):
+    """Look up a single redirect through the alias or alias_key index"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        if case_insensitive:
+            cursor.execute(
+                """
+                SELECT redirect, expires_at FROM redirects WHERE namespace = ? AND alias_key = ?
+                ORDER BY rowid LIMIT 1
+                """,
+                (namespace, normalize_alias(alias))
+            )
+        else:
+            cursor.execute(
+                'SELECT redirect, expires_at FROM redirects WHERE namespace = ? AND alias = ?', (namespace, alias)
+            )
+        row = cursor.fetchone()
+        # Expired rows count as missing until the sweeper removes them
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+    finally:
+        connection.close()
+
+
+def iter_redirects(db_path="redirects.db", folded=False, namespace=DEFAULT_NAMESPACE):
+    """
+    Stream (alias, redirect) tuples without building a dict per row.
+
+    With folded=True the first element is alias_key and rows come newest
+    first, so feeding them into a mapping leaves the oldest alias for each
+    key in place, matching find_alias.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        if folded:
+            cursor.execute(
+                'SELECT alias_key, redirect FROM redirects WHERE namespace = ? ORDER BY rowid DESC', (namespace,)
+            )
+        else:
+            cursor.execute('SELECT alias, redirect FROM redirects WHERE namespace = ? ORDER BY rowid', (namespace,))
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        connection.close()
+
+
+def load_folded_redirects(db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
+    """
+    Load the alias_key -> redirect mapping for case-insensitive matching.
+
+    When several aliases share a key the oldest row wins, matching find_alias.
+    """
+    return dict(iter_redirects(db_path, folded=True, namespace=namespace))
+
+
+def list_namespaces(db_path="redirects.db"):
+    """Return the names of the namespaces that have aliases, besides the default one"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT DISTINCT namespace FROM redirects WHERE namespace != '' ORDER BY namespace")
+        return [namespace for (namespace,) in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def load_expiries(db_path="redirects.db", folded=False, namespace=DEFAULT_NAMESPACE):
+    """
+    Return {alias: expires_at} for the aliases that expire
+
+    With folded=True the keys are alias_key values and, like
+    load_folded_redirects, the oldest alias for a key decides.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        if folded:
+            cursor.execute(
+                """
+                SELECT alias_key, expires_at FROM redirects WHERE namespace = ? AND alias_key IN (
+                    SELECT alias_key FROM redirects WHERE namespace = ? AND expires_at IS NOT NULL
+                ) ORDER BY rowid DESC
+                """,
+                (namespace, namespace)
+            )
+            return {key: expires_at for key, expires_at in dict(cursor.fetchall()).items()
+                    if expires_at is not None}
+        cursor.execute(
+            'SELECT alias, expires_at FROM redirects WHERE namespace = ? AND expires_at IS NOT NULL', (namespace,)
+        )
+        return dict(cursor.fetchall())
+    finally:
+        connection.close()
+
+
+def load_link_status(db_path="redirects.db"):
+    """Return {redirect: {"ok", "status", "error", "checked_at"}} from the last link checks"""
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = dict_factory
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT redirect, ok, status, error, checked_at FROM link_checks')
+        return {row.pop("redirect"): row for row in cursor.fetchall()}
+    finally:
+        connection.close()
+
+
+def next_expiry(db_path="redirects.db"):
+    """Return the earliest expires_at in the table, or None if nothing expires"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT min(expires_at) FROM redirects WHERE expires_at IS NOT NULL')
+        return cursor.fetchone()[0]
+    finally:
+        connection.close()
+
+
+def sync_version(db_path="redirects.db"):
+    """Return the current delta sync version: it grows with every redirects write"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT version FROM sync_state')
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        connection.close()
+
+
+def changes_since(since, db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
+    """
+    Return what changed in a namespace's aliases after sync version since
+
+    The result has the current "version", the "changed" aliases (added or
+    modified, with redirect and expires_at) and the "deleted" alias names.
+    "reset" is True when the caller must replace its copy instead of
+    patching it: for since=0, and when since is ahead of this database,
+    e.g. after a restore from backup; "changed" then lists every alias.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        # One read transaction, so the rows match the version returned
+        cursor.execute("BEGIN")
+        cursor.execute('SELECT version FROM sync_state')
+        row = cursor.fetchone()
+        version = row[0] if row else 0
+        reset = since <= 0 or since > version
+        if reset:
+            since = 0
+        cursor.execute(
+            """
+            SELECT alias, redirect, expires_at FROM redirects WHERE namespace = ? AND version > ?
+            ORDER BY version, alias
+            """,
+            (namespace, since)
+        )
+        changed = [
+            {"alias": alias, "redirect": redirect, "expires_at": expires_at}
+            for alias, redirect, expires_at in cursor.fetchall()
+        ]
+        deleted = []
+        if not reset:
+            cursor.execute(
+                """
+                SELECT alias FROM redirect_tombstones WHERE namespace = ? AND version > ?
+                ORDER BY version, alias
+                """,
+                (namespace, since)
+            )
+            deleted = [alias for (alias,) in cursor.fetchall()]
+        connection.rollback()
+    finally:
+        connection.close()
+    return {"version": version, "reset": reset, "changed": changed, "deleted": deleted}
 
+
+def _set_expiry(cursor, alias, expires_at, namespace=DEFAULT_NAMESPACE):
+    """Set or clear (None) the expiry of an alias on an open cursor (caller commits)"""
+    expires_at = validate_expires_at(expires_at)
+    cursor.execute(
+        'UPDATE redirects SET expires_at = ?, version = ? WHERE namespace = ? AND alias = ?',
+        (expires_at, _next_version(cursor), namespace, alias)
+    )
+    if cursor.rowcount == 0:
+        raise ValidationError(f"Alias '{alias}' not found")
+
+
+def set_alias_expiry(alias, expires_at, db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
+    """Make an alias expire at a Unix timestamp, or never with None"""
     connection = sqlite3.connect(db_path)
-    add_sql = 'INSERT INTO redirects (alias, redirect) VALUES (?, ?)'
     try:
         cursor = connection.cursor()
-        cursor.execute(add_sql, (alias, redirect))
+        _set_expiry(cursor, alias, expires_at, namespace)
         connection.commit()
+        _bump_generation(db_path)
+    except sqlite3.OperationalError as error:
+        connection.rollback()
+        raise error
+    finally:
+        connection.close()
+
+
+# Aliases deleted per sweep_expired transaction
+EXPIRY_BATCH_SIZE = 500
+
+
+def sweep_expired(db_path="redirects.db", now=None, batch_size=EXPIRY_BATCH_SIZE):
+    """
+    Delete the aliases whose expiry has passed; returns how many were removed
+
+    Rows are found through the expires_at index and deleted batch_size at a
+    time, each batch in its own short transaction, so a large wave of
+    expiries never holds the write lock for long.
+    """
+    now = time.time() if now is None else now
+    removed = 0
+    while True:
+        connection = sqlite3.connect(db_path)
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                DELETE FROM redirects WHERE rowid IN (
+                    SELECT rowid FROM redirects WHERE expires_at <= ? LIMIT ?
+                ) RETURNING namespace, alias, redirect
+                """,
+                (now, batch_size)
+            )
+            rows = cursor.fetchall()
+            if rows:
+                _record_tombstones(cursor, [(namespace, alias) for namespace, alias, _ in rows])
+            for namespace, alias, redirect in rows:
+                _record_change(cursor, "delete", alias, redirect, None, source="expiry", namespace=namespace)
+            connection.commit()
+        except sqlite3.OperationalError as error:
+            connection.rollback()
+            raise error
+        finally:
+            connection.close()
+        if rows:
+            removed += len(rows)
+            _bump_generation(db_path)
+        if len(rows) < batch_size:
+            return removed
+
+
+def find_alias_key_collisions(db_path="redirects.db"):
+    """
+    Return {alias_key: [aliases]} for keys shared by more than one alias
+
+    Keys in other namespaces than the default one are given as namespace:alias_key.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            SELECT namespace, alias_key, group_concat(alias, char(10)) FROM redirects
+            GROUP BY namespace, alias_key HAVING COUNT(*) > 1
+            """
+        )
+        return {
+            f"{namespace}:{key}" if namespace else key: aliases.split("\n")
+            for namespace, key, aliases in cursor.fetchall()
+        }
+    finally:
+        connection.close()
+
+
+def update_alias(alias, redirect, db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
+    """Point an existing alias at a new redirect with a single UPDATE"""
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        _update_alias_target(cursor, alias, redirect, namespace)
+        connection.commit()
+        _bump_generation(db_path)
+    except sqlite3.OperationalError as error:
+        connection.rollback()
+        raise error
+    finally:
+        connection.close()
+
+
+def rename_alias(old_alias, new_alias, redirect=None, db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
+    """
+    Rename an alias, optionally changing its redirect, with a single UPDATE
+
+    The UNIQUE constraint on alias is the conflict check, so the old alias
+    stays resolvable until the transaction commits and is never lost if the
+    new name is taken.
+    """
+    validate_alias(new_alias, allow_segments=True)
+    if redirect is not None:
+        redirect = canonicalize_redirect(redirect)
+
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        _begin_write(cursor)
+        new_key = normalize_alias(new_alias)
+        if _case_insensitive_enabled(cursor):
+            _check_alias_key_free(cursor, new_alias, new_key, ignore=old_alias, namespace=namespace)
+        cursor.execute('SELECT redirect FROM redirects WHERE namespace = ? AND alias = ?', (namespace, old_alias))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValidationError(f"Alias '{old_alias}' not found")
+        # Multi-segment names are only valid for path-forwarding targets,
+        # which is checked against the stored target when none is given.
+        cursor.execute(
+            """
+            UPDATE redirects SET alias = ?, alias_key = ?, redirect = COALESCE(?, redirect), version = ?
+            WHERE namespace = ? AND alias = ? AND (? = 0 OR instr(COALESCE(?, redirect), ?) > 0)
+            RETURNING redirect
+            """,
+            (new_alias, new_key, redirect, _next_version(cursor), namespace, old_alias,
+             int("/" in new_alias), redirect, REST_PLACEHOLDER)
+        )
+        renamed = cursor.fetchone()
+        if renamed is None:
+            validate_alias(new_alias)
+        # To a delta client a rename is the old name going away
+        _record_tombstones(cursor, [(namespace, old_alias)])
+        cursor.execute('DELETE FROM redirect_tombstones WHERE namespace = ? AND alias = ?', (namespace, new_alias))
+        _record_change(cursor, "rename", new_alias, row[0], renamed[0], old_alias=old_alias, namespace=namespace)
+        connection.commit()
+        _bump_generation(db_path)
     except sqlite3.IntegrityError:
         connection.rollback()
-        raise ValidationError(f"Alias '{alias}' already exists")
+        raise ValidationError(f"Alias '{new_alias}' already exists")
     except sqlite3.OperationalError as error:
         connection.rollback()
         raise error
@@ -142,14 +1000,117 @@ def add_alias(alias, redirect, db_path="redirects.db"):
         connection.close()
 
 
-def delete_alias(alias, db_path="redirects.db"):
+# Upper bound on operations accepted by apply_batch in one call
+MAX_BATCH_OPERATIONS = 10000
+
+BATCH_OPERATIONS = {
+    "create": "created",
+    "update": "updated",
+    "delete": "deleted",
+}
+
+
+def apply_batch(operations, db_path="redirects.db", atomic=False, namespace=DEFAULT_NAMESPACE):
+    """
+    Apply many create/update/delete operations in one transaction
+
+    Args:
+        operations: list of dicts with "op" ("create", "update" or "delete"),
+            "alias", an optional "namespace" and, for create/update,
+            "redirect" and an optional "expires_at" (Unix timestamp or
+            ISO 8601; null = never)
+        db_path: Path to database
+        namespace: Namespace of the operations that do not name one
+        atomic: If True, any failed operation rolls back the whole batch.
+            Otherwise each operation runs in its own savepoint and failed
+            ones are skipped.
+
+    Returns:
+        dict with "committed" and a per-operation "results" list
+    """
+    if not isinstance(operations, list):
+        raise ValidationError("'operations' must be a list")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValidationError(f"A batch can contain at most {MAX_BATCH_OPERATIONS} operations")
+
+    results = []
+    failed = 0
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for index, operation in enumerate(operations):
+            result = {"index": index}
+            results.append(result)
+            if not isinstance(operation, dict):
+                result.update(status="error", error="Operation must be an object")
+                failed += 1
+                continue
+            op = operation.get("op")
+            alias = operation.get("alias")
+            item_namespace = operation.get("namespace", namespace)
+            result.update(op=op, alias=alias)
+            if item_namespace != namespace:
+                result["namespace"] = item_namespace
+
+            cursor.execute("SAVEPOINT batch_item")
+            try:
+                if op not in BATCH_OPERATIONS:
+                    raise ValidationError(f"Unknown operation: {op!r}")
+                if not isinstance(alias, str):
+                    raise ValidationError("Alias cannot be empty")
+                validate_namespace(item_namespace)
+                if op == "create":
+                    _insert_alias(cursor, alias, operation.get("redirect"), operation.get("expires_at"),
+                                  item_namespace)
+                elif op == "update":
+                    _update_alias_target(cursor, alias, operation.get("redirect"), item_namespace)
+                    if "expires_at" in operation:
+                        _set_expiry(cursor, alias, operation["expires_at"], item_namespace)
+                else:
+                    _delete_alias(cursor, alias, namespace=item_namespace)
+                cursor.execute("RELEASE batch_item")
+                result["status"] = BATCH_OPERATIONS[op]
+            except ValidationError as e:
+                cursor.execute("ROLLBACK TO batch_item")
+                cursor.execute("RELEASE batch_item")
+                result.update(status="error", error=str(e))
+                failed += 1
+
+        committed = not (atomic and failed)
+        if committed:
+            cursor.execute("COMMIT")
+            if failed < len(operations):
+                _bump_generation(db_path)
+        else:
+            cursor.execute("ROLLBACK")
+            for result in results:
+                if result.get("status") != "error":
+                    result["status"] = "rolled_back"
+    except sqlite3.OperationalError as error:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise error
+    finally:
+        connection.close()
+
+    return {
+        "atomic": atomic,
+        "committed": committed,
+        "succeeded": len(operations) - failed if committed else 0,
+        "failed": failed,
+        "results": results,
+    }
+
+
+def delete_alias(alias, db_path="redirects.db", namespace=DEFAULT_NAMESPACE):
     """Delete an alias with parameterized query"""
     connection = sqlite3.connect(db_path)
-    deletion_sql = 'DELETE FROM redirects WHERE alias = ?'
     try:
         cursor = connection.cursor()
-        cursor.execute(deletion_sql, (alias,))
+        _delete_alias(cursor, alias, missing_ok=True, namespace=namespace)
         connection.commit()
+        _bump_generation(db_path)
     except sqlite3.OperationalError as error:
         connection.rollback()
         raise error
@@ -157,40 +1118,343 @@ def delete_alias(alias, db_path="redirects.db"):
         connection.close()
 
 
-def update_setting(setting, new_value, db_path="redirects.db"):
-    """Update a setting with parameterized query - simplified without current_value check"""
-    # Validate based on setting type
+# Settings columns that hold 'True'/'False' strings
+BOOLEAN_SETTINGS = ('bottle-debug', 'bottle-reloader', 'hide-console', 'case-insensitive')
+
+VALID_SETTINGS = ['hostname', 'port', 'shortname', 'bottle-debug',
+                  'bottle-reloader', 'bottle-engine', 'theme', 'hide-console',
+                  'case-insensitive', 'rate-limits', 'log-level', 'trusted-proxies']
+
+# Levels accepted by the log-level setting
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+# Settings whose change alters alias matching, so in-memory views must rebuild
+MATCHING_SETTINGS = ('case-insensitive',)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Typed view of the settings row; column names use '-' where fields use '_'"""
+
+    hostname: str = "127.0.0.1"
+    port: int = 80
+    shortname: str = "r"
+    bottle_debug: bool = False
+    bottle_reloader: bool = False
+    bottle_engine: str = "wsgiref"
+    theme: str = "Light"
+    hide_console: bool = False
+    case_insensitive: bool = False
+    rate_limits: str = ""
+    log_level: str = ""
+    trusted_proxies: str = ""
+
+    @classmethod
+    def from_row(cls, row):
+        values = {}
+        for field in fields(cls):
+            column = field.name.replace("_", "-")
+            if row.get(column) is None:
+                continue
+            value = row[column]
+            if field.type is bool:
+                value = str_to_bool(value)
+            elif field.type is int:
+                value = int(value)
+            values[field.name] = value
+        return cls(**values)
+
+
+# Settings objects per database path, dropped whenever settings are written
+_settings_cache = {}
+
+
+def get_settings(db_path="redirects.db"):
+    """Return the cached Settings for db_path, reading the row on first use"""
+    # Drops the cached row if another process changed the database
+    generation(db_path)
+    settings = _settings_cache.get(db_path)
+    if settings is None:
+        settings = Settings.from_row(load_settings({}, db_path)["settings"])
+        _settings_cache[db_path] = settings
+    return settings
+
+
+def _validate_setting(setting, new_value):
+    """Validate one setting and return the value to store"""
+    if setting not in VALID_SETTINGS:
+        raise ValidationError(f"Invalid setting: {setting}")
     if setting == 'port':
         new_value = str(validate_port(new_value))
     elif setting == 'hostname':
         validate_hostname(new_value)
     elif setting == 'shortname':
         validate_shortname(new_value)
-    elif setting in ('bottle-debug', 'bottle-reloader', 'hide-console'):
+    elif setting == 'rate-limits':
+        new_value = validate_rate_limits(new_value)
+    elif setting == 'log-level':
+        new_value = validate_log_level(new_value)
+    elif setting == 'trusted-proxies':
+        new_value = validate_trusted_proxies(new_value)
+    elif setting in BOOLEAN_SETTINGS:
         # Normalize boolean values
         new_value = 'True' if str_to_bool(new_value) else 'False'
+    return new_value
+
 
+def update_settings(changes, db_path="redirects.db"):
+    """
+    Validate every setting in changes, then apply them all in one transaction
+
+    Args:
+        changes: dict of setting column name -> new value
+        db_path: Path to database
+    """
+    validated = {setting: _validate_setting(setting, value) for setting, value in changes.items()}
+    if not validated:
+        return
+
+    # Column names come from VALID_SETTINGS, not user input
+    assignments = ", ".join(f'"{setting}" = ?' for setting in validated)
+    update_sql = f'UPDATE settings SET {assignments}'
     connection = sqlite3.connect(db_path)
-    # Use parameterized query - setting name is from our code, not user input
-    valid_settings = ['hostname', 'port', 'shortname', 'bottle-debug',
-                      'bottle-reloader', 'bottle-engine', 'theme', 'hide-console']
-    if setting not in valid_settings:
-        raise ValidationError(f"Invalid setting: {setting}")
+    try:
+        cursor = connection.cursor()
+        cursor.execute(update_sql, tuple(validated.values()))
+        connection.commit()
+    except sqlite3.OperationalError as error:
+        connection.rollback()
+        raise error
+    finally:
+        connection.close()
+        _settings_cache.pop(db_path, None)
+
+    if any(setting in MATCHING_SETTINGS for setting in validated):
+        _bump_generation(db_path)
+    else:
+        note_own_write(db_path)
+
 
-    update_sql = f'UPDATE settings SET "{setting}" = ?'
+def update_setting(setting, new_value, db_path="redirects.db"):
+    """Update a single setting; see update_settings"""
+    update_settings({setting: new_value}, db_path)
+
+
+# Columns added after the original schema, applied to existing databases by
+# migrate_database. Each entry is (table, column, definition).
+SCHEMA_COLUMNS = [
+    ("settings", "case-insensitive", "TEXT DEFAULT 'False'"),
+    ("settings", "rate-limits", "TEXT DEFAULT ''"),
+    ("settings", "log-level", "TEXT DEFAULT ''"),
+    ("settings", "trusted-proxies", "TEXT DEFAULT ''"),
+    ("redirects", "alias_key", "TEXT"),
+    ("redirects", "expires_at", "REAL"),
+    # Sync version of the row's last change, see changes_since
+    ("redirects", "version", "INTEGER"),
+    # NULL for the default namespace, else the history_strings id of its name
+    ("history", "namespace_id", "INTEGER"),
+]
+
+# Tables whose key changed since the first release. SQLite cannot alter a
+# UNIQUE or PRIMARY KEY constraint, so a table still missing the column is
+# rebuilt from the {name} template: its rows (and rowids, which keep their
+# insertion order) are copied over and the old table is dropped.
+# Each entry is (table, column, template).
+SCHEMA_REBUILDS = [
+    ("redirects", "namespace", """
+    CREATE TABLE "{name}" (
+        "namespace"	TEXT NOT NULL DEFAULT '',
+        "alias"	TEXT,
+        "redirect"	TEXT,
+        "alias_key"	TEXT,
+        "expires_at"	REAL,
+        "version"	INTEGER,
+        UNIQUE ("namespace", "alias")
+    )
+    """),
+    ("redirect_tombstones", "namespace", """
+    CREATE TABLE "{name}" (
+        "namespace"	TEXT NOT NULL DEFAULT '',
+        "alias"	TEXT NOT NULL,
+        "version"	INTEGER NOT NULL,
+        PRIMARY KEY ("namespace", "alias")
+    )
+    """),
+]
+
+# Tables added after the first release. Every add, edit, rename and delete
+# goes into history; alias and redirect strings are stored once in
+# history_strings and referenced by id, see _record_change.
+SCHEMA_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS "history_strings" (
+        "id"	INTEGER PRIMARY KEY,
+        "value"	TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "history" (
+        "id"	INTEGER PRIMARY KEY,
+        "changed_at"	REAL NOT NULL,
+        "action"	TEXT NOT NULL,
+        "alias_id"	INTEGER NOT NULL,
+        "old_alias_id"	INTEGER,
+        "before_id"	INTEGER,
+        "after_id"	INTEGER,
+        "source_id"	INTEGER
+    )
+    """,
+    # Latest health check per distinct redirect target (see linkcheck.py)
+    """
+    CREATE TABLE IF NOT EXISTS "link_checks" (
+        "redirect"	TEXT PRIMARY KEY,
+        "ok"	INTEGER NOT NULL,
+        "status"	INTEGER,
+        "error"	TEXT,
+        "checked_at"	REAL NOT NULL,
+        "next_check"	REAL NOT NULL,
+        "streak"	INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    # Delta sync (see changes_since): a counter every redirects write moves
+    # forward, and the version at which each deleted alias went away
+    """
+    CREATE TABLE IF NOT EXISTS "sync_state" (
+        "id"	INTEGER PRIMARY KEY CHECK ("id" = 1),
+        "version"	INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "redirect_tombstones" (
+        "namespace"	TEXT NOT NULL DEFAULT '',
+        "alias"	TEXT NOT NULL,
+        "version"	INTEGER NOT NULL,
+        PRIMARY KEY ("namespace", "alias")
+    )
+    """,
+]
+
+SCHEMA_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS "idx_redirects_alias_key" ON "redirects" ("namespace", "alias_key")',
+    'CREATE INDEX IF NOT EXISTS "idx_redirects_expires_at" ON "redirects" ("expires_at") '
+    'WHERE "expires_at" IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS "idx_history_alias" ON "history" ("alias_id", "id")',
+    'CREATE INDEX IF NOT EXISTS "idx_history_old_alias" ON "history" ("old_alias_id") '
+    'WHERE "old_alias_id" IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS "idx_history_changed_at" ON "history" ("changed_at")',
+    'CREATE INDEX IF NOT EXISTS "idx_link_checks_next_check" ON "link_checks" ("next_check")',
+    'CREATE INDEX IF NOT EXISTS "idx_redirects_version" ON "redirects" ("version")',
+    'CREATE INDEX IF NOT EXISTS "idx_redirect_tombstones_version" ON "redirect_tombstones" ("version")',
+]
+
+
+def migrate_database(db_path="redirects.db"):
+    """Bring an existing database up to the current schema (idempotent)"""
+    connection = sqlite3.connect(db_path)
     try:
         cursor = connection.cursor()
-        cursor.execute(update_sql, (new_value,))
+        for table_sql in SCHEMA_TABLES:
+            cursor.execute(table_sql)
+        for table, column, definition in SCHEMA_COLUMNS:
+            cursor.execute(f'PRAGMA table_info("{table}")')
+            if column not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}')
+        for table, column, template in SCHEMA_REBUILDS:
+            _rebuild_table(cursor, table, column, template)
+        cursor.execute('INSERT OR IGNORE INTO sync_state (id, version) VALUES (1, 0)')
+        cursor.execute('PRAGMA user_version')
+        applied = cursor.fetchone()[0]
+        rewritten = 0
+        for version, step in DATA_MIGRATIONS:
+            if version > applied:
+                rewritten += step(cursor)
+                # Committed together with the step's changes
+                cursor.execute(f'PRAGMA user_version = {version}')
+        for index_sql in SCHEMA_INDEXES:
+            cursor.execute(index_sql)
         connection.commit()
     except sqlite3.OperationalError as error:
         connection.rollback()
         raise error
     finally:
         connection.close()
+        _settings_cache.pop(db_path, None)
+    if rewritten:
+        _bump_generation(db_path)
+    else:
+        note_own_write(db_path)
+
+
+def _rebuild_table(cursor, table, column, template):
+    """Recreate table from template if it lacks column, keeping its rows and rowids"""
+    cursor.execute(f'PRAGMA table_info("{table}")')
+    existing = [row[1] for row in cursor.fetchall()]
+    if column in existing:
+        return
+    cursor.execute(template.format(name=f"{table}_rebuild"))
+    cursor.execute(f'PRAGMA table_info("{table}_rebuild")')
+    columns = {row[1] for row in cursor.fetchall()}
+    kept = ", ".join(f'"{name}"' for name in existing if name in columns)
+    cursor.execute(f'INSERT INTO "{table}_rebuild" (rowid, {kept}) SELECT rowid, {kept} FROM "{table}"')
+    # Indexes go with the old table; SCHEMA_INDEXES recreates them
+    cursor.execute(f'DROP TABLE "{table}"')
+    cursor.execute(f'ALTER TABLE "{table}_rebuild" RENAME TO "{table}"')
+
+
+def _canonicalize_stored_redirects(cursor):
+    """Rewrite targets stored before canonicalization; returns rows changed"""
+    # Only rows without a scheme or with spaces, control or non-ASCII
+    # characters can differ from their canonical form
+    cursor.execute(
+        "SELECT rowid, redirect FROM redirects WHERE instr(redirect, '://') = 0 OR redirect GLOB ?",
+        ('*[^!-~]*',)
+    )
+    changed = 0
+    for rowid, redirect in cursor.fetchall():
+        try:
+            canonical = canonicalize_redirect(redirect)
+        except ValidationError:
+            # Leave targets that cannot be repaired for the user to edit
+            continue
+        if canonical != redirect:
+            cursor.execute(
+                'UPDATE redirects SET redirect = ?, version = ? WHERE rowid = ? RETURNING namespace, alias',
+                (canonical, _next_version(cursor), rowid)
+            )
+            namespace, alias = cursor.fetchone()
+            _record_change(cursor, "edit", alias, redirect, canonical, source="migration", namespace=namespace)
+            changed += 1
+    return changed
+
+
+def _backfill_alias_keys(cursor):
+    cursor.execute('UPDATE redirects SET alias_key = lower(alias) WHERE alias_key IS NULL')
+    return cursor.rowcount
+
+
+def _backfill_versions(cursor):
+    cursor.execute('SELECT 1 FROM redirects WHERE version IS NULL LIMIT 1')
+    if not cursor.fetchone():
+        return 0
+    cursor.execute('UPDATE redirects SET version = ? WHERE version IS NULL', (_next_version(cursor),))
+    return cursor.rowcount
+
+
+# One-time data migrations, each (user_version, step). They scan the whole
+# redirects table, so migrate_database runs only those above the database's
+# PRAGMA user_version and then records the last one applied. New steps are
+# appended with the next number. A step returns the number of rows changed.
+DATA_MIGRATIONS = [
+    # Keys and versions for rows written before the columns existed
+    (1, _backfill_alias_keys),
+    (2, _backfill_versions),
+    (3, _canonicalize_stored_redirects),
+]
 
 
 def database_init(db_path="redirects.db"):
-    if not exists(db_path):
+    # A zero-byte file (e.g. a freshly created temp file) has no tables yet
+    if not exists(db_path) or getsize(db_path) == 0:
         connection = sqlite3.connect(db_path)
         cursor = connection.cursor()
         cursor.execute(
@@ -225,18 +1489,26 @@ def database_init(db_path="redirects.db"):
 
         connection.commit()
         connection.close()
+        _settings_cache.pop(db_path, None)
+        _bump_generation(db_path)
+    if exists(db_path):
+        migrate_database(db_path)
     return exists(db_path)
 
 
 def export_redirects(db_path="redirects.db"):
     """Export all redirects to JSON format"""
     data = load_redirects({"redirects": {}}, db_path)
+    expiries = load_expiries(db_path)
 
     # Convert redirects dict to list format
     redirects_list = [
         {"alias": alias, "redirect": redirect}
         for alias, redirect in data["redirects"].items()
     ]
+    for item in redirects_list:
+        if item["alias"] in expiries:
+            item["expires_at"] = expiries[item["alias"]]
 
     export_data = {
         "file_type": "tredirects",
@@ -247,23 +1519,16 @@ def export_redirects(db_path="redirects.db"):
     return json.dumps(export_data, indent=2)
 
 
-def import_redirects(json_data, db_path="redirects.db", replace=False):
-    """
-    Import redirects from JSON data
-
-    Args:
-        json_data: JSON string containing redirect data
-        db_path: Path to database
-        replace: If True, clear existing redirects before import
-
-    Returns:
-        dict with import statistics
-    """
+def _parse_import_file(json_data):
+    """Parse and check a tredirects.json document, returning its data"""
     try:
         data = json.loads(json_data)
     except json.JSONDecodeError as e:
         raise ValidationError(f"Invalid JSON file: {str(e)}")
 
+    if not isinstance(data, dict):
+        raise ValidationError("Invalid file: not a tredirects.json file. Missing or incorrect 'file_type' identifier.")
+
     # Validate file type
     if data.get("file_type") != "tredirects":
         raise ValidationError("Invalid file: not a tredirects.json file. Missing or incorrect 'file_type' identifier.")
@@ -275,55 +1540,202 @@ def import_redirects(json_data, db_path="redirects.db", replace=False):
     # Validate redirects structure
     if "redirects" not in data or not isinstance(data["redirects"], list):
         raise ValidationError("Invalid file format: missing or invalid 'redirects' field")
+    return data
+
+
+def import_redirects(json_data, db_path="redirects.db", replace=False):
+    """
+    Import redirects from JSON data
+
+    Args:
+        json_data: JSON string containing redirect data
+        db_path: Path to database
+        replace: If True, clear existing redirects before import
+
+    Returns:
+        dict with import statistics
+    """
+    data = _parse_import_file(json_data)
 
     stats = {
         "total": len(data["redirects"]),
         "imported": 0,
         "skipped": 0,
         "duplicates": 0,
-        "errors": []
+        "errors": [],
+        "collisions": []
     }
 
-    # If replace mode, clear existing redirects
-    if replace:
+    # Write listeners (e.g. the snapshot compiler) run once for the whole
+    # import instead of once per imported alias
+    with deferred_write_notifications(db_path):
+        # If replace mode, clear existing redirects
+        if replace:
+            connection = sqlite3.connect(db_path)
+            try:
+                cursor = connection.cursor()
+                # Only the default namespace, the one exports come from
+                _record_delete_all(cursor)
+                cursor.execute("SELECT namespace, alias FROM redirects WHERE namespace = ''")
+                _record_tombstones(cursor, cursor.fetchall())
+                cursor.execute("DELETE FROM redirects WHERE namespace = ''")
+                connection.commit()
+                _bump_generation(db_path)
+            except sqlite3.OperationalError as error:
+                connection.rollback()
+                raise error
+            finally:
+                connection.close()
+
+        # Existing case-folded keys, read once, to report aliases that differ
+        # only by case (they would shadow each other in case-insensitive mode)
         connection = sqlite3.connect(db_path)
         try:
             cursor = connection.cursor()
-            cursor.execute("DELETE FROM redirects")
-            connection.commit()
-        except sqlite3.OperationalError as error:
-            connection.rollback()
-            raise error
+            cursor.execute("SELECT alias_key, alias FROM redirects WHERE namespace = '' ORDER BY rowid DESC")
+            alias_keys = dict(cursor.fetchall())
         finally:
             connection.close()
 
-    # Import each redirect
+        # Import each redirect
+        for item in data["redirects"]:
+            if not isinstance(item, dict) or "alias" not in item or "redirect" not in item:
+                stats["errors"].append("Skipped invalid entry: missing alias or redirect")
+                stats["skipped"] += 1
+                continue
+
+            alias = item["alias"]
+            redirect = item["redirect"]
+
+            if isinstance(alias, str) and alias:
+                owner = alias_keys.get(normalize_alias(alias))
+                if owner is not None and owner != alias:
+                    stats["collisions"].append(f"'{alias}' collides with '{owner}'")
+
+            try:
+                add_alias(alias, redirect, db_path, item.get("expires_at"))
+                stats["imported"] += 1
+                alias_keys.setdefault(normalize_alias(alias), alias)
+            except ValidationError as e:
+                # Check if it's a duplicate alias error
+                if "already exists" in str(e):
+                    stats["duplicates"] += 1
+                    stats["skipped"] += 1
+                elif "collides with" in str(e):
+                    # Already reported in stats["collisions"]
+                    stats["skipped"] += 1
+                else:
+                    stats["errors"].append(f"Failed to import '{alias}': {str(e)}")
+                    stats["skipped"] += 1
+            except Exception as e:
+                stats["errors"].append(f"Error importing '{alias}': {str(e)}")
+                stats["skipped"] += 1
+
+    return stats
+
+
+DIFF_CATEGORIES = ("added", "conflicting", "identical", "invalid", "removed")
+
+# Entries per category on one page of an import diff
+DEFAULT_DIFF_PAGE_SIZE = 100
+MAX_DIFF_PAGE_SIZE = 1000
+
+
+def diff_import(json_data, db_path="redirects.db", replace=False, offset=0, limit=DEFAULT_DIFF_PAGE_SIZE):
+    """
+    Dry run of import_redirects: what importing json_data would change, writing nothing
+
+    The existing aliases are read once; every entry is then classified with
+    dict and set lookups instead of one failed INSERT per duplicate:
+
+        added:       new aliases, with the target they would get
+        conflicting: aliases that exist (or come earlier in the file) with
+                     another target; a merge skips them, a replace
+                     overwrites the stored ones
+        identical:   aliases that already have the same target
+        invalid:     entries the import would reject, with the reason
+        removed:     with replace=True, existing aliases the file lacks
+
+    Returns the count of every category and one page of each list:
+    entries offset to offset + limit. "next" is the offset of the following
+    page, or None on the last one.
+    """
+    data = _parse_import_file(json_data)
+    offset = max(0, int(offset))
+    limit = max(1, min(int(limit), MAX_DIFF_PAGE_SIZE))
+
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        case_insensitive = _case_insensitive_enabled(cursor)
+        cursor.execute("SELECT alias, redirect, alias_key FROM redirects WHERE namespace = '' ORDER BY rowid")
+        rows = cursor.fetchall()
+    finally:
+        connection.close()
+
+    stored = {alias: redirect for alias, redirect, _ in rows}
+    # Oldest alias per key, for the collisions the import rejects
+    owners = {}
+    if case_insensitive and not replace:
+        for alias, _, alias_key in rows:
+            owners.setdefault(alias_key, alias)
+
+    diff = {category: [] for category in DIFF_CATEGORIES}
+    # Aliases the import would write, with their targets
+    imported = {}
     for item in data["redirects"]:
         if not isinstance(item, dict) or "alias" not in item or "redirect" not in item:
-            stats["errors"].append("Skipped invalid entry: missing alias or redirect")
-            stats["skipped"] += 1
+            diff["invalid"].append({"alias": None, "error": "Missing alias or redirect"})
             continue
-
         alias = item["alias"]
-        redirect = item["redirect"]
-
         try:
-            add_alias(alias, redirect, db_path)
-            stats["imported"] += 1
+            if not isinstance(alias, str):
+                raise ValidationError("Alias must be a string")
+            redirect = item["redirect"]
+            validate_alias(alias, allow_segments=isinstance(redirect, str) and is_prefix_target(redirect))
+            redirect = canonicalize_redirect(redirect)
+            validate_expires_at(item.get("expires_at"))
         except ValidationError as e:
-            # Check if it's a duplicate alias error
-            if "already exists" in str(e):
-                stats["duplicates"] += 1
-                stats["skipped"] += 1
-            else:
-                stats["errors"].append(f"Failed to import '{alias}': {str(e)}")
-                stats["skipped"] += 1
-        except Exception as e:
-            stats["errors"].append(f"Error importing '{alias}': {str(e)}")
-            stats["skipped"] += 1
+            diff["invalid"].append({"alias": alias, "error": str(e)})
+            continue
 
-    return stats
+        # Repeated in the file, or kept from the database in a merge: skipped
+        current = imported.get(alias)
+        if current is None and not replace:
+            current = stored.get(alias)
+        if current is not None:
+            category = "identical" if current == redirect else "conflicting"
+            diff[category].append({"alias": alias, "current": current, "redirect": redirect})
+            continue
+        if case_insensitive:
+            owner = owners.setdefault(normalize_alias(alias), alias)
+            if owner != alias:
+                error = f"Alias '{alias}' collides with existing alias '{owner}'"
+                diff["invalid"].append({"alias": alias, "error": error})
+                continue
+        imported[alias] = redirect
+        # A replace rewrites stored aliases; only new targets are changes
+        current = stored.get(alias)
+        if current is None:
+            diff["added"].append({"alias": alias, "redirect": redirect})
+        else:
+            category = "identical" if current == redirect else "conflicting"
+            diff[category].append({"alias": alias, "current": current, "redirect": redirect})
 
+    if replace:
+        diff["removed"] = [{"alias": alias, "redirect": redirect}
+                           for alias, redirect in stored.items() if alias not in imported]
+
+    end = offset + limit
+    return {
+        "total": len(data["redirects"]),
+        "replace": replace,
+        "counts": {category: len(entries) for category, entries in diff.items()},
+        **{category: entries[offset:end] for category, entries in diff.items()},
+        "offset": offset,
+        "limit": limit,
+        "next": end if any(len(entries) > end for entries in diff.values()) else None,
+    }
 
 if __name__ == "__main__":
     from pprint import pprint as print
@@ -0,0 +1,71 @@
+"""
+Background removal of expired aliases.
+
+Lookups already treat an alias as missing once its expires_at has passed
+(see AliasCache). ExpirySweeper deletes the rows themselves: it sleeps until
+the earliest deadline in the expires_at index, or until a write may have
+added an earlier one, and removes everything due with data.sweep_expired in
+small batches. Each batch bumps the write generation, so in-memory views and
+the shared snapshot drop the aliases too.
+"""
+
+import threading
+import time
+
+from loguru import logger
+
+from tiny_redirect import data
+
+# Longest sleep between sweeps; also bounds how long rows written by another
+# process can outlive their expiry
+DEFAULT_MAX_INTERVAL = 60.0
+
+
+class ExpirySweeper:
+    """Background thread deleting aliases as they expire"""
+
+    def __init__(self, db_path, max_interval=DEFAULT_MAX_INTERVAL):
+        self.db_path = db_path
+        self.max_interval = max_interval
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        data.add_write_listener(self.notify)
+        self._thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        data.remove_write_listener(self.notify)
+        self._wake.set()
+
+    def notify(self, db_path):
+        """Write listener: re-read the next deadline, a new alias may expire sooner"""
+        if db_path == self.db_path:
+            self._wake.set()
+
+    def run_once(self):
+        """Delete what is due now; returns the number of aliases removed"""
+        return data.sweep_expired(self.db_path)
+
+    def next_wait(self):
+        """Seconds until the next alias expires, capped at max_interval"""
+        deadline = data.next_expiry(self.db_path)
+        if deadline is None:
+            return self.max_interval
+        return min(self.max_interval, max(0.0, deadline - time.time()))
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                removed = self.run_once()
+                if removed:
+                    logger.info(f"Removed {removed} expired alias(es)")
+                wait = self.next_wait()
+            except Exception as e:
+                logger.error(f"Expiry sweep failed: {e}")
+                wait = self.max_interval
+            self._wake.wait(wait)
+            self._wake.clear()
@@ -0,0 +1,279 @@
+"""
+Change history of the redirects table.
+
+data.py appends an entry to the history table for every add, edit, rename
+and delete, in the same transaction as the change. Alias, redirect and
+source strings are stored once in history_strings and referenced by id, so
+an alias edited a thousand times costs a thousand small rows, not a
+thousand copies of its URL.
+
+alias_history answers from the (alias_id, id) index without scanning the
+table. Each namespace (see data.DEFAULT_NAMESPACE) has a history of its
+own. target_at and restore_alias give point-in-time restore for one alias,
+as far back as the retained history goes. compact_history enforces the
+retention limits in small batches and HistoryCompactor runs it on a schedule.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from loguru import logger
+
+from tiny_redirect import data
+from tiny_redirect.data import ValidationError
+
+# Entries kept per alias, and their maximum age in seconds (0 = no limit)
+DEFAULT_KEEP = 50
+DEFAULT_MAX_AGE = 365 * 24 * 60 * 60
+
+# Rows deleted per compaction transaction, so writers are never held up long
+DEFAULT_BATCH_SIZE = 1000
+
+# Largest page alias_history returns
+MAX_PAGE_SIZE = 500
+
+_ENTRY_SQL = """
+    SELECT h.id, h.changed_at, h.action, a.value, o.value, b.value, t.value, s.value, n.value
+    FROM history h
+    JOIN history_strings a ON a.id = h.alias_id
+    LEFT JOIN history_strings o ON o.id = h.old_alias_id
+    LEFT JOIN history_strings b ON b.id = h.before_id
+    LEFT JOIN history_strings t ON t.id = h.after_id
+    LEFT JOIN history_strings s ON s.id = h.source_id
+    LEFT JOIN history_strings n ON n.id = h.namespace_id
+"""
+
+
+def format_time(timestamp):
+    """ISO 8601 UTC form of a history timestamp"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _entry(row):
+    entry_id, changed_at, action, alias, old_alias, before, after, source, namespace = row
+    return {
+        "id": entry_id,
+        "changed_at": format_time(changed_at),
+        "action": action,
+        "alias": alias,
+        "old_alias": old_alias,
+        "before": before,
+        "after": after,
+        "source": source,
+        "namespace": namespace or data.DEFAULT_NAMESPACE,
+    }
+
+
+def _string_id(cursor, value):
+    cursor.execute('SELECT id FROM history_strings WHERE value = ?', (value,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _namespace_id(cursor, namespace):
+    """history.namespace_id of namespace: NULL for the default one, -1 if never used"""
+    if namespace == data.DEFAULT_NAMESPACE:
+        return None
+    namespace_id = _string_id(cursor, namespace)
+    return -1 if namespace_id is None else namespace_id
+
+
+def alias_history(alias, db_path="redirects.db", limit=100, before=None, namespace=data.DEFAULT_NAMESPACE):
+    """
+    Return the history entries of alias, newest first
+
+    Renames show up under both names. Pass the id of the last entry of a page
+    as before to get the next one.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        alias_id = _string_id(cursor, alias)
+        if alias_id is None:
+            return []
+        cursor.execute(
+            _ENTRY_SQL + """
+            WHERE (h.alias_id = ? OR h.old_alias_id = ?) AND h.namespace_id IS ? AND h.id < ?
+            ORDER BY h.id DESC LIMIT ?
+            """,
+            (alias_id, alias_id, _namespace_id(cursor, namespace),
+             before if before is not None else 2 ** 63 - 1, limit)
+        )
+        return [_entry(row) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def target_at(alias, timestamp, db_path="redirects.db", namespace=data.DEFAULT_NAMESPACE):
+    """
+    Return what alias redirected to at timestamp, or None if it did not exist
+
+    Raises ValidationError if the alias already existed before the oldest
+    retained history entry, so its target then is unknown.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        cursor = connection.cursor()
+        alias_id = _string_id(cursor, alias)
+        unknown = ValidationError(f"No history for alias '{alias}' at {format_time(timestamp)}")
+        if alias_id is None:
+            raise unknown
+        namespace_id = _namespace_id(cursor, namespace)
+        cursor.execute(
+            """
+            SELECT action, alias_id, after_id FROM history
+            WHERE (alias_id = ? OR old_alias_id = ?) AND namespace_id IS ? AND changed_at <= ?
+            ORDER BY id DESC LIMIT 1
+            """,
+            (alias_id, alias_id, namespace_id, timestamp)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            # Nothing that old: the alias did not exist yet if its first
+            # entry brought it into being
+            cursor.execute(
+                """
+                SELECT action, alias_id FROM history
+                WHERE (alias_id = ? OR old_alias_id = ?) AND namespace_id IS ? ORDER BY id LIMIT 1
+                """,
+                (alias_id, alias_id, namespace_id)
+            )
+            first = cursor.fetchone()
+            if first is None:
+                raise unknown
+            action, entry_alias_id = first
+            if action in ("add", "rename") and entry_alias_id == alias_id:
+                return None
+            raise unknown
+        action, entry_alias_id, after_id = row
+        # Deleted, or renamed away from this name
+        if action == "delete" or entry_alias_id != alias_id:
+            return None
+        cursor.execute('SELECT value FROM history_strings WHERE id = ?', (after_id,))
+        return cursor.fetchone()[0]
+    finally:
+        connection.close()
+
+
+def restore_alias(alias, timestamp, db_path="redirects.db", namespace=data.DEFAULT_NAMESPACE):
+    """
+    Put alias back the way it was at timestamp; returns its target then (None if absent)
+
+    The restore is an ordinary add, edit or delete, so it is recorded in the
+    history itself and can be undone the same way.
+    """
+    target = target_at(alias, timestamp, db_path, namespace)
+    current = data.find_alias(alias, db_path, namespace=namespace)
+    if target is None:
+        if current is not None:
+            data.delete_alias(alias, db_path, namespace)
+    elif current is None:
+        data.add_alias(alias, target, db_path, namespace=namespace)
+    elif current != target:
+        data.update_alias(alias, target, db_path, namespace)
+    return target
+
+
+def _delete_batches(db_path, sql, params, batch_size):
+    deleted = 0
+    while True:
+        connection = sqlite3.connect(db_path)
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, params + (batch_size,))
+            count = cursor.rowcount
+            connection.commit()
+        finally:
+            connection.close()
+        data.note_own_write(db_path)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def compact_history(db_path="redirects.db", keep=DEFAULT_KEEP, max_age=DEFAULT_MAX_AGE,
+                    batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Drop entries beyond the newest keep per alias (and namespace) or older than max_age seconds
+
+    Strings no longer referenced by any entry are dropped too. Each batch is
+    its own short transaction. Returns {"entries": n, "strings": n} removed.
+    """
+    now = time.time() if now is None else now
+    entries = 0
+    if max_age > 0:
+        entries += _delete_batches(
+            db_path,
+            'DELETE FROM history WHERE id IN (SELECT id FROM history WHERE changed_at < ? LIMIT ?)',
+            (now - max_age,),
+            batch_size,
+        )
+    if keep > 0:
+        entries += _delete_batches(
+            db_path,
+            """
+            DELETE FROM history WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY namespace_id, alias_id ORDER BY id DESC) AS position
+                    FROM history
+                ) WHERE position > ? LIMIT ?
+            )
+            """,
+            (keep,),
+            batch_size,
+        )
+    strings = 0
+    if entries:
+        strings = _delete_batches(
+            db_path,
+            """
+            DELETE FROM history_strings WHERE id IN (
+                SELECT id FROM history_strings WHERE id NOT IN (
+                    SELECT alias_id FROM history
+                    UNION SELECT old_alias_id FROM history WHERE old_alias_id IS NOT NULL
+                    UNION SELECT before_id FROM history WHERE before_id IS NOT NULL
+                    UNION SELECT after_id FROM history WHERE after_id IS NOT NULL
+                    UNION SELECT source_id FROM history WHERE source_id IS NOT NULL
+                    UNION SELECT namespace_id FROM history WHERE namespace_id IS NOT NULL
+                ) LIMIT ?
+            )
+            """,
+            (),
+            batch_size,
+        )
+    return {"entries": entries, "strings": strings}
+
+
+class HistoryCompactor:
+    """Background thread running compact_history every interval seconds"""
+
+    def __init__(self, db_path, interval, keep=DEFAULT_KEEP, max_age=DEFAULT_MAX_AGE):
+        self.db_path = db_path
+        self.interval = interval
+        self.keep = keep
+        self.max_age = max_age
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="history-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        return compact_history(self.db_path, self.keep, self.max_age)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                removed = self.run_once()
+                if removed["entries"]:
+                    logger.info(f"History compaction removed {removed['entries']} entries "
+                                f"and {removed['strings']} strings")
+            except Exception as e:
+                logger.error(f"History compaction failed: {e}")
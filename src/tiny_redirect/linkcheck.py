@@ -0,0 +1,205 @@
+"""
+Background health checks of redirect targets.
+
+LinkChecker sends a HEAD request (falling back to GET for servers that
+refuse HEAD) to every distinct redirect target and stores the outcome in the
+link_checks table, which the /redirects page shows next to each alias.
+
+Checks run on a bounded thread pool with a per-host cap, so one slow or
+large site never takes every worker and no site gets more than a few
+requests at once. Recheck intervals adapt: a target that keeps answering is
+checked less and less often (up to max_interval), a failing one is retried
+sooner, with its own backoff.
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from tiny_redirect import data
+from tiny_redirect.trie import expand_target, is_prefix_target
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 2
+DEFAULT_TIMEOUT = 5.0
+
+# Seconds until a healthy target is checked again, doubling with every
+# further success up to DEFAULT_MAX_INTERVAL
+DEFAULT_INTERVAL = 60 * 60
+DEFAULT_MAX_INTERVAL = 24 * 60 * 60
+
+# Seconds until a failing target is retried, doubling up to DEFAULT_INTERVAL
+DEFAULT_RETRY_INTERVAL = 5 * 60
+
+# Targets checked per run, and the longest sleep between runs
+DEFAULT_BATCH_SIZE = 200
+POLL_INTERVAL = 60.0
+
+# Answers from servers that do not handle HEAD; the check is repeated with GET
+HEAD_UNSUPPORTED = {403, 405, 501}
+
+USER_AGENT = "TinyRedirect-LinkChecker"
+
+MAX_ERROR_LENGTH = 200
+
+
+def check_url(session, url, timeout=DEFAULT_TIMEOUT):
+    """Return (status code, error) for url; the status is None if nothing answered"""
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+        if response.status_code in HEAD_UNSUPPORTED:
+            # stream=True: only the status line and headers are read
+            response = session.get(url, timeout=timeout, allow_redirects=True, stream=True)
+            response.close()
+        return response.status_code, None
+    except requests.RequestException as e:
+        return None, f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+
+
+def next_interval(ok, streak, interval=DEFAULT_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                  retry_interval=DEFAULT_RETRY_INTERVAL):
+    """Seconds until the next check after streak results in a row with the same outcome"""
+    backoff = 2 ** min(streak - 1, 16)
+    if ok:
+        return min(max_interval, interval * backoff)
+    return min(interval, retry_interval * backoff)
+
+
+def _spread_hosts(rows):
+    """Order rows round-robin by host, so workers do not all queue behind one site's cap"""
+    by_host = {}
+    for row in rows:
+        by_host.setdefault((urlsplit(row[0]).hostname or "").lower(), []).append(row)
+    return [row for group in itertools.zip_longest(*by_host.values()) for row in group if row is not None]
+
+
+class LinkChecker:
+    """Checks due redirect targets on a thread pool, on a schedule or on demand"""
+
+    def __init__(self, db_path, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST,
+                 timeout=DEFAULT_TIMEOUT, interval=DEFAULT_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, retry_interval=DEFAULT_RETRY_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE, session=None):
+        self.db_path = db_path
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.interval = interval
+        self.max_interval = max_interval
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self.session = session or self._new_session(workers)
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _new_session(workers):
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _host_slot(self, url):
+        host = (urlsplit(url).hostname or "").lower()
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def check(self, target):
+        """Check one stored target; path-forwarding templates are checked with an empty path"""
+        url = expand_target(target, "") if is_prefix_target(target) else target
+        with self._host_slot(url):
+            return check_url(self.session, url, self.timeout)
+
+    def _due(self, connection, now):
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            SELECT DISTINCT r.redirect, c.ok, c.streak FROM redirects r
+            LEFT JOIN link_checks c ON c.redirect = r.redirect
+            WHERE c.next_check IS NULL OR c.next_check <= ?
+            LIMIT ?
+            """,
+            (now, self.batch_size)
+        )
+        return cursor.fetchall()
+
+    def run_once(self, now=None):
+        """Check every target that is due; returns how many were checked"""
+        with self._run_lock:
+            now = time.time() if now is None else now
+            connection = sqlite3.connect(self.db_path)
+            try:
+                # Forget targets no alias points at any more
+                connection.execute(
+                    'DELETE FROM link_checks WHERE redirect NOT IN (SELECT redirect FROM redirects)'
+                )
+                connection.commit()
+                due = self._due(connection, now)
+            finally:
+                connection.close()
+            data.note_own_write(self.db_path)
+            if not due:
+                return 0
+            due = _spread_hosts(due)
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="link-check") as pool:
+                outcomes = list(pool.map(self.check, [target for target, _, _ in due]))
+
+            rows = []
+            for (target, previous_ok, previous_streak), (status, error) in zip(due, outcomes):
+                ok = status is not None and status < 400
+                streak = previous_streak + 1 if previous_ok is not None and bool(previous_ok) == ok else 1
+                wait = next_interval(ok, streak, self.interval, self.max_interval, self.retry_interval)
+                rows.append((target, int(ok), status, error, now, now + wait, streak))
+
+            connection = sqlite3.connect(self.db_path)
+            try:
+                connection.executemany(
+                    """
+                    INSERT INTO link_checks (redirect, ok, status, error, checked_at, next_check, streak)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (redirect) DO UPDATE SET
+                        ok = excluded.ok, status = excluded.status, error = excluded.error,
+                        checked_at = excluded.checked_at, next_check = excluded.next_check,
+                        streak = excluded.streak
+                    """,
+                    rows
+                )
+                connection.commit()
+            finally:
+                connection.close()
+            data.note_own_write(self.db_path)
+            return len(rows)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="link-checker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                checked = self.run_once()
+            except Exception as e:
+                logger.error(f"Link check failed: {e}")
+                checked = 0
+            # A full batch means more targets are already due
+            if checked < self.batch_size:
+                self._stop.wait(POLL_INTERVAL)
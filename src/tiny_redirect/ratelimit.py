@@ -0,0 +1,217 @@
+"""
+Per-client rate limiting and admission control for the Bottle app.
+
+RateLimitPlugin gives every route class (see the rate_limit route option
+in app.py) its own token buckets keyed on the client address, and caps the
+number of requests being handled at once. Rejected requests are answered
+straight from the plugin with 429 (client over its rate) or 503 (server at
+its in-flight cap) and a Retry-After header, before the route runs.
+
+Clients are told apart by REMOTE_ADDR. Behind a reverse proxy every
+request comes from the proxy, so its address can be listed as trusted and
+the client is then taken from X-Forwarded-For instead.
+"""
+
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from bottle import HTTPResponse, request
+
+# Route class used for routes without a rate_limit option
+DEFAULT_ROUTE_CLASS = "admin"
+
+# Requests per second and burst size per route class
+DEFAULT_LIMITS = {
+    "redirect": (50.0, 100),
+    "admin": (10.0, 30),
+    "import": (0.5, 3),
+}
+
+# Clients tracked per route class before the least recently seen is dropped
+DEFAULT_MAX_CLIENTS = 10000
+
+
+def parse_limits(spec):
+    """
+    Parse 'class=rate:burst,...' into {class: (rate, burst)}
+
+    A rate of 0 disables limiting for that class. Classes not named keep
+    their DEFAULT_LIMITS entry.
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            route_class, values = item.split("=", 1)
+            rate, _, burst = values.partition(":")
+            rate = float(rate)
+            burst = int(burst) if burst else max(1, math.ceil(rate))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit '{item}', expected class=rate:burst")
+        if rate < 0 or burst < 1:
+            raise ValueError(f"Invalid rate limit '{item}', rate must be >= 0 and burst >= 1")
+        limits[route_class.strip()] = (rate, burst)
+    return limits
+
+
+def parse_proxies(spec):
+    """Parse a comma-separated list of proxy addresses or networks into ip_network objects"""
+    proxies = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            proxies.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            raise ValueError(f"Invalid trusted proxy '{item}', expected an IP address or network")
+    return tuple(proxies)
+
+
+def _is_trusted(address, proxies):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in proxies)
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets per client, refilled at rate tokens per second up to burst.
+
+    Buckets live in an OrderedDict used as an LRU, so memory stays bounded
+    by max_clients no matter how many addresses a scan comes from. A client
+    that is dropped starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=DEFAULT_MAX_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def acquire(self, client):
+        """Take a token for client; return 0 if allowed, else seconds until one is free"""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                tokens = self.burst
+                if len(self._buckets) >= self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens, updated = bucket
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                self._buckets.move_to_end(client)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                return 0
+            self._buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+def _reject(status, wait):
+    return HTTPResponse(
+        body="Too Many Requests" if status == 429 else "Service Unavailable",
+        status=status,
+        headers={"Retry-After": str(max(1, math.ceil(wait))), "Content-Type": "text/plain"},
+    )
+
+
+class RateLimitPlugin:
+    """
+    Bottle plugin applying TokenBucketLimiter per route class plus an in-flight cap
+
+    Routes pick their class with the rate_limit route option, e.g.
+    @app.route("/<alias>", rate_limit="redirect"); routes can opt out with
+    skip=["ratelimit"]. max_in_flight=0 disables the concurrency cap.
+    Requests from trusted_proxies are keyed on the last X-Forwarded-For
+    address that is not itself a trusted proxy.
+    """
+
+    name = "ratelimit"
+    api = 2
+
+    def __init__(self, limits=None, max_in_flight=0, max_clients=DEFAULT_MAX_CLIENTS, trusted_proxies=()):
+        self.max_in_flight = max_in_flight
+        self.max_clients = max_clients
+        self.trusted_proxies = tuple(trusted_proxies)
+        self.limiters = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.configure(limits)
+
+    def configure(self, limits=None, max_in_flight=None, trusted_proxies=None):
+        """
+        Replace the limits of a running plugin; routes see them on their next request
+
+        Classes whose rate and burst are unchanged keep their buckets.
+        max_in_flight=None and trusted_proxies=None leave those as they are.
+        """
+        limiters = {}
+        for route_class, (rate, burst) in (limits if limits is not None else DEFAULT_LIMITS).items():
+            if rate <= 0:
+                continue
+            limiter = self.limiters.get(route_class)
+            if limiter is None or (limiter.rate, limiter.burst) != (rate, burst):
+                limiter = TokenBucketLimiter(rate, burst, self.max_clients)
+            limiters[route_class] = limiter
+        # Swapped in whole, so a request sees either the old or the new set
+        self.limiters = limiters
+        if max_in_flight is not None:
+            self.max_in_flight = max_in_flight
+        if trusted_proxies is not None:
+            self.trusted_proxies = tuple(trusted_proxies)
+
+    def client_key(self, environ):
+        """Address a request's bucket is keyed on"""
+        address = environ.get("REMOTE_ADDR", "")
+        proxies = self.trusted_proxies
+        if not proxies or not _is_trusted(address, proxies):
+            # Never trust X-Forwarded-For from a client that is not a proxy
+            return address
+        # Each proxy appends the address it got the request from, so the
+        # client is the last entry not added by one of our own proxies
+        for hop in reversed(environ.get("HTTP_X_FORWARDED_FOR", "").split(",")):
+            hop = hop.strip()
+            if hop and not _is_trusted(hop, proxies):
+                return hop
+        return address
+
+    def apply(self, callback, route):
+        route_class = route.config.get("rate_limit", DEFAULT_ROUTE_CLASS)
+
+        def wrapper(*args, **kwargs):
+            limiter = self.limiters.get(route_class)
+            if limiter is not None:
+                # Not request.remote_addr, which trusts X-Forwarded-For from anyone
+                wait = limiter.acquire(self.client_key(request.environ))
+                if wait:
+                    return _reject(429, wait)
+            if not self.max_in_flight:
+                return callback(*args, **kwargs)
+            with self._lock:
+                if self.in_flight >= self.max_in_flight:
+                    return _reject(503, 1)
+                self.in_flight += 1
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+        return wrapper
+
+    def reset(self):
+        """Forget every client bucket"""
+        for limiter in self.limiters.values():
+            limiter.reset()
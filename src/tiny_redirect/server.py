@@ -0,0 +1,548 @@
+"""
+Serving with graceful shutdown and zero-downtime restarts.
+
+GracefulServer is a Bottle server adapter built on the same wsgiref stack as
+Bottle's default "wsgiref" server, with a thread per request and:
+
+- SIGTERM (or request_shutdown) stops accepting connections, waits up to
+  drain_timeout seconds for requests in flight, then runs the shutdown hooks
+  (see add_shutdown_hook) before returning from app.run.
+- request_rebind moves the server to a new address: the new socket is bound
+  and listening before the old one stops accepting, and requests on the old
+  one are drained in the background.
+- SIGHUP (or request_restart) starts a new copy of the process that inherits
+  the listening socket (TINYREDIRECT_LISTEN_FD) instead of binding it. Once
+  the new process reports ready over a pipe (TINYREDIRECT_READY_FD), this one
+  drains and exits. The port is never closed, so no connection is refused.
+- A host of the form unix:/path/to/app.sock listens on a Unix domain socket,
+  e.g. for a reverse proxy on the same machine. A socket passed in by
+  systemd socket activation (LISTEN_FDS) is adopted instead of binding one.
+- HTTP/1.1 clients get persistent connections: a connection stays open for up
+  to keep_alive_timeout idle seconds and max_keep_alive_requests requests,
+  and pipelined requests are answered in order. Responses whose length is
+  unknown end the connection instead. keep_alive_timeout=0 restores the
+  one-request-per-connection HTTP/1.0 behaviour of plain wsgiref.
+
+Restarts need fd inheritance and SIGHUP, so they are POSIX only.
+"""
+
+import os
+import select
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer
+
+from bottle import ServerAdapter, server_names
+from loguru import logger
+
+LISTEN_FD_ENV = "TINYREDIRECT_LISTEN_FD"
+READY_FD_ENV = "TINYREDIRECT_READY_FD"
+
+# Host prefix selecting a Unix domain socket, and the default mode of its file
+UNIX_PREFIX = "unix:"
+DEFAULT_SOCKET_MODE = 0o660
+
+# First file descriptor passed by systemd socket activation (SD_LISTEN_FDS_START)
+SYSTEMD_FIRST_FD = 3
+
+# Seconds to wait for requests in flight when shutting down
+DEFAULT_DRAIN_TIMEOUT = 10.0
+
+# Seconds a restarted process gets to report ready before it is abandoned
+RESTART_READY_TIMEOUT = 30.0
+
+# Seconds an idle persistent connection is kept open (0 = no keep-alive), and
+# requests served on one connection before it is closed
+DEFAULT_KEEP_ALIVE_TIMEOUT = 5.0
+DEFAULT_MAX_KEEP_ALIVE_REQUESTS = 100
+
+# Unread request body bytes skipped to keep a connection; larger leftovers close it
+MAX_BODY_DRAIN = 64 * 1024
+
+# Server currently running in this process, if any
+current_server = None
+
+# Callables run once requests have drained, e.g. to flush buffered writes
+_shutdown_hooks = []
+
+
+def add_shutdown_hook(hook):
+    """Run hook() after the server stops and requests in flight have drained"""
+    if hook not in _shutdown_hooks:
+        _shutdown_hooks.append(hook)
+
+
+def remove_shutdown_hook(hook):
+    if hook in _shutdown_hooks:
+        _shutdown_hooks.remove(hook)
+
+
+def inherited_listen_fd():
+    """Return the listening socket fd handed over by a restarting parent or systemd, or None"""
+    value = os.environ.get(LISTEN_FD_ENV)
+    if value:
+        return int(value)
+    return systemd_listen_fd()
+
+
+def systemd_listen_fd():
+    """Return the first socket passed by systemd socket activation, or None"""
+    # LISTEN_PID guards against variables inherited by some other process
+    if os.environ.get("LISTEN_PID") != str(os.getpid()):
+        return None
+    count = int(os.environ.get("LISTEN_FDS") or 0)
+    if count < 1:
+        return None
+    if count > 1:
+        logger.warning(f"systemd passed {count} sockets, serving on the first only")
+    return SYSTEMD_FIRST_FD
+
+
+def unix_socket_path(host):
+    """Path of a unix:/path.sock host, or None for a TCP host"""
+    if isinstance(host, str) and host.startswith(UNIX_PREFIX):
+        return host[len(UNIX_PREFIX):]
+    return None
+
+
+def _remove_stale_socket(path):
+    """Remove a socket file left behind by a previous run; raise if something still listens on it"""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(f"Address already in use: {path}")
+    finally:
+        probe.close()
+
+
+def request_shutdown():
+    """Ask the running GracefulServer to drain and stop; False if none is running"""
+    server = current_server
+    if server is None:
+        return False
+    server.begin_shutdown()
+    return True
+
+
+def request_restart():
+    """Ask the running GracefulServer to hand its socket to a new process"""
+    server = current_server
+    if server is None:
+        return False
+    threading.Thread(target=server.restart, daemon=True).start()
+    return True
+
+
+def request_rebind(host, port):
+    """
+    Move the running GracefulServer to host:port; False if none is running
+
+    Raises OSError if the new address cannot be bound, in which case the
+    server keeps listening where it was.
+    """
+    server = current_server
+    if server is None:
+        return False
+    return server.rebind(host, port)
+
+
+def _restart_command():
+    # Frozen builds (PyInstaller) are their own interpreter
+    if getattr(sys, "frozen", False):
+        return [sys.executable] + sys.argv[1:]
+    return [sys.executable, "-m", "tiny_redirect"] + sys.argv[1:]
+
+
+class _RequestBody:
+    """wsgi.input cut off at Content-Length, so what the app leaves unread can be skipped"""
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self.remaining = length
+
+    def _limit(self, size):
+        if size is None or size < 0 or size > self.remaining:
+            return self.remaining
+        return size
+
+    def read(self, size=-1):
+        size = self._limit(size)
+        chunk = self._rfile.read(size) if size else b""
+        self.remaining -= len(chunk)
+        return chunk
+
+    def readline(self, size=-1):
+        size = self._limit(size)
+        line = self._rfile.readline(size) if size else b""
+        self.remaining -= len(line)
+        return line
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b""))
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def drain(self):
+        """Skip the rest of the body; False if it is too large or the client went away"""
+        if self.remaining > MAX_BODY_DRAIN:
+            return False
+        while self.remaining:
+            if not self.read(65536):
+                return False
+        return True
+
+
+class KeepAliveServerHandler(ServerHandler):
+    """wsgiref ServerHandler answering in HTTP/1.1 and deciding whether the connection stays open"""
+
+    http_version = "1.1"
+
+    def __init__(self, *args, keep_alive=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keep_alive = keep_alive
+
+    def cleanup_headers(self):
+        super().cleanup_headers()
+        status = int(self.status[:3])
+        bodyless = status < 200 or status in (204, 304) or self.environ["REQUEST_METHOD"] == "HEAD"
+        if "Content-Length" not in self.headers and not bodyless:
+            # Without a length the client can only find the end of the body
+            # by the connection closing
+            self.keep_alive = False
+        if not self.keep_alive:
+            self.headers["Connection"] = "close"
+
+
+class DrainingRequestHandler(WSGIRequestHandler):
+    """
+    Request handler counting requests in flight, with HTTP/1.1 keep-alive
+
+    Only the time spent on a request counts as in flight; a connection
+    waiting idle for its next request does not hold up a shutdown.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        # Bounds the wait for the next request line and headers only; see handle
+        self.timeout = self.server.keep_alive_timeout or None
+        if not self.client_address:
+            # Unix socket peers have no address; they are local like a loopback proxy
+            self.client_address = ("127.0.0.1", 0)
+        super().setup()
+
+    def handle(self):
+        served = 0
+        try:
+            while True:
+                self.connection.settimeout(self.timeout)
+                self.raw_requestline = self.rfile.readline(65537)
+                if not self.raw_requestline:
+                    return
+                served += 1
+                with self.server.track_request():
+                    if not self.handle_request(served):
+                        return
+        except (TimeoutError, ConnectionError):
+            return
+
+    def handle_request(self, served):
+        """Answer the request whose line was just read; return True to keep the connection"""
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(414)
+            return False
+        if not self.parse_request():
+            return False
+        # Once the headers are in, a slow client may take as long as it needs
+        # to send the body or read the response, as with plain wsgiref
+        self.connection.settimeout(None)
+
+        if not self.server.keep_alive_timeout:
+            # Plain wsgiref behaviour: HTTP/1.0, one request per connection
+            handler = ServerHandler(self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+                                    multithread=False)
+            handler.request_handler = self
+            handler.run(self.server.get_app())
+            return False
+
+        keep_alive = (
+            not self.close_connection
+            and served < self.server.max_keep_alive_requests
+            and not self.server.draining
+            # Chunked bodies have no length to skip past
+            and "chunked" not in self.headers.get("Transfer-Encoding", "").lower()
+        )
+        try:
+            length = max(0, int(self.headers.get("Content-Length") or 0))
+        except ValueError:
+            length, keep_alive = 0, False
+        body = _RequestBody(self.rfile, length)
+        handler = KeepAliveServerHandler(body, self.wfile, self.get_stderr(), self.get_environ(),
+                                         multithread=False, keep_alive=keep_alive)
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+        # Body bytes the app did not read would be parsed as the next request
+        return handler.keep_alive and body.drain()
+
+
+class QuietHandler(DrainingRequestHandler):
+    def log_request(self, *args, **kw):
+        pass
+
+
+class DrainingWSGIServer(ThreadingMixIn, WSGIServer):
+    """Threaded WSGIServer that counts requests in flight and can adopt a socket"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, listen_fd=None,
+                 keep_alive_timeout=0, max_keep_alive_requests=DEFAULT_MAX_KEEP_ALIVE_REQUESTS,
+                 socket_mode=DEFAULT_SOCKET_MODE):
+        # A str address is the path of a Unix domain socket
+        if isinstance(server_address, str):
+            self.address_family = socket.AF_UNIX
+        self.socket_mode = socket_mode
+        self._idle = threading.Condition()
+        self.active = 0
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        # Set once the server stops accepting; open connections close after their current request
+        self.draining = False
+        self._adopted = listen_fd is not None
+        WSGIServer.__init__(self, server_address, handler_class, bind_and_activate=not self._adopted)
+        if self._adopted:
+            self.socket.close()
+            self.socket = socket.socket(fileno=listen_fd)
+            self.server_bind()
+
+    @property
+    def is_unix(self):
+        return self.socket.family == socket.AF_UNIX
+
+    def server_bind(self):
+        if self.is_unix and not self._adopted:
+            # The file is left behind on close: a restarted process may
+            # still be serving on it. The next bind removes it instead.
+            _remove_stale_socket(self.server_address)
+            self.socket.bind(self.server_address)
+            os.chmod(self.server_address, self.socket_mode)
+        elif not self._adopted:
+            WSGIServer.server_bind(self)
+            return
+        # Unix or adopted socket: already bound (and listening if adopted)
+        self.server_address = self.socket.getsockname()
+        if self.is_unix:
+            self.server_name, self.server_port = "localhost", 0
+        else:
+            host, port = self.server_address[:2]
+            self.server_name = socket.getfqdn(host)
+            self.server_port = port
+        self.setup_environ()
+
+    @contextmanager
+    def track_request(self):
+        """Count a request as in flight for the duration of the block"""
+        with self._idle:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self.active -= 1
+                self._idle.notify_all()
+
+    def server_close(self):
+        self.draining = True
+        super().server_close()
+
+    def wait_idle(self, timeout):
+        """Wait until no request is in flight; return False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self.active == 0, timeout)
+
+
+class GracefulServer(ServerAdapter):
+    """Bottle adapter: wsgiref with draining shutdown and socket hand-over restarts"""
+
+    def __init__(self, host="127.0.0.1", port=8080, drain_timeout=None, keep_alive_timeout=None,
+                 max_keep_alive_requests=None, socket_mode=None, **options):
+        super().__init__(host, port, **options)
+        if drain_timeout is None:
+            drain_timeout = float(os.environ.get("TINYREDIRECT_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT))
+        if keep_alive_timeout is None:
+            keep_alive_timeout = float(
+                os.environ.get("TINYREDIRECT_KEEPALIVE_TIMEOUT", DEFAULT_KEEP_ALIVE_TIMEOUT)
+            )
+        if max_keep_alive_requests is None:
+            max_keep_alive_requests = int(
+                os.environ.get("TINYREDIRECT_KEEPALIVE_REQUESTS", DEFAULT_MAX_KEEP_ALIVE_REQUESTS)
+            )
+        if socket_mode is None:
+            socket_mode = int(os.environ.get("TINYREDIRECT_SOCKET_MODE", f"{DEFAULT_SOCKET_MODE:o}"), 8)
+        self.drain_timeout = drain_timeout
+        self.socket_mode = socket_mode
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.server = None
+        self._next_server = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def run(self, handler):
+        global current_server
+        handler_class = DrainingRequestHandler if not self.quiet else QuietHandler
+        listen_fd = inherited_listen_fd()
+        self.server = self._make_server(self.host, self.port, handler_class, listen_fd)
+        self.server.set_app(handler)
+        if not self.server.is_unix:
+            self.port = self.server.server_port
+        if listen_fd is not None:
+            logger.info(f"Serving on inherited socket (fd {listen_fd}, {self.server.server_address})")
+        current_server = self
+        self._install_signal_handlers()
+        self._report_ready()
+        try:
+            while True:
+                self.server.serve_forever(poll_interval=0.25)
+                with self._lock:
+                    retired, replacement = self.server, self._next_server
+                    self._next_server = None
+                    if replacement is None or self._stopping.is_set():
+                        if replacement is not None:
+                            replacement.server_close()
+                        break
+                    self.server = replacement
+                # The replacement has been listening since rebind(), so
+                # connections queue there while the old socket closes
+                retired.server_close()
+                threading.Thread(target=self._drain, args=(retired,), daemon=True).start()
+                logger.info(f"Now listening on {self.host}:{self.port}")
+        finally:
+            # Stop accepting first, then let requests in flight finish
+            self.server.server_close()
+            if not self.server.wait_idle(self.drain_timeout):
+                logger.warning(f"Shutdown: {self.server.active} request(s) still running after "
+                               f"{self.drain_timeout}s, stopping anyway")
+            for hook in list(_shutdown_hooks):
+                try:
+                    hook()
+                except Exception as e:
+                    logger.error(f"Shutdown hook {hook!r} failed: {e}")
+            if current_server is self:
+                current_server = None
+
+    def _make_server(self, host, port, handler_class, listen_fd=None):
+        address = unix_socket_path(host) or (host, int(port))
+        return DrainingWSGIServer(address, handler_class, listen_fd, self.keep_alive_timeout,
+                                  self.max_keep_alive_requests, self.socket_mode)
+
+    def _drain(self, retired):
+        if not retired.wait_idle(self.drain_timeout):
+            logger.warning(f"Rebind: {retired.active} request(s) on the old listener still running "
+                           f"after {self.drain_timeout}s")
+
+    def begin_shutdown(self):
+        """Stop accepting connections; run() drains and returns"""
+        with self._lock:
+            if self._stopping.is_set() or self.server is None:
+                return
+            self._stopping.set()
+            listener = self.server
+            listener.draining = True
+        # shutdown() blocks until serve_forever returns, which may be running
+        # in the calling thread (e.g. a signal handler), so hand it off
+        threading.Thread(target=listener.shutdown, daemon=True).start()
+
+    def rebind(self, host, port):
+        """Listen on host:port, then retire the current listener"""
+        with self._lock:
+            if self.server is None or self._stopping.is_set() or self._next_server is not None:
+                return False
+            replacement = self._make_server(host, port, self.server.RequestHandlerClass)
+            replacement.set_app(self.server.get_app())
+            self._next_server = replacement
+            self.host = host
+            if not replacement.is_unix:
+                self.port = replacement.server_port
+            listener = self.server
+            listener.draining = True
+        threading.Thread(target=listener.shutdown, daemon=True).start()
+        return True
+
+    def restart(self):
+        """Start a new process on the same socket, then drain this one"""
+        with self._lock:
+            if self.server is None or self._stopping.is_set() or self._next_server is not None:
+                return False
+            listen_fd = self.server.socket.fileno()
+        ready_read, ready_write = os.pipe()
+        env = dict(os.environ, **{LISTEN_FD_ENV: str(listen_fd), READY_FD_ENV: str(ready_write)})
+        try:
+            child = subprocess.Popen(_restart_command(), env=env, pass_fds=(listen_fd, ready_write))
+        except OSError as e:
+            logger.error(f"Restart: could not start new process: {e}")
+            os.close(ready_read)
+            os.close(ready_write)
+            return False
+        os.close(ready_write)
+        try:
+            readable, _, _ = select.select([ready_read], [], [], RESTART_READY_TIMEOUT)
+            ready = bool(readable) and os.read(ready_read, 1) == b"1"
+        finally:
+            os.close(ready_read)
+        if not ready:
+            logger.error(f"Restart: new process {child.pid} did not become ready, keeping this one")
+            child.kill()
+            return False
+        logger.info(f"Restart: process {child.pid} is serving, draining this one")
+        self.begin_shutdown()
+        return True
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.begin_shutdown())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: request_restart())
+
+    @staticmethod
+    def _report_ready():
+        value = os.environ.pop(READY_FD_ENV, None)
+        # The socket is adopted now; processes started later must not adopt it again
+        for name in (LISTEN_FD_ENV, "LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES"):
+            os.environ.pop(name, None)
+        if value:
+            ready_fd = int(value)
+            try:
+                os.write(ready_fd, b"1")
+            finally:
+                os.close(ready_fd)
+
+
+server_names["graceful"] = GracefulServer
+
+
+def resolve_server(engine):
+    """Map the bottle-engine setting to a server; plain wsgiref gets GracefulServer"""
+    if engine in ("wsgiref", "graceful"):
+        return GracefulServer
+    return engine
@@ -0,0 +1,271 @@
+"""
+Read-only, memory-mapped alias snapshot shared by all worker processes.
+
+compile_snapshot writes the redirects table into a binary file with an
+open-addressing hash index and atomically swaps it into place. Every
+process maps the same file with SnapshotReader, so the OS page cache holds
+one copy no matter how many workers (or pods on a node) read it, and exact
+lookups touch neither SQLite nor per-alias Python objects.
+
+File layout (little-endian):
+
+    header      HEADER struct, see below
+    db_path     UTF-8 path of the source database
+    slots       slot_count x u32; record offset + 1, or 0 for an empty slot
+    records     per alias: u16 key length, u16 target length, key, target
+    prefixes    the same record format for path-forwarding aliases
+
+Keys are the alias, or the case-folded alias_key when the database has
+case-insensitive matching enabled (FLAG_CASE_INSENSITIVE).
+
+The header carries the database's sync version (see data.sync_version) as
+read before the rows were. A reader only serves a snapshot whose version
+and case flag match the database, so a snapshot left behind by a failed
+compile or by a slower, older one is never used.
+"""
+
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from tiny_redirect import data
+from tiny_redirect.trie import PrefixTrie, is_prefix_target
+
+MAGIC = b"TRSNAP02"
+FLAG_CASE_INSENSITIVE = 1
+
+# magic, flags, alias count, slot count, prefix count, db_path length,
+# slots offset, prefix records offset, database sync version
+HEADER = struct.Struct("<8sIIIIIQQQ")
+RECORD = struct.Struct("<HH")
+SLOT = struct.Struct("<I")
+
+
+def _slot_count(count):
+    """Power of two with a load factor of at most one half"""
+    slots = 8
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+
+def _pack_records(entries, base_offset):
+    """Return (records blob, offsets of each record relative to the file)"""
+    parts = []
+    offsets = []
+    position = base_offset
+    for key, target in entries:
+        key_bytes = key.encode("utf-8")
+        target_bytes = target.encode("utf-8")
+        record = RECORD.pack(len(key_bytes), len(target_bytes)) + key_bytes + target_bytes
+        offsets.append(position)
+        parts.append(record)
+        position += len(record)
+    return b"".join(parts), offsets
+
+
+# Held from reading the sync version to swapping the file in, so the
+# newest compile in this process is always the one replaced last
+_compile_lock = threading.Lock()
+
+
+def write_snapshot(entries, snapshot_path, db_path="", case_insensitive=False, version=0):
+    """
+    Write (key, target) entries into snapshot_path and swap it in atomically.
+
+    Entries whose target contains {rest} go to the prefix section; the rest
+    are indexed for exact lookups. When a key repeats, the last entry wins.
+    version is the database sync version the entries were read at.
+    """
+    exact = {}
+    prefixes = {}
+    for key, target in entries:
+        if is_prefix_target(target):
+            prefixes[key] = target
+        else:
+            exact[key] = target
+
+    db_path_bytes = db_path.encode("utf-8")
+    slot_count = _slot_count(len(exact))
+    slots_offset = HEADER.size + len(db_path_bytes)
+    slots_offset += -slots_offset % 4
+    records_offset = slots_offset + slot_count * SLOT.size
+
+    records, record_offsets = _pack_records(exact.items(), records_offset)
+    slots = [0] * slot_count
+    mask = slot_count - 1
+    for key, offset in zip(exact, record_offsets):
+        index = zlib.crc32(key.encode("utf-8")) & mask
+        while slots[index]:
+            index = (index + 1) & mask
+        slots[index] = offset + 1
+
+    prefix_offset = records_offset + len(records)
+    prefix_records, _ = _pack_records(prefixes.items(), prefix_offset)
+
+    header = HEADER.pack(
+        MAGIC,
+        FLAG_CASE_INSENSITIVE if case_insensitive else 0,
+        len(exact),
+        slot_count,
+        len(prefixes),
+        len(db_path_bytes),
+        slots_offset,
+        prefix_offset,
+        version,
+    )
+    padding = b"\0" * (slots_offset - HEADER.size - len(db_path_bytes))
+
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as snapshot_file:
+            snapshot_file.write(header)
+            snapshot_file.write(db_path_bytes)
+            snapshot_file.write(padding)
+            snapshot_file.write(struct.pack(f"<{slot_count}I", *slots))
+            snapshot_file.write(records)
+            snapshot_file.write(prefix_records)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, snapshot_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def compile_snapshot(db_path, snapshot_path):
+    """Compile the redirects table of db_path into snapshot_path"""
+    with _compile_lock:
+        # Read first: a write landing while the rows are read leaves the
+        # snapshot looking stale, never fresh with rows missing
+        version = data.sync_version(db_path)
+        case_insensitive = data.get_settings(db_path).case_insensitive
+        # Folded rows come newest first, so the oldest alias for a key wins
+        entries = data.iter_redirects(db_path, folded=case_insensitive)
+        write_snapshot(entries, snapshot_path, os.path.abspath(db_path), case_insensitive, version)
+
+
+class _MappedSnapshot:
+    """One opened snapshot file"""
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.mapping = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        (magic, flags, self.count, self.slot_count, prefix_count,
+         db_path_length, self.slots_offset, prefix_offset, self.version) = HEADER.unpack_from(self.mapping, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an alias snapshot")
+        self.case_insensitive = bool(flags & FLAG_CASE_INSENSITIVE)
+        self.db_path = self.mapping[HEADER.size:HEADER.size + db_path_length].decode("utf-8")
+        self.mask = self.slot_count - 1
+        # Path-forwarding aliases are few; they get an in-memory trie
+        entries = []
+        offset = prefix_offset
+        for _ in range(prefix_count):
+            key, target, offset = self._record(offset)
+            entries.append((key.decode("utf-8"), target.decode("utf-8")))
+        self.prefixes = PrefixTrie(entries, case_insensitive=self.case_insensitive)
+
+    def _record(self, offset):
+        key_length, target_length = RECORD.unpack_from(self.mapping, offset)
+        key_start = offset + RECORD.size
+        target_start = key_start + key_length
+        end = target_start + target_length
+        return self.mapping[key_start:target_start], self.mapping[target_start:end], end
+
+    def get(self, alias):
+        if self.case_insensitive:
+            alias = data.normalize_alias(alias)
+        key = alias.encode("utf-8")
+        index = zlib.crc32(key) & self.mask
+        while True:
+            (slot,) = SLOT.unpack_from(self.mapping, self.slots_offset + index * SLOT.size)
+            if not slot:
+                return None
+            record_key, target, _ = self._record(slot - 1)
+            if record_key == key:
+                return target.decode("utf-8")
+            index = (index + 1) & self.mask
+
+
+class SnapshotReader:
+    """
+    Looks aliases up in the snapshot at path, following atomic swaps.
+
+    The file is re-checked with os.stat when this process writes to the
+    database (data.generation changes) and otherwise at most every
+    check_interval seconds, so writes from other processes show up without
+    a restart. Each check also compares the snapshot's stamp with the
+    database; until a compile catches up, current() returns None and
+    lookups fall back to the per-process cache. Replaced mappings are left
+    for the garbage collector so lookups running in other threads are
+    never cut off.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._fresh = False
+        self._generation = None
+        self._checked_at = 0.0
+
+    def _refresh(self, db_path):
+        generation = data.generation(db_path)
+        now = time.monotonic()
+        if generation == self._generation and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._generation = generation
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self._snapshot = None
+                return None
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._snapshot is None or self._snapshot.identity != identity:
+                try:
+                    self._snapshot = _MappedSnapshot(self.path)
+                except (OSError, ValueError, struct.error):
+                    self._snapshot = None
+            self._fresh = self._snapshot is not None and self._is_fresh(self._snapshot, db_path)
+        return self._snapshot
+
+    @staticmethod
+    def _is_fresh(snapshot, db_path):
+        """True unless db_path has changed since the snapshot was compiled"""
+        if not os.path.exists(db_path):
+            # Nothing newer to be behind
+            return True
+        try:
+            return (
+                snapshot.version >= data.sync_version(db_path)
+                and snapshot.case_insensitive == data.get_settings(db_path).case_insensitive
+            )
+        except sqlite3.Error:
+            return False
+
+    def current(self, db_path):
+        """Return the mapped snapshot if it is an up-to-date copy of db_path, else None"""
+        snapshot = self._refresh(db_path)
+        if snapshot is None or not self._fresh or snapshot.db_path != os.path.abspath(db_path):
+            return None
+        return snapshot
+
+    def age(self):
+        """Seconds since the mapped snapshot file was written, or None"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return max(0.0, time.time() - snapshot.identity[1] / 1e9)
@@ -0,0 +1,166 @@
+"""
+Compact read-only alias store for very large redirect tables.
+
+CompactAliasStore keeps every alias in one sorted UTF-8 blob and every
+distinct redirect target in a second blob, addressed through array('I')
+offset tables. Lookups are O(log n): a C-level bisect over a sparse list
+holding every FENCE_INTERVAL-th alias picks a block, then a short binary
+search inside the block finds the alias. Only the fences are Python objects.
+
+Memory per alias is roughly
+
+    8 bytes (alias offset + target index)
+    + len(alias in UTF-8)
+    + (len(target in UTF-8) + 4) / number of aliases sharing that target
+    + about 50 / FENCE_INTERVAL bytes for the fence list
+
+benchmarks/bench_alias_store.py measures about 77 bytes per alias for 200k
+aliases with ~11 character names and distinct ~35 character targets, against
+about 181 bytes for the dict of str built by data.load_redirects. Lookups
+cost a few microseconds instead of a dict hit, and building the store peaks
+slightly higher than building the dict because the sort needs all keys.
+"""
+
+from array import array
+from bisect import bisect_right
+from operator import itemgetter
+
+# Every FENCE_INTERVAL-th alias is kept as a bytes object to narrow lookups
+FENCE_INTERVAL = 16
+
+
+class _SortedKeys:
+    """Sequence view over the sorted alias blob"""
+
+    __slots__ = ("_blob", "_offsets")
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+
+class CompactAliasStore:
+    """
+    Immutable alias -> redirect mapping packed into a few flat buffers.
+
+    Supports the read-only dict operations the routes use: get, in, len,
+    iteration over aliases and items().
+    """
+
+    def __init__(self, entries=()):
+        targets = {}
+        pairs = []
+        for alias, target in entries:
+            target_index = targets.setdefault(target, len(targets))
+            pairs.append((alias.encode("utf-8"), target_index))
+        # UTF-8 byte order matches code point order, so sorting the encoded
+        # keys gives the same order bisect sees at lookup time. The sort is
+        # on the key alone and stable, so duplicates keep their entry order.
+        pairs.sort(key=itemgetter(0))
+
+        key_offsets = array("I", [0])
+        target_indexes = array("I")
+        key_parts = []
+        position = 0
+        previous = None
+        for key, target_index in pairs:
+            if key == previous:
+                # Duplicate alias: the last entry wins, as with dict.update
+                target_indexes[-1] = target_index
+                continue
+            previous = key
+            key_parts.append(key)
+            position += len(key)
+            key_offsets.append(position)
+            target_indexes.append(target_index)
+
+        target_offsets = array("I", [0])
+        target_parts = []
+        position = 0
+        for target in targets:
+            encoded = target.encode("utf-8")
+            target_parts.append(encoded)
+            position += len(encoded)
+            target_offsets.append(position)
+
+        self._keys = _SortedKeys(b"".join(key_parts), key_offsets)
+        self._fences = key_parts[::FENCE_INTERVAL]
+        del key_parts
+        self._target_indexes = target_indexes
+        self._target_blob = b"".join(target_parts)
+        self._target_offsets = target_offsets
+
+    def __len__(self):
+        return len(self._target_indexes)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def _find(self, alias):
+        key = alias.encode("utf-8")
+        block = bisect_right(self._fences, key) - 1
+        if block < 0:
+            return -1
+        # Bisect inside the block with local lookups; going through
+        # _SortedKeys.__getitem__ per probe costs several times more.
+        blob = self._keys._blob
+        offsets = self._keys._offsets
+        low = block * FENCE_INTERVAL
+        high = min(low + FENCE_INTERVAL, len(self))
+        while low < high:
+            middle = (low + high) // 2
+            probe = blob[offsets[middle]:offsets[middle + 1]]
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def _target(self, index):
+        target_index = self._target_indexes[index]
+        start = self._target_offsets[target_index]
+        end = self._target_offsets[target_index + 1]
+        return self._target_blob[start:end].decode("utf-8")
+
+    def get(self, alias, default=None):
+        index = self._find(alias)
+        if index < 0:
+            return default
+        return self._target(index)
+
+    def __contains__(self, alias):
+        return self._find(alias) >= 0
+
+    def __getitem__(self, alias):
+        index = self._find(alias)
+        if index < 0:
+            raise KeyError(alias)
+        return self._target(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._keys[index].decode("utf-8")
+
+    def items(self):
+        """Yield (alias, redirect) pairs in alias order"""
+        for index in range(len(self)):
+            yield self._keys[index].decode("utf-8"), self._target(index)
+
+    def nbytes(self):
+        """Bytes held by the packed buffers (excluding small object headers)"""
+        return (
+            sum(len(fence) for fence in self._fences)
+            + len(self._keys._blob)
+            + self._keys._offsets.itemsize * len(self._keys._offsets)
+            + self._target_indexes.itemsize * len(self._target_indexes)
+            + len(self._target_blob)
+            + self._target_offsets.itemsize * len(self._target_offsets)
+        )
@@ -0,0 +1,105 @@
+"""
+Ahead-of-time compilation of the .stpl views.
+
+Bottle compiles a template the first time it is rendered, and compiles the
+included partials (header, navmenu, footer, js) again for every page that
+includes them. warm_templates compiles every view once at startup, registers
+it where bottle.template looks it up and gives all pages one shared include
+cache, so no request pays for compilation.
+
+build_bytecode stores the compiled code objects next to the views, so frozen
+builds (PyInstaller, Docker) also skip translating the stpl sources:
+
+    python -m tiny_redirect.templates [views_dir] [output_path]
+
+The bytecode file is ignored when it was built by another Python or Bottle
+version, and per template when the source has changed since.
+"""
+
+import hashlib
+import importlib.util
+import marshal
+import os
+
+import bottle
+
+TEMPLATE_EXTENSION = ".stpl"
+BYTECODE_FILE = "templates.bytecode"
+DEFAULT_VIEWS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "views")
+
+
+def template_names(views_dir):
+    """Names of the templates in views_dir, as passed to bottle.template"""
+    return sorted(
+        filename[:-len(TEMPLATE_EXTENSION)]
+        for filename in os.listdir(views_dir)
+        if filename.endswith(TEMPLATE_EXTENSION)
+    )
+
+
+def _source_hash(path):
+    with open(path, "rb") as source_file:
+        return hashlib.sha256(source_file.read()).digest()
+
+
+def _bytecode_tag():
+    return (importlib.util.MAGIC_NUMBER, bottle.__version__)
+
+
+def load_bytecode(path):
+    """Return {name: (source hash, code)} from a bytecode file, or {} if unusable"""
+    try:
+        with open(path, "rb") as bytecode_file:
+            payload = marshal.load(bytecode_file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return {}
+    if not isinstance(payload, dict) or payload.get("tag") != _bytecode_tag():
+        return {}
+    return payload.get("templates", {})
+
+
+def build_bytecode(views_dir=DEFAULT_VIEWS_DIR, output_path=None):
+    """Compile every template in views_dir into a bytecode file; return its path"""
+    output_path = output_path or os.path.join(views_dir, BYTECODE_FILE)
+    templates = {}
+    for name in template_names(views_dir):
+        compiled = bottle.SimpleTemplate(name=name, lookup=[views_dir])
+        templates[name] = (_source_hash(compiled.filename), compiled.co)
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "wb") as bytecode_file:
+        marshal.dump({"tag": _bytecode_tag(), "templates": templates}, bytecode_file)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def warm_templates(views_dir=DEFAULT_VIEWS_DIR, lookup=None):
+    """
+    Compile every template in views_dir and register it for bottle.template
+
+    lookup must be the template path bottle.template is called with
+    (bottle.TEMPLATE_PATH by default). Returns the number of templates
+    loaded from the bytecode file rather than compiled.
+    """
+    lookup = bottle.TEMPLATE_PATH if lookup is None else lookup
+    precompiled = load_bytecode(os.path.join(views_dir, BYTECODE_FILE))
+    shared_includes = {}
+    reused = 0
+    for name in template_names(views_dir):
+        compiled = bottle.SimpleTemplate(name=name, lookup=[views_dir])
+        entry = precompiled.get(name)
+        if entry is not None and entry[0] == _source_hash(compiled.filename):
+            # Fills bottle's cached_property without translating the source
+            compiled.__dict__["co"] = entry[1]
+            reused += 1
+        else:
+            compiled.co  # compiles on first access
+        compiled.cache = shared_includes
+        shared_includes[name] = compiled
+        bottle.TEMPLATES[(id(lookup), name)] = compiled
+    return reused
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(build_bytecode(*sys.argv[1:3]))
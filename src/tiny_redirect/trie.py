@@ -0,0 +1,92 @@
+"""Longest-prefix matching of request paths against path-forwarding aliases."""
+
+from urllib.parse import quote
+
+# Placeholder in a redirect target that receives the rest of the request path
+REST_PLACEHOLDER = "{rest}"
+
+# Characters left unescaped when the forwarded path is re-encoded
+_PATH_SAFE = "/:@!$&'()*+,;=-._~"
+
+
+def is_prefix_target(redirect):
+    """Return True if the redirect is a template that forwards the rest of the path"""
+    return REST_PLACEHOLDER in redirect
+
+
+def expand_target(template, rest, query_string=""):
+    """
+    Fill a prefix alias template with the forwarded path and query string.
+
+    The query string is appended with '?' or '&' depending on whether the
+    expanded target already carries one.
+    """
+    target = template.replace(REST_PLACEHOLDER, quote(rest, safe=_PATH_SAFE))
+    if query_string:
+        target += ("&" if "?" in target else "?") + query_string
+    return target
+
+
+class _Node:
+    __slots__ = ("children", "target")
+
+    def __init__(self):
+        self.children = {}
+        self.target = None
+
+
+class PrefixTrie:
+    """
+    Trie over '/'-separated alias segments.
+
+    Matching walks one node per path segment, so the cost depends on the
+    depth of the request path and not on how many aliases exist. With
+    case_insensitive=True segments are lower-cased on insert and on match,
+    while the forwarded rest keeps the case of the request.
+    """
+
+    def __init__(self, entries=(), case_insensitive=False):
+        self._root = _Node()
+        self._size = 0
+        self.case_insensitive = case_insensitive
+        for alias, target in entries:
+            self.insert(alias, target)
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, alias, target):
+        if self.case_insensitive:
+            alias = alias.lower()
+        node = self._root
+        for segment in alias.split("/"):
+            node = node.children.setdefault(segment, _Node())
+        if node.target is None:
+            self._size += 1
+        elif self.case_insensitive:
+            # Aliases differing only by case: the first one inserted wins
+            return
+        node.target = target
+
+    def longest_match(self, path):
+        """
+        Return (target, rest) for the longest alias that prefixes path.
+
+        rest is the remainder of the path after the matched segments,
+        without a leading slash. Returns None if no alias matches.
+        """
+        segments = path.split("/")
+        node = self._root
+        match = None
+        for depth, segment in enumerate(segments):
+            if self.case_insensitive:
+                segment = segment.lower()
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.target is not None:
+                match = (node.target, depth + 1)
+        if match is None:
+            return None
+        target, matched = match
+        return target, "/".join(segments[matched:])
@@ -32,6 +32,10 @@ def test_client(temp_db):
     original_db_path = app_module.db_path
     app_module.db_path = temp_db
 
+    # Keep /shutdown from signalling the test runner
+    original_shutdown_server = app_module.shutdown_server
+    app_module.shutdown_server = lambda: None
+
     # Create test client
     from webtest import TestApp
     client = TestApp(app)
@@ -40,6 +44,7 @@ def test_client(temp_db):
 
     # Restore original db path
     app_module.db_path = original_db_path
+    app_module.shutdown_server = original_shutdown_server
 
 
 @pytest.fixture
@@ -1,5 +1,8 @@
 """Tests for app.py - web routes and CSRF protection."""
 
+import gzip
+import time
+
 import pytest
 from tiny_redirect.app import (
     generate_csrf_token,
@@ -84,6 +87,42 @@ class TestAboutRoute:
         assert "sethstenzel.me" in response.location
 
 
+class TestHealthRoutes:
+    """Tests for the liveness and readiness probes."""
+
+    def test_healthz(self, test_client):
+        """Test liveness probe answers 200 with a trivial body."""
+        response = test_client.get('/healthz')
+        assert response.status_int == 200
+        assert response.body == b"ok"
+
+    def test_readyz_cold_cache(self, test_client):
+        """Test readiness probe reports not ready until the cache is loaded."""
+        import tiny_redirect.app as app_module
+        app_module.alias_cache.clear()
+        response = test_client.get('/readyz', expect_errors=True)
+        assert response.status_int == 503
+        assert response.json["database"] == "ok"
+        assert response.json["cache"] == "cold"
+
+    def test_readyz_warm_cache(self, test_client, temp_db):
+        """Test readiness probe reports ready once the cache is loaded."""
+        import tiny_redirect.app as app_module
+        app_module.alias_cache.warm(temp_db)
+        response = test_client.get('/readyz')
+        assert response.status_int == 200
+        assert response.json["status"] == "ready"
+        assert response.json["cache"] == "warm"
+
+    def test_readyz_database_unreachable(self, test_client, temp_db):
+        """Test readiness probe fails when the database is gone."""
+        import os
+        os.unlink(temp_db)
+        response = test_client.get('/readyz', expect_errors=True)
+        assert response.status_int == 503
+        assert response.json["database"] == "unreachable"
+
+
 class TestAliasRedirection:
     """Tests for alias redirection."""
 
@@ -101,12 +140,140 @@ class TestAliasRedirection:
         assert response.status_int == 303
         assert response.location == "http://example.com"
 
+    def test_location_is_stored_target(self, test_client, temp_db):
+        """Test that the Location header is the canonical stored target."""
+        data.add_alias("wiki", "wiki.example/Hauptseite ä", temp_db)
+        response = test_client.get('/wiki')
+        assert response.headers["Location"] == "http://wiki.example/Hauptseite%20%C3%A4"
+
     def test_invalid_alias(self, test_client):
         """Test that invalid aliases show error page."""
         response = test_client.get('/nonexistent', expect_errors=True)
         assert response.status_int == 200
         assert b"Alias Not Found" in response.body
 
+    def test_redirects_are_not_rate_limited_by_default(self, test_client, temp_db, monkeypatch):
+        """Test that rate limiting is off unless limits are configured."""
+        import tiny_redirect.app as app_module
+        monkeypatch.delenv('TINYREDIRECT_RATE_LIMITS', raising=False)
+        app_module.configure_rate_limits(data.get_settings(temp_db))
+        assert app_module.rate_limiter.limiters == {}
+        data.add_alias("google", "https://google.com", temp_db)
+        assert all(test_client.get('/google').status_int == 303 for _ in range(150))
+
+    def test_redirects_are_rate_limited(self, test_client, temp_db, monkeypatch):
+        """Test that a client over its redirect budget gets a 429."""
+        import tiny_redirect.app as app_module
+        monkeypatch.setenv('TINYREDIRECT_RATE_LIMITS', 'redirect=1:2')
+        app_module.configure_rate_limits()
+        try:
+            data.add_alias("google", "https://google.com", temp_db)
+            assert test_client.get('/google').status_int == 303
+            assert test_client.get('/google').status_int == 303
+            response = test_client.get('/google', expect_errors=True)
+            assert response.status_int == 429
+            assert "Retry-After" in response.headers
+            assert test_client.get('/healthz').status_int == 200
+        finally:
+            monkeypatch.delenv('TINYREDIRECT_RATE_LIMITS')
+            app_module.configure_rate_limits()
+
+    def test_rate_limit_keys_on_forwarded_client_behind_trusted_proxy(self, test_client, temp_db, monkeypatch):
+        """Test that clients behind a trusted proxy get their own buckets."""
+        import tiny_redirect.app as app_module
+        monkeypatch.delenv('TINYREDIRECT_TRUSTED_PROXIES', raising=False)
+        monkeypatch.setenv('TINYREDIRECT_RATE_LIMITS', 'redirect=1:1')
+        data.update_settings({"trusted-proxies": "127.0.0.1"}, temp_db)
+        app_module.configure_rate_limits(data.get_settings(temp_db))
+        try:
+            data.add_alias("google", "https://google.com", temp_db)
+            proxy = {"REMOTE_ADDR": "127.0.0.1"}
+            first = {"X-Forwarded-For": "203.0.113.1"}
+            assert test_client.get('/google', headers=first, extra_environ=proxy).status_int == 303
+            assert test_client.get('/google', headers=first, extra_environ=proxy,
+                                   expect_errors=True).status_int == 429
+            second = {"X-Forwarded-For": "203.0.113.2"}
+            assert test_client.get('/google', headers=second, extra_environ=proxy).status_int == 303
+        finally:
+            monkeypatch.delenv('TINYREDIRECT_RATE_LIMITS')
+            app_module.configure_rate_limits()
+
+    def test_invalid_alias_is_escaped(self, test_client):
+        """Test that the missing alias is HTML-escaped on the cached page."""
+        first = test_client.get('/first-miss')
+        response = test_client.get('/%3Cscript%3E')
+        assert b"<strong>&lt;script&gt;</strong>" in response.body
+        assert first.body.replace(b"first-miss", b"&lt;script&gt;") == response.body
+
+
+    def test_host_selects_namespace(self, test_client, temp_db):
+        """Test that the first label of the Host header picks the alias namespace."""
+        data.add_alias("ex", "https://wiki.example", temp_db, namespace="wiki")
+        response = test_client.get('/ex', headers={"Host": "wiki.example.com"})
+        assert response.location == "https://wiki.example"
+        response = test_client.get('/ex', headers={"Host": "other.example.com"})
+        assert response.location == "https://example.com"
+
+class TestCaseInsensitiveRedirection:
+    """Tests for case-insensitive alias matching."""
+
+    def test_case_sensitive_by_default(self, test_client, temp_db):
+        """Test that aliases match exactly when the mode is off."""
+        data.add_alias("wiki", "https://wiki.example", temp_db)
+        response = test_client.get('/Wiki')
+        assert b"Alias Not Found" in response.body
+
+    def test_case_insensitive_mode(self, test_client, temp_db):
+        """Test that any casing matches once the mode is on."""
+        data.add_alias("wiki", "https://wiki.example", temp_db)
+        data.update_setting("case-insensitive", "True", temp_db)
+        assert test_client.get('/WIKI').location == "https://wiki.example"
+        assert test_client.get('/wiki').location == "https://wiki.example"
+
+    def test_case_insensitive_prefix_alias(self, test_client, temp_db):
+        """Test that prefix aliases fold case but keep the forwarded path."""
+        data.add_alias("jira", "https://jira.example/browse/{rest}", temp_db)
+        data.update_setting("case-insensitive", "True", temp_db)
+        response = test_client.get('/JIRA/AbC-1')
+        assert response.location == "https://jira.example/browse/AbC-1"
+
+
+class TestPrefixAliasRedirection:
+    """Tests for path-forwarding aliases."""
+
+    def test_forwards_rest_of_path(self, test_client, temp_db):
+        """Test that the remaining path fills the {rest} placeholder."""
+        data.add_alias("jira", "https://jira.example/browse/{rest}", temp_db)
+        response = test_client.get('/jira/ABC-123')
+        assert response.status_int == 303
+        assert response.location == "https://jira.example/browse/ABC-123"
+
+    def test_forwards_query_string(self, test_client, temp_db):
+        """Test that the query string is forwarded to the target."""
+        data.add_alias("search", "https://search.example/{rest}?src=tr", temp_db)
+        response = test_client.get('/search/docs?q=bottle')
+        assert response.location == "https://search.example/docs?src=tr&q=bottle"
+
+    def test_bare_prefix_alias(self, test_client, temp_db):
+        """Test that a prefix alias without a trailing path forwards an empty rest."""
+        data.add_alias("jira", "https://jira.example/browse/{rest}", temp_db)
+        response = test_client.get('/jira')
+        assert response.location == "https://jira.example/browse/"
+
+    def test_longest_prefix_wins(self, test_client, temp_db):
+        """Test that a deeper alias takes precedence over a shorter one."""
+        data.add_alias("docs", "https://docs.example/{rest}", temp_db)
+        data.add_alias("docs/api", "https://api.example/ref/{rest}", temp_db)
+        assert test_client.get('/docs/api/v1').location == "https://api.example/ref/v1"
+        assert test_client.get('/docs/guide').location == "https://docs.example/guide"
+
+    def test_exact_alias_does_not_forward(self, test_client, temp_db):
+        """Test that exact aliases do not match longer paths."""
+        data.add_alias("google", "https://google.com", temp_db)
+        response = test_client.get('/google/extra')
+        assert response.status_int == 200
+        assert b"Alias Not Found" in response.body
+
 
 class TestAddAlias:
     """Tests for adding aliases."""
@@ -159,6 +326,23 @@ class TestAddAlias:
         assert response.status_int == 200
         assert b"cannot be empty" in response.body
 
+    def test_add_with_expiry(self, test_client, csrf_token, temp_db):
+        """Test that an alias added with a past expiry no longer resolves."""
+        test_client.post('/add', {
+            'alias': 'tmp',
+            'redirect': 'https://tmp.example',
+            'expires_at': '2000-01-01T00:00',
+            'csrf_token': csrf_token,
+        })
+        assert "tmp" in data.load_expiries(temp_db)
+        response = test_client.get('/tmp', expect_errors=True)
+        assert response.status_int != 303
+
+    def test_redirects_page_shows_expiry(self, test_client, temp_db):
+        """Test that the redirects page shows when an alias expires."""
+        data.set_alias_expiry("ex", 4102444800, temp_db)
+        assert "expires 2100-01-0" in test_client.get('/redirects').text
+
 
 class TestDeleteAlias:
     """Tests for deleting aliases."""
@@ -192,6 +376,60 @@ class TestDeleteAlias:
         assert 'todelete' not in db_data['redirects']
 
 
+class TestEditAlias:
+    """Tests for editing aliases."""
+
+    def test_edit_without_csrf(self, test_client):
+        """Test that editing without CSRF token is rejected."""
+        response = test_client.post('/edit', {
+            'old_alias': 'ex', 'new_alias': 'example',
+        }, expect_errors=True)
+        assert response.status_int == 403
+
+    def test_edit_redirect(self, test_client, csrf_token, temp_db):
+        """Test changing only the redirect URL."""
+        response = test_client.post('/edit', {
+            'old_alias': 'ex',
+            'new_alias': 'ex',
+            'new_redirect': 'https://changed.example',
+            'csrf_token': csrf_token,
+        })
+        assert response.status_int == 303
+        assert data.load_data(temp_db)['redirects']['ex'] == 'https://changed.example'
+
+    def test_rename_alias(self, test_client, csrf_token, temp_db):
+        """Test renaming an alias keeps its redirect."""
+        test_client.post('/edit', {
+            'old_alias': 'ex',
+            'new_alias': 'example',
+            'new_redirect': '',
+            'csrf_token': csrf_token,
+        })
+        assert data.load_data(temp_db)['redirects'] == {'example': 'https://example.com'}
+
+    def test_edit_missing_alias(self, test_client, csrf_token):
+        """Test editing an unknown alias shows an error."""
+        response = test_client.post('/edit', {
+            'old_alias': 'missing',
+            'new_alias': 'missing',
+            'new_redirect': 'https://x.example',
+            'csrf_token': csrf_token,
+        })
+        assert b"not found" in response.body
+
+    def test_rename_onto_existing_alias(self, test_client, csrf_token, temp_db):
+        """Test a conflicting rename leaves both aliases untouched."""
+        data.add_alias("taken", "https://taken.example", temp_db)
+        response = test_client.post('/edit', {
+            'old_alias': 'ex',
+            'new_alias': 'taken',
+            'new_redirect': '',
+            'csrf_token': csrf_token,
+        })
+        assert b"already exists" in response.body
+        assert data.load_data(temp_db)['redirects']['ex'] == 'https://example.com'
+
+
 class TestSettings:
     """Tests for settings routes."""
 
@@ -237,6 +475,114 @@ class TestSettings:
         assert response.status_int == 200
         assert b"between 1 and 65535" in response.body
 
+    def test_debug_applies_without_restart(self, test_client, csrf_token, monkeypatch):
+        """Test that the debug flag takes effect immediately."""
+        import bottle
+        monkeypatch.setattr(bottle, "DEBUG", False)
+        test_client.post('/update_settings', {'debug': 'True', 'csrf_token': csrf_token})
+        assert bottle.DEBUG is True
+
+    def test_port_change_moves_listener(self, test_client, csrf_token, monkeypatch):
+        """Test that a new port rebinds the running server and follows it."""
+        from tiny_redirect import server
+        calls = []
+        monkeypatch.delenv('TINYREDIRECT_PORT', raising=False)
+        monkeypatch.setattr(server, "request_rebind", lambda host, port: calls.append(port) or True)
+        response = test_client.post('/update_settings', {'port': '8081', 'csrf_token': csrf_token})
+        assert calls == ['8081']
+        assert response.location.endswith(':8081/settings')
+
+    def test_port_change_bind_failure_reverts(self, test_client, csrf_token, temp_db, monkeypatch):
+        """Test that a port that cannot be bound is not stored."""
+        from tiny_redirect import server
+
+        def fail(host, port):
+            raise OSError("Address already in use")
+
+        monkeypatch.delenv('TINYREDIRECT_PORT', raising=False)
+        monkeypatch.setattr(server, "request_rebind", fail)
+        response = test_client.post('/update_settings', {'port': '8081', 'csrf_token': csrf_token})
+        assert b"Could not listen" in response.body
+        assert data.load_data(temp_db)['settings']['port'] == 80
+
+    def test_reloader_change_requires_restart(self, test_client, csrf_token, temp_db, monkeypatch):
+        """Test that a reloader change is stored but reported as needing a restart."""
+        from tiny_redirect import server
+        monkeypatch.setattr(server, "request_restart", lambda: pytest.fail("restart requested"))
+        response = test_client.post('/update_settings', {'reloader': 'True', 'csrf_token': csrf_token})
+        assert response.status_int == 200
+        assert b"Restart Required" in response.body
+        assert b"bottle-reloader" in response.body
+        assert data.get_settings(temp_db).bottle_reloader is True
+
+    def test_rate_limits_apply_without_restart(self, test_client, csrf_token, temp_db, monkeypatch):
+        """Test that saved rate limits replace the running limiter's."""
+        import tiny_redirect.app as app_module
+        monkeypatch.delenv('TINYREDIRECT_RATE_LIMITS', raising=False)
+        try:
+            test_client.post('/update_settings', {'rate_limits': 'redirect=7:9', 'csrf_token': csrf_token})
+            limiter = app_module.rate_limiter.limiters["redirect"]
+            assert (limiter.rate, limiter.burst) == (7.0, 9)
+            response = test_client.post('/update_settings', {'rate_limits': 'bogus', 'csrf_token': csrf_token})
+            assert b"class=rate:burst" in response.body
+            assert app_module.rate_limiter.limiters["redirect"] is limiter
+        finally:
+            app_module.configure_rate_limits()
+
+    def test_log_level_applies_without_restart(self, test_client, csrf_token, tmp_path, monkeypatch):
+        """Test that a saved log level changes the running file handler."""
+        import tiny_redirect.app as app_module
+        from loguru import logger
+        log_file = tmp_path / "tinyredirect.log"
+        monkeypatch.setattr(app_module, "get_log_path", lambda: str(log_file))
+        app_module.setup_logging(enable_info_logging=False)
+        try:
+            logger.info("before the change")
+            test_client.post('/update_settings', {'log_level': 'DEBUG', 'csrf_token': csrf_token})
+            logger.debug("after the change")
+            test_client.post('/update_settings', {'log_level': '', 'csrf_token': csrf_token})
+            logger.info("back to the default")
+            logger.complete()
+            contents = log_file.read_text()
+            assert "before the change" not in contents
+            assert "after the change" in contents
+            assert "back to the default" not in contents
+        finally:
+            logger.remove()
+            app_module._log_handlers.clear()
+            logger.add(__import__("sys").stderr)
+
+    def test_update_invalid_port_keeps_other_fields(self, test_client, csrf_token, temp_db):
+        """Test that a rejected form does not apply its valid fields."""
+        test_client.post('/update_settings', {
+            'shortname': 'go',
+            'port': '99999',
+            'debug': 'True',
+            'csrf_token': csrf_token,
+        })
+        db_data = data.load_data(temp_db)
+        assert db_data['settings']['shortname'] == 'r'
+        assert db_data['settings']['bottle-debug'] == 'False'
+
+
+class TestImport:
+    """Tests for importing redirects from the settings page."""
+
+    def test_dry_run_writes_nothing(self, test_client, csrf_token, temp_db):
+        """Test that a dry-run import shows the diff and leaves the database alone."""
+        import json
+        payload = json.dumps({
+            "file_type": "tredirects",
+            "version": "1.0",
+            "redirects": [{"alias": "new", "redirect": "https://new.example"}],
+        }).encode()
+        response = test_client.post('/import_redirects', {
+            'csrf_token': csrf_token,
+            'dry_run': 'on',
+        }, upload_files=[('import_file', 'tredirects.json', payload)])
+        assert b"Import Dry Run" in response.body
+        assert b"New aliases: 1" in response.body
+        assert data.find_alias("new", temp_db) is None
 
 class TestRedirectsPage:
     """Tests for the redirects management page."""
@@ -246,6 +592,186 @@ class TestRedirectsPage:
         response = test_client.get('/redirects')
         assert response.status_int in [200, 303]
 
+    def test_large_export_is_compressed(self, test_client, temp_db):
+        """Test exports over the size threshold are sent compressed."""
+        for i in range(40):
+            data.add_alias(f"alias{i}", f"https://example.com/page/{i}", temp_db)
+        # webob directly: WebTest would decode the body and drop the header
+        from webob import Request
+        response = Request.blank('/export_redirects', headers={'Accept-Encoding': 'gzip'}).get_response(app)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        plain = test_client.get('/export_redirects')
+        assert 'Content-Encoding' not in plain.headers
+        assert gzip.decompress(response.body) == plain.body
+        assert len(response.body) < len(plain.body)
+
+
+class TestJSONApi:
+    """Tests for the token-authenticated JSON API."""
+
+    TOKEN = "test-api-token"
+
+    @pytest.fixture
+    def api_client(self, test_client, monkeypatch):
+        import tiny_redirect.app as app_module
+        monkeypatch.setattr(app_module, "api_token", self.TOKEN)
+        test_client.authorization = ("Bearer", self.TOKEN)
+        return test_client
+
+    def test_requires_token(self, test_client):
+        """Test that requests without a token are rejected."""
+        response = test_client.get('/api/v1/redirects', expect_errors=True)
+        assert response.status_int == 401
+
+    def test_rejects_wrong_token(self, api_client):
+        """Test that a wrong token is rejected."""
+        api_client.authorization = ("Bearer", "wrong")
+        response = api_client.get('/api/v1/redirects', expect_errors=True)
+        assert response.status_int == 401
+
+    def test_list_redirects(self, api_client):
+        """Test listing redirects as JSON."""
+        response = api_client.get('/api/v1/redirects')
+        assert response.json == {"redirects": [{"alias": "ex", "redirect": "https://example.com"}]}
+
+    def test_namespaced_batch_and_list(self, api_client):
+        """Test creating and listing aliases of a namespace through the API."""
+        response = api_client.post_json('/api/v1/redirects/batch', {
+            "namespace": "wiki",
+            "operations": [{"op": "create", "alias": "docs", "redirect": "https://docs.example"}],
+        })
+        assert response.json["committed"] is True
+        assert api_client.get('/api/v1/namespaces').json == {"namespaces": ["wiki"]}
+        response = api_client.get('/api/v1/redirects?namespace=wiki')
+        assert response.json == {"redirects": [{"alias": "docs", "redirect": "https://docs.example"}]}
+        response = api_client.get('/api/v1/redirects?namespace=Bad!', expect_errors=True)
+        assert response.status_int == 400
+
+    def test_import_diff(self, api_client, temp_db):
+        """Test that the import dry run reports changes without writing them."""
+        import json
+        payload = json.dumps({
+            "file_type": "tredirects",
+            "version": "1.0",
+            "redirects": [{"alias": "ex", "redirect": "https://other.example"},
+                          {"alias": "new", "redirect": "https://new.example"}],
+        })
+        response = api_client.post('/api/v1/import/diff?limit=1', payload,
+                                   content_type="application/json")
+        assert response.json["counts"]["added"] == 1
+        assert response.json["conflicting"][0]["current"] == "https://example.com"
+        assert response.json["next"] is None
+        assert data.find_alias("new", temp_db) is None
+        response = api_client.post('/api/v1/import/diff', "{}", expect_errors=True)
+        assert response.status_int == 400
+
+    def test_delta_sync(self, api_client, temp_db):
+        """Test ?since= returns only changes and honours If-None-Match."""
+        first = api_client.get('/api/v1/redirects?since=0')
+        assert first.json["reset"] is True
+        assert [item["alias"] for item in first.json["changed"]] == ["ex"]
+        version = first.json["version"]
+        assert first.headers["ETag"] == f'"{version}"'
+
+        data.add_alias("new", "https://new.example", temp_db)
+        data.delete_alias("ex", temp_db)
+        delta = api_client.get(f'/api/v1/redirects?since={version}')
+        assert [item["alias"] for item in delta.json["changed"]] == ["new"]
+        assert delta.json["deleted"] == ["ex"]
+
+        unchanged = api_client.get(
+            f'/api/v1/redirects?since={delta.json["version"]}',
+            headers={"If-None-Match": delta.headers["ETag"]},
+        )
+        assert unchanged.status_int == 304
+        assert unchanged.body == b""
+        stale = api_client.get(f'/api/v1/redirects?since={version}', headers={"If-None-Match": f'W/"{version}"'})
+        assert stale.status_int == 200
+
+    def test_delta_sync_rejects_bad_version(self, api_client):
+        """Test a malformed since is a 400."""
+        assert api_client.get('/api/v1/redirects?since=abc', expect_errors=True).status_int == 400
+        assert api_client.get('/api/v1/redirects?since=-1', expect_errors=True).status_int == 400
+
+    def test_batch(self, api_client, temp_db):
+        """Test applying a batch returns per-item results."""
+        response = api_client.post_json('/api/v1/redirects/batch', {
+            "operations": [
+                {"op": "create", "alias": "a", "redirect": "https://a.example"},
+                {"op": "create", "alias": "b", "redirect": "https://b.example"},
+            ],
+        })
+        assert response.status_int == 200
+        assert response.json["succeeded"] == 2
+        assert api_client.get('/a').location == "https://a.example"
+
+    def test_atomic_batch_failure(self, api_client, temp_db):
+        """Test that an atomic batch with a failure answers 422 and writes nothing."""
+        response = api_client.post_json('/api/v1/redirects/batch', {
+            "atomic": True,
+            "operations": [
+                {"op": "create", "alias": "a", "redirect": "https://a.example"},
+                {"op": "create", "alias": "ex", "redirect": "https://dup.example"},
+            ],
+        }, expect_errors=True)
+        assert response.status_int == 422
+        assert response.json["committed"] is False
+        assert "a" not in data.load_data(temp_db)["redirects"]
+
+    def test_batch_invalid_json(self, api_client):
+        """Test that a malformed body answers 400."""
+        response = api_client.post('/api/v1/redirects/batch', "{not json",
+                                   content_type="application/json", expect_errors=True)
+        assert response.status_int == 400
+        assert "Invalid JSON" in response.json["error"]
+
+
+    def test_backup_disabled(self, api_client, monkeypatch):
+        """Test that the backup endpoint reports when backups are off."""
+        import tiny_redirect.app as app_module
+        monkeypatch.setattr(app_module, "backup_dir", None)
+        monkeypatch.setattr(app_module, "backup_worker", None)
+        response = api_client.post('/api/v1/backup', expect_errors=True)
+        assert response.status_int == 409
+
+    def test_backup(self, api_client, tmp_path, monkeypatch):
+        """Test that the backup endpoint writes a backup file."""
+        import tiny_redirect.app as app_module
+        monkeypatch.setattr(app_module, "backup_dir", str(tmp_path))
+        monkeypatch.setattr(app_module, "backup_worker", None)
+        response = api_client.post('/api/v1/backup')
+        assert response.status_int == 201
+        assert (tmp_path / response.json["backup"]).stat().st_size == response.json["bytes"]
+
+    def test_alias_history(self, api_client):
+        """Test that history lists changes newest first with their source."""
+        api_client.post_json('/api/v1/redirects/batch', {
+            "operations": [{"op": "update", "alias": "ex", "redirect": "https://new.example"}],
+        })
+        response = api_client.get('/api/v1/history', {'alias': 'ex'})
+        entry = response.json["history"][0]
+        assert entry["action"] == "edit"
+        assert entry["before"] == "https://example.com"
+        assert entry["after"] == "https://new.example"
+        assert entry["source"].startswith("api")
+        assert response.json["next"] is None
+
+    def test_restore_alias(self, api_client, csrf_token, temp_db):
+        """Test restoring an alias to a point in time before it was deleted."""
+        data.add_alias("wiki", "https://wiki.example", temp_db)
+        at = time.time()
+        api_client.post('/del', {'alias': 'wiki', 'csrf_token': csrf_token})
+        assert api_client.get('/api/v1/history', {'alias': 'wiki'}).json["history"][0]["source"].startswith("web")
+        response = api_client.post_json('/api/v1/restore', {"alias": "wiki", "at": at})
+        assert response.json == {"alias": "wiki", "redirect": "https://wiki.example"}
+        assert data.find_alias("wiki", temp_db) == "https://wiki.example"
+
+    def test_restore_without_history(self, api_client):
+        """Test that restoring to a time before any history answers 400."""
+        response = api_client.post_json('/api/v1/restore', {"alias": "ex", "at": 0}, expect_errors=True)
+        assert response.status_int == 400
+
 
 class TestShutdown:
     """Tests for shutdown route."""
@@ -256,3 +782,125 @@ class TestShutdown:
         response = test_client.get('/shutdown')
         assert response.status_int == 200
         assert b"Shutting Down" in response.body
+
+
+class TestStartup:
+    """Tests for import cost and startup behaviour."""
+
+    # Cumulative import time budget for `python -m tiny_redirect`, in microseconds
+    IMPORT_TIME_BUDGET_US = 300_000
+
+    # Modules that must only be imported on the code paths that use them
+    DEFERRED_MODULES = {"requests", "webbrowser", "pystray", "PIL", "zstandard"}
+
+    def _import_times(self):
+        """Run the module entry point's imports under -X importtime."""
+        import os
+        import subprocess
+        import sys
+
+        src_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+        env = dict(os.environ, PYTHONPATH=src_dir)
+        # Importing tiny_redirect.__main__ pulls in the same modules as
+        # `python -m tiny_redirect` without starting the server.
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import tiny_redirect.__main__"],
+            capture_output=True, text=True, env=env, check=True,
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            times[name.strip()] = int(cumulative)
+        return times
+
+    def test_deferred_modules_not_imported(self):
+        """Test that optional and rarely used modules are not imported at startup."""
+        times = self._import_times()
+        imported = {name.split(".")[0] for name in times}
+        assert not imported & self.DEFERRED_MODULES
+
+    def test_import_time_budget(self):
+        """Test that importing the entry point stays within the time budget."""
+        times = self._import_times()
+        assert times["tiny_redirect.__main__"] <= self.IMPORT_TIME_BUDGET_US
+
+    def test_main_does_not_load_redirects(self, temp_db, monkeypatch):
+        """Test that startup reads settings and a count, not the redirects table."""
+        import tiny_redirect.app as app_module
+
+        def fail_load(*args, **kwargs):
+            raise AssertionError("redirects table loaded during startup")
+
+        monkeypatch.setattr(data, "load_data", fail_load)
+        monkeypatch.setattr(data, "load_redirects", fail_load)
+        monkeypatch.setattr(app_module, "get_db_path", lambda: temp_db)
+        monkeypatch.setattr(app_module, "setup_logging", lambda *args: None)
+        monkeypatch.setattr(app_module, "create_tray_icon", lambda *args: None)
+        monkeypatch.setattr(app_module.alias_cache, "warm", lambda *args: None)
+        monkeypatch.setattr(type(app_module.app), "run", lambda self, **kwargs: None)
+        monkeypatch.setattr("sys.argv", ["tiny-redirect", "--startup"])
+        monkeypatch.setattr("sys.excepthook", __import__("sys").excepthook)
+        listeners = list(data._write_listeners)
+
+        try:
+            app_module.main()
+        finally:
+            app_module.stop_background_workers()
+        assert data._write_listeners == listeners
+        import threading
+        workers = {"expiry-sweeper", "history-compactor", "link-checker", "backup-worker"}
+        assert not [thread for thread in threading.enumerate() if thread.name in workers]
+
+    def test_main_adopts_inherited_socket_with_graceful_server(self, temp_db, monkeypatch):
+        """Test that a hand-over child ignores the reloader and engine settings."""
+        import tiny_redirect.app as app_module
+        from tiny_redirect import server
+
+        data.update_settings({"bottle-reloader": "True", "bottle-engine": "waitress"}, temp_db)
+        runs = []
+        monkeypatch.setattr(app_module, "get_db_path", lambda: temp_db)
+        monkeypatch.setattr(app_module, "setup_logging", lambda *args: None)
+        monkeypatch.setattr(app_module, "create_tray_icon", lambda *args: None)
+        monkeypatch.setattr(app_module.alias_cache, "warm", lambda *args: None)
+        monkeypatch.setattr(type(app_module.app), "run", lambda self, **kwargs: runs.append(kwargs))
+        monkeypatch.setattr("sys.argv", ["tiny-redirect", "--startup"])
+        monkeypatch.setattr("sys.excepthook", __import__("sys").excepthook)
+        monkeypatch.setenv(server.LISTEN_FD_ENV, "3")
+        monkeypatch.delenv("BOTTLE_CHILD", raising=False)
+
+        try:
+            app_module.main()
+        finally:
+            app_module.stop_background_workers()
+        assert runs[0]["reloader"] is False
+        assert runs[0]["server"] is server.GracefulServer
+
+    @pytest.mark.parametrize("child", [False, True])
+    def test_workers_run_only_in_serving_process(self, temp_db, monkeypatch, child):
+        """Test that with the reloader on, only the reloader child starts background workers."""
+        import threading
+        import tiny_redirect.app as app_module
+
+        data.update_settings({"bottle-reloader": "True"}, temp_db)
+        started = []
+        monkeypatch.setattr(app_module, "get_db_path", lambda: temp_db)
+        monkeypatch.setattr(app_module, "setup_logging", lambda *args: None)
+        monkeypatch.setattr(app_module, "create_tray_icon", lambda *args: None)
+        monkeypatch.setattr(app_module.alias_cache, "warm", lambda *args: None)
+        monkeypatch.setattr(type(app_module.app), "run", lambda self, **kwargs: started.extend(
+            thread.name for thread in threading.enumerate() if thread.name == "expiry-sweeper"))
+        monkeypatch.setattr("sys.argv", ["tiny-redirect", "--startup"])
+        monkeypatch.setattr("sys.excepthook", __import__("sys").excepthook)
+        monkeypatch.delenv("TINYREDIRECT_LISTEN_FD", raising=False)
+        if child:
+            monkeypatch.setenv("BOTTLE_CHILD", "true")
+        else:
+            monkeypatch.delenv("BOTTLE_CHILD", raising=False)
+
+        try:
+            app_module.main()
+        finally:
+            app_module.stop_background_workers()
+        assert started == (["expiry-sweeper"] if child else [])
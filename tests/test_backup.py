@@ -0,0 +1,144 @@
+"""Tests for backup.py - online backups and restores."""
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from tiny_redirect import data
+from tiny_redirect.backup import (
+    BackupWorker,
+    backup_database,
+    list_backups,
+    main,
+    prune_backups,
+    restore_database,
+    verify_database,
+)
+from tiny_redirect.data import ValidationError
+
+
+class TestBackupDatabase:
+    """Tests for taking backups."""
+
+    def test_backup_is_a_copy(self, temp_db, tmp_path):
+        data.add_alias("wiki", "https://wiki.example", temp_db)
+        path = backup_database(temp_db, str(tmp_path))
+        verify_database(path)
+        assert data.find_alias("wiki", path) == "https://wiki.example"
+
+    def test_compressed_backup_restores(self, temp_db, tmp_path):
+        data.add_alias("wiki", "https://wiki.example", temp_db)
+        path = backup_database(temp_db, str(tmp_path / "backups"), compress=True)
+        assert path.endswith(".db.zst")
+        data.delete_alias("wiki", temp_db)
+        restore_database(path, temp_db)
+        assert data.find_alias("wiki", temp_db) == "https://wiki.example"
+
+    def test_retention(self, temp_db, tmp_path):
+        for _ in range(4):
+            backup_database(temp_db, str(tmp_path), keep=2)
+        assert len(list_backups(str(tmp_path))) == 2
+        assert prune_backups(str(tmp_path), keep=0) == []
+
+    def test_writes_continue_during_backup(self, temp_db, tmp_path):
+        for index in range(2000):
+            data.add_alias(f"alias{index}", "https://example.com", temp_db)
+        errors = []
+
+        def write():
+            try:
+                data.add_alias("during", "https://during.example", temp_db)
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=write)
+        path_holder = []
+        backup = threading.Thread(
+            target=lambda: path_holder.append(backup_database(temp_db, str(tmp_path), pages=1, pause=0.001))
+        )
+        backup.start()
+        writer.start()
+        writer.join(10)
+        backup.join(30)
+        assert errors == []
+        verify_database(path_holder[0])
+
+    def test_missing_database(self, tmp_path):
+        with pytest.raises(ValidationError, match="not found"):
+            backup_database(str(tmp_path / "missing.db"), str(tmp_path))
+        assert os.listdir(tmp_path) == []
+
+
+class TestRestoreDatabase:
+    """Tests for verifying and restoring backups."""
+
+    def test_restore_replaces_contents(self, temp_db, tmp_path):
+        data.add_alias("kept", "https://kept.example", temp_db)
+        path = backup_database(temp_db, str(tmp_path))
+        data.add_alias("later", "https://later.example", temp_db)
+        before = data.generation(temp_db)
+        restore_database(path, temp_db)
+        assert data.find_alias("kept", temp_db) == "https://kept.example"
+        assert data.find_alias("later", temp_db) is None
+        assert data.generation(temp_db) > before
+
+    def test_rejects_corrupt_backup(self, temp_db, tmp_path):
+        corrupt = tmp_path / "redirects-bad.db"
+        corrupt.write_bytes(b"SQLite format 3\x00" + b"\xff" * 4096)
+        with pytest.raises(ValidationError):
+            restore_database(str(corrupt), temp_db)
+        assert data.find_alias("ex", temp_db) == "https://example.com"
+
+    def test_rejects_foreign_database(self, temp_db, tmp_path):
+        other = str(tmp_path / "other.db")
+        connection = sqlite3.connect(other)
+        connection.execute("CREATE TABLE notes (body TEXT)")
+        connection.close()
+        with pytest.raises(ValidationError, match="missing tables"):
+            restore_database(other, temp_db)
+
+    def test_command_line(self, temp_db, tmp_path, capsys):
+        main(["backup", temp_db, str(tmp_path), "--compress"])
+        path = capsys.readouterr().out.strip()
+        assert os.path.exists(path)
+        main(["restore", path, temp_db])
+        assert "Restored" in capsys.readouterr().out
+        with pytest.raises(SystemExit):
+            main(["restore", str(tmp_path / "missing.db"), temp_db])
+
+
+    def test_restore_in_another_process_reaches_caches(self, temp_db, tmp_path, monkeypatch):
+        import subprocess
+        import sys
+        from tiny_redirect.cache import AliasCache
+        monkeypatch.setattr(data, "CHANGE_CHECK_INTERVAL", 0)
+        data.add_alias("wiki", "https://old.example", temp_db)
+        path = backup_database(temp_db, str(tmp_path))
+        data.update_alias("wiki", "https://new.example", temp_db)
+        cache = AliasCache()
+        assert cache.get("wiki", temp_db) == "https://new.example"
+        src_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+        subprocess.run(
+            [sys.executable, "-m", "tiny_redirect.backup", "restore", path, temp_db],
+            check=True, capture_output=True, env=dict(os.environ, PYTHONPATH=src_dir),
+        )
+        assert cache.is_warm(temp_db) is False
+        assert cache.get("wiki", temp_db) == "https://old.example"
+
+class TestBackupWorker:
+    """Tests for scheduled backups."""
+
+    def test_scheduled_backups(self, temp_db, tmp_path):
+        worker = BackupWorker(temp_db, str(tmp_path), interval=0.05, keep=3)
+        worker.start()
+        try:
+            for _ in range(100):
+                if len(list_backups(str(tmp_path))) >= 2:
+                    break
+                threading.Event().wait(0.05)
+        finally:
+            worker.stop()
+        assert 2 <= len(list_backups(str(tmp_path))) <= 3
+        assert worker.last_backup is not None
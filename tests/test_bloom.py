@@ -0,0 +1,26 @@
+"""Tests for bloom.py - unknown alias filter."""
+
+from tiny_redirect.bloom import BloomFilter
+
+
+class TestBloomFilter:
+    """Tests for BloomFilter membership."""
+
+    def test_no_false_negatives(self):
+        keys = [f"alias{index}" for index in range(5000)]
+        bloom = BloomFilter(len(keys))
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+
+    def test_rejects_most_unknown_keys(self):
+        bloom = BloomFilter(5000)
+        for index in range(5000):
+            bloom.add(f"alias{index}")
+        false_positives = sum(f"missing{index}" in bloom for index in range(10000))
+        assert false_positives < 500
+
+    def test_empty_filter(self):
+        bloom = BloomFilter(0)
+        assert "anything" not in bloom
+        assert bloom.nbytes() == 8
@@ -0,0 +1,163 @@
+"""Tests for cache.py - in-memory alias view."""
+
+import time
+
+from tiny_redirect import data
+from tiny_redirect.cache import AliasCache, NamespaceCaches, namespace_for_host
+
+
+class TestAliasCache:
+    """Tests for AliasCache loading and invalidation."""
+
+    def test_cold_until_loaded(self, temp_db):
+        cache = AliasCache()
+        assert cache.is_warm(temp_db) is False
+        assert cache.age() is None
+
+    def test_get_loads_table(self, temp_db):
+        cache = AliasCache()
+        assert cache.get("ex", temp_db) == "https://example.com"
+        assert cache.is_warm(temp_db) is True
+
+    def test_missing_alias(self, temp_db):
+        cache = AliasCache()
+        assert cache.get("missing", temp_db) is None
+
+    def test_add_invalidates(self, temp_db):
+        cache = AliasCache()
+        cache.warm(temp_db)
+        data.add_alias("new", "https://new.com", temp_db)
+        assert cache.is_warm(temp_db) is False
+        assert cache.get("new", temp_db) == "https://new.com"
+
+    def test_delete_invalidates(self, temp_db):
+        cache = AliasCache()
+        cache.warm(temp_db)
+        data.delete_alias("ex", temp_db)
+        assert cache.get("ex", temp_db) is None
+
+    def test_db_path_change_reloads(self, temp_db, tmp_path):
+        cache = AliasCache()
+        cache.warm(temp_db)
+        other_db = str(tmp_path / "other.db")
+        data.database_init(other_db)
+        data.add_alias("other", "https://other.com", other_db)
+        assert cache.is_warm(other_db) is False
+        assert cache.get("other", other_db) == "https://other.com"
+        assert cache.get("other", temp_db) is None
+
+    def test_write_from_another_connection_invalidates(self, temp_db, monkeypatch):
+        import sqlite3
+        monkeypatch.setattr(data, "CHANGE_CHECK_INTERVAL", 0)
+        cache = AliasCache()
+        assert cache.get("ex", temp_db) == "https://example.com"
+        assert data.get_settings(temp_db).case_insensitive is False
+        connection = sqlite3.connect(temp_db)
+        # Same length, so only the file change counter tells the writes apart
+        connection.execute("UPDATE redirects SET redirect = 'https://example.org' WHERE alias = 'ex'")
+        connection.execute("""UPDATE settings SET "case-insensitive" = 'True'""")
+        connection.commit()
+        connection.close()
+        assert cache.get("EX", temp_db) == "https://example.org"
+        assert data.get_settings(temp_db).case_insensitive is True
+
+    def test_outside_write_before_own_write_is_noticed(self, temp_db):
+        import sqlite3
+        cache = AliasCache()
+        assert cache.get("ex", temp_db) == "https://example.com"
+        connection = sqlite3.connect(temp_db)
+        connection.execute("UPDATE redirects SET redirect = 'https://example.org' WHERE alias = 'ex'")
+        connection.commit()
+        connection.close()
+        # Our own settings write lands before the next file check
+        data.update_settings({"shortname": "go"}, temp_db)
+        assert cache.get("ex", temp_db) == "https://example.org"
+
+    def test_lookups_do_not_read_the_file_between_checks(self, temp_db, monkeypatch):
+        cache = AliasCache()
+        cache.get("ex", temp_db)
+        reads = []
+        monkeypatch.setattr(data, "_file_signature", lambda db_path: reads.append(db_path))
+        for _ in range(100):
+            cache.get("ex", temp_db)
+        assert reads == []
+
+    def test_compact_filter_rejects_unknown_aliases(self, temp_db):
+        cache = AliasCache(compact=True)
+        data.add_alias("docs", "https://docs.example", temp_db)
+        assert cache.get("docs", temp_db) == "https://docs.example"
+        assert cache.get("nope", temp_db) is None
+        data.add_alias("nope", "https://nope.example", temp_db)
+        assert cache.get("nope", temp_db) == "https://nope.example"
+
+    def test_dict_filter_rejects_unknown_aliases(self, temp_db):
+        cache = AliasCache()
+        cache.warm(temp_db)
+        assert cache._filter is not None
+        probes = []
+
+        class CountingDict(dict):
+            def get(self, key, default=None):
+                probes.append(key)
+                return super().get(key, default)
+
+        cache._exact = CountingDict(cache._exact)
+        assert all(cache.get(f"missing-{i}", temp_db) is None for i in range(200))
+        # Only the filter's false positives reach the dict
+        assert len(probes) < 50
+        assert cache.get("ex", temp_db) == "https://example.com"
+
+    def test_expired_alias_is_missing_without_reload(self, temp_db):
+        cache = AliasCache()
+        data.add_alias("tmp", "https://tmp.example", temp_db, expires_at=time.time() + 0.05)
+        assert cache.get("tmp", temp_db) == "https://tmp.example"
+        time.sleep(0.06)
+        assert cache.get("tmp", temp_db) is None
+        assert cache.is_warm(temp_db)
+
+    def test_expired_prefix_alias(self, temp_db):
+        cache = AliasCache()
+        data.add_alias("jira", "https://jira.example/{rest}", temp_db, expires_at=1)
+        assert cache.match_prefix("jira/ABC-1", temp_db) is None
+        assert cache.match_prefix("jira/", temp_db) is None
+
+    def test_expired_alias_case_insensitive(self, temp_db):
+        data.update_setting("case-insensitive", "True", temp_db)
+        data.add_alias("Tmp", "https://tmp.example", temp_db, expires_at=1)
+        assert AliasCache(compact=True).get("TMP", temp_db) is None
+
+    def test_sweep_purges_view(self, temp_db):
+        cache = AliasCache()
+        data.add_alias("tmp", "https://tmp.example", temp_db, expires_at=1)
+        cache.warm(temp_db)
+        data.sweep_expired(temp_db)
+        assert "tmp" not in cache.redirects(temp_db)
+
+
+class TestNamespaceCaches:
+    """Tests for picking a namespace's cache from the Host header."""
+
+    def test_namespace_for_host(self):
+        assert namespace_for_host("Wiki.example.com:8080") == "wiki"
+        assert namespace_for_host("r") == "r"
+        assert namespace_for_host("192.168.1.20:80") == ""
+        assert namespace_for_host("[::1]:8080") == ""
+        assert namespace_for_host(None) == ""
+
+    def test_for_host(self, temp_db):
+        caches = NamespaceCaches(AliasCache())
+        assert caches.for_host("wiki.example.com", temp_db) is caches.default
+        data.add_alias("ex", "https://wiki.example", temp_db, namespace="wiki")
+        cache = caches.for_host("wiki.example.com", temp_db)
+        assert cache is not caches.default
+        assert cache.get("ex", temp_db) == "https://wiki.example"
+        assert caches.for_host("other.example.com", temp_db).get("ex", temp_db) == "https://example.com"
+        assert caches.cache("missing", temp_db) is None
+
+    def test_emptied_namespace_falls_back(self, temp_db):
+        caches = NamespaceCaches(AliasCache())
+        data.add_alias("docs", "https://docs.example", temp_db, namespace="wiki")
+        assert caches.for_host("wiki", temp_db).get("docs", temp_db) == "https://docs.example"
+        data.delete_alias("docs", temp_db, namespace="wiki")
+        assert caches.for_host("wiki", temp_db) is caches.default
+        assert caches.namespaces(temp_db) == frozenset()
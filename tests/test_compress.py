@@ -0,0 +1,167 @@
+"""Tests for compress.py - response compression plugin."""
+
+import gzip
+
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+import zstandard
+from bottle import Bottle, redirect, response
+
+from tiny_redirect.compress import CompressionPlugin, negotiate
+
+PAGE = "<p>alias</p>" * 200
+
+
+class Reply:
+    """Raw WSGI answer; WebTest would undo the gzip encoding under test."""
+
+    def __init__(self, app, path, accept_encoding=None):
+        environ = {"PATH_INFO": path}
+        if accept_encoding is not None:
+            environ["HTTP_ACCEPT_ENCODING"] = accept_encoding
+        setup_testing_defaults(environ)
+        self.chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            self.status_int = int(status[:3])
+            self.headers = dict(headers)
+
+        result = app(environ, start_response)
+        try:
+            self.chunks = [chunk for chunk in result if chunk]
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        self.body = b"".join(self.chunks)
+
+
+class TestNegotiate:
+    """Tests for Accept-Encoding negotiation."""
+
+    def test_prefers_zstd_on_a_tie(self):
+        assert negotiate("gzip, deflate, br, zstd") == "zstd"
+
+    def test_honours_quality_values(self):
+        assert negotiate("zstd;q=0.5, gzip") == "gzip"
+        assert negotiate("gzip;q=0, zstd;q=0") is None
+
+    def test_wildcard_and_identity(self):
+        assert negotiate("*") == "zstd"
+        assert negotiate("identity") is None
+        assert negotiate("") is None
+
+
+class TestCompressionPlugin:
+    """Tests for the Bottle plugin."""
+
+    @pytest.fixture
+    def client(self):
+        app = Bottle()
+        app.install(CompressionPlugin(min_size=256))
+
+        @app.route("/page")
+        def page():
+            return PAGE
+
+        @app.route("/tiny")
+        def tiny():
+            return "short"
+
+        @app.route("/go")
+        def go():
+            redirect("/page", 303)
+
+        @app.route("/json")
+        def json_list():
+            return {"redirects": [{"alias": f"a{i}", "redirect": "https://example.com"} for i in range(50)]}
+
+        @app.route("/png")
+        def png():
+            response.content_type = "image/png"
+            return b"\x89PNG" * 500
+
+        @app.route("/stream")
+        def stream():
+            for i in range(100):
+                yield f"<li>row {i}</li>"
+
+        @app.route("/short-stream")
+        def short_stream():
+            yield "a"
+            yield "b"
+
+        @app.route("/raw", skip=["compress"])
+        def raw():
+            return PAGE
+
+        return lambda path, accept_encoding=None: Reply(app, path, accept_encoding)
+
+    def test_gzip(self, client):
+        reply = client("/page", "gzip")
+        assert reply.headers["Content-Encoding"] == "gzip"
+        assert reply.headers["Vary"] == "Accept-Encoding"
+        assert int(reply.headers["Content-Length"]) == len(reply.body) < len(PAGE)
+        assert gzip.decompress(reply.body).decode() == PAGE
+
+    def test_zstd(self, client):
+        reply = client("/page", "gzip, zstd")
+        assert reply.headers["Content-Encoding"] == "zstd"
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(reply.body).decode() == PAGE
+
+    def test_uncompressed_without_accept_encoding(self, client):
+        reply = client("/page")
+        assert "Content-Encoding" not in reply.headers
+        assert reply.headers["Vary"] == "Accept-Encoding"
+        assert reply.body.decode() == PAGE
+
+    def test_skips_small_redirect_and_binary_bodies(self, client):
+        assert "Content-Encoding" not in client("/tiny", "gzip").headers
+        reply = client("/go", "gzip")
+        assert reply.status_int == 303
+        assert "Content-Encoding" not in reply.headers
+        assert "Content-Encoding" not in client("/png", "gzip").headers
+        assert "Content-Encoding" not in client("/raw", "gzip").headers
+
+    def test_json_results(self, client):
+        reply = client("/json", "gzip")
+        assert reply.headers["Content-Type"] == "application/json"
+        assert reply.headers["Content-Encoding"] == "gzip"
+        assert b'"alias": "a49"' in gzip.decompress(reply.body)
+
+    def test_streamed_results(self, client):
+        reply = client("/stream", "gzip")
+        assert reply.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in reply.headers
+        assert gzip.decompress(reply.body).decode() == "".join(f"<li>row {i}</li>" for i in range(100))
+
+        reply = client("/short-stream", "gzip")
+        assert "Content-Encoding" not in reply.headers
+        assert reply.body == b"ab"
+
+    def test_stream_chunks_decode_as_they_arrive(self):
+        app = Bottle()
+        app.install(CompressionPlugin(min_size=4))
+
+        @app.route("/")
+        def chunks():
+            yield "first"
+            yield "second"
+
+        reply = Reply(app, "/", "zstd")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        # Each chunk is flushed, so it decodes without waiting for the end
+        assert [decompressor.decompress(chunk) for chunk in reply.chunks[:2]] == [b"first", b"second"]
+
+    def test_weakens_etag(self):
+        app = Bottle()
+        app.install(CompressionPlugin(min_size=1))
+
+        @app.route("/")
+        def tagged():
+            response.set_header("ETag", '"v1"')
+            return PAGE
+
+        reply = Reply(app, "/", "gzip")
+        # Bottle normalizes the header name to Etag
+        assert reply.headers["Etag"] == 'W/"v1"'
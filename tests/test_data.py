@@ -6,14 +6,37 @@ from tiny_redirect.data import (
     str_to_bool,
     validate_alias,
     validate_redirect,
+    canonicalize_redirect,
     validate_port,
     validate_hostname,
     validate_shortname,
     add_alias,
     delete_alias,
     update_setting,
+    update_settings,
+    get_settings,
+    Settings,
     load_data,
     database_init,
+    migrate_database,
+    find_alias,
+    find_alias_key_collisions,
+    import_redirects,
+    apply_batch,
+    update_alias,
+    rename_alias,
+    parse_time,
+    set_alias_expiry,
+    load_expiries,
+    next_expiry,
+    sweep_expired,
+    export_redirects,
+    sync_version,
+    changes_since,
+    validate_namespace,
+    list_namespaces,
+    load_redirects,
+    diff_import,
 )
 
 
@@ -79,6 +102,13 @@ class TestValidateAlias:
             with pytest.raises(ValidationError, match="reserved route"):
                 validate_alias(route)
 
+    def test_segments_for_prefix_aliases(self):
+        assert validate_alias("team/wiki", allow_segments=True) is True
+        with pytest.raises(ValidationError, match="segments can only contain"):
+            validate_alias("team//wiki", allow_segments=True)
+        with pytest.raises(ValidationError, match="reserved route"):
+            validate_alias("settings/x", allow_segments=True)
+
     def test_reserved_routes_case_insensitive(self):
         with pytest.raises(ValidationError, match="reserved route"):
             validate_alias("ADD")
@@ -103,6 +133,67 @@ class TestValidateRedirect:
             validate_redirect("https://example.com/" + "a" * 2000)
 
 
+class TestCanonicalizeRedirect:
+    """Tests for the stored form of redirect targets."""
+
+    def test_adds_scheme(self):
+        assert canonicalize_redirect("example.com") == "http://example.com"
+        assert canonicalize_redirect("  192.168.1.1:8080/admin ") == "http://192.168.1.1:8080/admin"
+
+    def test_keeps_canonical_targets(self):
+        target = "https://example.com/a%20b?q=1&r=two#top"
+        assert canonicalize_redirect(target) == target
+        assert canonicalize_redirect(canonicalize_redirect("example.com/ä b")) == "http://example.com/%C3%A4%20b"
+
+    def test_percent_encodes_path_and_query(self):
+        assert canonicalize_redirect("https://example.com/ä b?q=ü") == "https://example.com/%C3%A4%20b?q=%C3%BC"
+
+    def test_encodes_international_host(self):
+        assert canonicalize_redirect("https://bücher.example/") == "https://xn--bcher-kva.example/"
+
+    def test_keeps_rest_placeholder(self):
+        target = "https://jira.example/browse/{rest}?from=tr"
+        assert canonicalize_redirect(target) == target
+
+    def test_rejects_invalid_host_and_port(self):
+        with pytest.raises(ValidationError, match="valid host"):
+            canonicalize_redirect("https:///path-only")
+        with pytest.raises(ValidationError, match="valid host"):
+            canonicalize_redirect("exa mple.com")
+        with pytest.raises(ValidationError, match="invalid host or port"):
+            canonicalize_redirect("javascript:alert(1)")
+
+    def test_rejects_unsafe_schemes(self, temp_db):
+        for target in ("javascript://%0aalert(1)", "data://text/html,x",
+                       "JavaScript://example.com/", "file:///etc/passwd"):
+            with pytest.raises(ValidationError, match="must start with http:// or https://"):
+                canonicalize_redirect(target)
+        with pytest.raises(ValidationError, match="must start with"):
+            add_alias("evil", "javascript://example.com/%0aalert(1)", temp_db)
+
+    def test_scheme_allow_list(self, monkeypatch):
+        from tiny_redirect import data as data_module
+        monkeypatch.setattr(data_module, "REDIRECT_SCHEMES", ("http", "https", "ftp"))
+        assert canonicalize_redirect("ftp://files.example/pub") == "ftp://files.example/pub"
+
+    def test_add_alias_stores_canonical_target(self, temp_db):
+        add_alias("books", "bücher.example/neu heiten", temp_db)
+        assert find_alias("books", temp_db) == "http://xn--bcher-kva.example/neu%20heiten"
+
+    def test_migration_canonicalizes_legacy_rows(self, temp_db):
+        import sqlite3
+        connection = sqlite3.connect(temp_db)
+        connection.execute(
+            "INSERT INTO redirects (alias, redirect, alias_key) VALUES ('old', 'example.com/a b', 'old')"
+        )
+        # A database from before the data migrations were recorded
+        connection.execute("PRAGMA user_version = 0")
+        connection.commit()
+        connection.close()
+        migrate_database(temp_db)
+        assert find_alias("old", temp_db) == "http://example.com/a%20b"
+
+
 class TestValidatePort:
     """Tests for port validation."""
 
@@ -175,7 +266,7 @@ class TestDatabaseOperations:
         """Test that database initializes correctly."""
         data = load_data(temp_db)
         assert data["settings"] is not None
-        assert data["settings"]["hostname"] == "0.0.0.0"
+        assert data["settings"]["hostname"] == "127.0.0.1"
         assert data["settings"]["port"] == 80
         # Check example redirect exists
         assert "ex" in data["redirects"]
@@ -193,6 +284,13 @@ class TestDatabaseOperations:
         with pytest.raises(ValidationError, match="already exists"):
             add_alias("dup", "https://second.com", temp_db)
 
+    def test_add_prefix_alias_with_segments(self, temp_db):
+        """Test that only path-forwarding aliases may contain '/'."""
+        add_alias("team/wiki", "https://wiki.example/{rest}", temp_db)
+        assert "team/wiki" in load_data(temp_db)["redirects"]
+        with pytest.raises(ValidationError, match="can only contain"):
+            add_alias("team/docs", "https://docs.example/", temp_db)
+
     def test_delete_alias(self, temp_db):
         """Test deleting an alias."""
         add_alias("todelete", "https://delete.com", temp_db)
@@ -236,6 +334,56 @@ class TestDatabaseOperations:
             update_setting("port", "99999", temp_db)
 
 
+class TestSettings:
+    """Tests for the typed settings object and batched settings updates."""
+
+    def test_get_settings_types(self, temp_db):
+        """Test that settings are returned with native types."""
+        settings = get_settings(temp_db)
+        assert isinstance(settings, Settings)
+        assert settings.port == 80
+        assert settings.shortname == "r"
+        assert settings.bottle_debug is False
+        assert settings.case_insensitive is False
+
+    def test_get_settings_is_cached(self, temp_db):
+        """Test that repeated reads return the same object."""
+        assert get_settings(temp_db) is get_settings(temp_db)
+
+    def test_update_settings_refreshes_cache(self, temp_db):
+        """Test that writes are visible through get_settings."""
+        get_settings(temp_db)
+        update_settings({"port": "8080", "bottle-debug": "True"}, temp_db)
+        settings = get_settings(temp_db)
+        assert settings.port == 8080
+        assert settings.bottle_debug is True
+
+    def test_update_settings_is_all_or_nothing(self, temp_db):
+        """Test that one invalid value leaves every setting unchanged."""
+        with pytest.raises(ValidationError, match="between 1 and 65535"):
+            update_settings({"shortname": "go", "port": "99999"}, temp_db)
+        db_data = load_data(temp_db)
+        assert db_data["settings"]["shortname"] == "r"
+        assert db_data["settings"]["port"] == 80
+
+    def test_update_settings_rejects_unknown_setting(self, temp_db):
+        """Test that unknown settings are rejected before writing."""
+        with pytest.raises(ValidationError, match="Invalid setting"):
+            update_settings({"hostname": "0.0.0.0", "bogus": "1"}, temp_db)
+        assert load_data(temp_db)["settings"]["hostname"] == "127.0.0.1"
+
+    def test_rate_limits_and_log_level_settings(self, temp_db):
+        """Test that rate limits and log level are validated and normalized."""
+        update_settings({"rate-limits": " redirect=100:200 ", "log-level": "debug"}, temp_db)
+        settings = get_settings(temp_db)
+        assert settings.rate_limits == "redirect=100:200"
+        assert settings.log_level == "DEBUG"
+        with pytest.raises(ValidationError, match="class=rate:burst"):
+            update_settings({"rate-limits": "redirect"}, temp_db)
+        with pytest.raises(ValidationError, match="Log level"):
+            update_settings({"log-level": "LOUD"}, temp_db)
+
+
 class TestSQLInjectionPrevention:
     """Tests to verify SQL injection prevention."""
 
@@ -251,3 +399,458 @@ class TestSQLInjectionPrevention:
         add_alias("quoted", "https://example.com/?q='test'", temp_db)
         data = load_data(temp_db)
         assert "quoted" in data["redirects"]
+
+
+class TestCaseInsensitiveAliases:
+    """Tests for the normalized alias_key column and case-insensitive mode."""
+
+    def test_alias_key_stored(self, temp_db):
+        add_alias("Wiki", "https://wiki.example", temp_db)
+        assert find_alias("WIKI", temp_db, case_insensitive=True) == "https://wiki.example"
+        assert find_alias("WIKI", temp_db) is None
+        assert find_alias("Wiki", temp_db) == "https://wiki.example"
+
+    def test_alias_key_index_exists(self, temp_db):
+        import sqlite3
+        connection = sqlite3.connect(temp_db)
+        plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT redirect FROM redirects WHERE namespace = ? AND alias_key = ?", ("", "x")
+        ).fetchall()
+        connection.close()
+        assert "idx_redirects_alias_key" in str(plan)
+
+    def test_migration_backfills_keys(self, temp_db):
+        import sqlite3
+        connection = sqlite3.connect(temp_db)
+        connection.execute("INSERT INTO redirects (alias, redirect) VALUES ('Old', 'https://old.example')")
+        connection.execute("PRAGMA user_version = 0")
+        connection.commit()
+        connection.close()
+        migrate_database(temp_db)
+        assert find_alias("old", temp_db, case_insensitive=True) == "https://old.example"
+
+    def test_collision_rejected_in_case_insensitive_mode(self, temp_db):
+        update_setting("case-insensitive", "True", temp_db)
+        add_alias("wiki", "https://wiki.example", temp_db)
+        with pytest.raises(ValidationError, match="collides with existing alias 'wiki'"):
+            add_alias("Wiki", "https://other.example", temp_db)
+
+    def test_collision_allowed_when_mode_off(self, temp_db):
+        add_alias("wiki", "https://wiki.example", temp_db)
+        add_alias("Wiki", "https://other.example", temp_db)
+        assert find_alias_key_collisions(temp_db) == {"wiki": ["wiki", "Wiki"]}
+
+    def test_import_reports_collisions(self, temp_db):
+        import json
+        add_alias("wiki", "https://wiki.example", temp_db)
+        payload = json.dumps({
+            "file_type": "tredirects",
+            "version": "1.0",
+            "redirects": [
+                {"alias": "WIKI", "redirect": "https://a.example"},
+                {"alias": "Docs", "redirect": "https://b.example"},
+                {"alias": "docs", "redirect": "https://c.example"},
+            ],
+        })
+        stats = import_redirects(payload, temp_db)
+        assert stats["imported"] == 3
+        assert stats["collisions"] == [
+            "'WIKI' collides with 'wiki'",
+            "'docs' collides with 'Docs'",
+        ]
+
+    def test_import_skips_collisions_in_case_insensitive_mode(self, temp_db):
+        import json
+        update_setting("case-insensitive", "True", temp_db)
+        add_alias("wiki", "https://wiki.example", temp_db)
+        payload = json.dumps({
+            "file_type": "tredirects",
+            "version": "1.0",
+            "redirects": [{"alias": "WIKI", "redirect": "https://a.example"}],
+        })
+        stats = import_redirects(payload, temp_db)
+        assert stats["imported"] == 0
+        assert stats["skipped"] == 1
+        assert stats["errors"] == []
+        assert stats["collisions"] == ["'WIKI' collides with 'wiki'"]
+
+
+class TestApplyBatch:
+    """Tests for batched create/update/delete operations."""
+
+    def test_mixed_operations(self, temp_db):
+        result = apply_batch([
+            {"op": "create", "alias": "a", "redirect": "https://a.example"},
+            {"op": "update", "alias": "ex", "redirect": "https://ex.example"},
+            {"op": "delete", "alias": "a"},
+        ], temp_db)
+        assert result["committed"] is True
+        assert [r["status"] for r in result["results"]] == ["created", "updated", "deleted"]
+        redirects = load_data(temp_db)["redirects"]
+        assert redirects == {"ex": "https://ex.example"}
+
+    def test_partial_failure_keeps_good_items(self, temp_db):
+        result = apply_batch([
+            {"op": "create", "alias": "good", "redirect": "https://good.example"},
+            {"op": "create", "alias": "ex", "redirect": "https://dup.example"},
+            {"op": "delete", "alias": "missing"},
+            {"op": "rename", "alias": "x"},
+        ], temp_db)
+        assert result["committed"] is True
+        assert result["succeeded"] == 1
+        assert result["failed"] == 3
+        assert "already exists" in result["results"][1]["error"]
+        assert "not found" in result["results"][2]["error"]
+        assert "Unknown operation" in result["results"][3]["error"]
+        assert "good" in load_data(temp_db)["redirects"]
+
+    def test_atomic_rolls_back_everything(self, temp_db):
+        result = apply_batch([
+            {"op": "create", "alias": "good", "redirect": "https://good.example"},
+            {"op": "create", "alias": "bad alias", "redirect": "https://bad.example"},
+        ], temp_db, atomic=True)
+        assert result["committed"] is False
+        assert result["succeeded"] == 0
+        assert result["results"][0]["status"] == "rolled_back"
+        assert result["results"][1]["status"] == "error"
+        assert "good" not in load_data(temp_db)["redirects"]
+
+    def test_invalid_operations_argument(self, temp_db):
+        with pytest.raises(ValidationError, match="must be a list"):
+            apply_batch({"op": "create"}, temp_db)
+
+    def test_non_string_fields(self, temp_db):
+        result = apply_batch([
+            {"op": "create", "alias": 5, "redirect": "https://a.example"},
+            {"op": "create", "alias": "a", "redirect": 5},
+            "not an object",
+        ], temp_db)
+        assert result["failed"] == 3
+
+
+class TestExpiry:
+    """Tests for aliases with an expires_at."""
+
+    def test_parse_time(self):
+        assert parse_time(12.5) == 12.5
+        assert parse_time("1970-01-01T00:01:00") == 60
+        assert parse_time("1970-01-01T01:00:00+01:00") == 0
+        with pytest.raises(ValidationError):
+            parse_time("yesterday")
+        with pytest.raises(ValidationError):
+            parse_time(True)
+
+    def test_add_with_expiry(self, temp_db):
+        add_alias("tmp", "https://tmp.example", temp_db, expires_at="2100-01-01T00:00:00Z")
+        assert load_expiries(temp_db) == {"tmp": parse_time("2100-01-01T00:00:00Z")}
+        assert find_alias("tmp", temp_db) == "https://tmp.example"
+
+    def test_expired_alias_is_missing_before_sweep(self, temp_db):
+        add_alias("tmp", "https://tmp.example", temp_db, expires_at=1)
+        assert find_alias("tmp", temp_db) is None
+        assert "tmp" in load_data(temp_db)["redirects"]
+
+    def test_set_and_clear_expiry(self, temp_db):
+        set_alias_expiry("ex", 4102444800, temp_db)
+        assert next_expiry(temp_db) == 4102444800
+        set_alias_expiry("ex", None, temp_db)
+        assert next_expiry(temp_db) is None
+        with pytest.raises(ValidationError, match="not found"):
+            set_alias_expiry("missing", 1, temp_db)
+
+    def test_sweep_in_batches(self, temp_db):
+        for index in range(7):
+            add_alias(f"tmp{index}", "https://tmp.example", temp_db, expires_at=100 + index)
+        add_alias("later", "https://later.example", temp_db, expires_at=4102444800)
+        assert sweep_expired(temp_db, now=200, batch_size=3) == 7
+        assert set(load_data(temp_db)["redirects"]) == {"ex", "later"}
+        assert sweep_expired(temp_db, now=200) == 0
+
+    def test_sweep_uses_index(self, temp_db):
+        import sqlite3
+        connection = sqlite3.connect(temp_db)
+        try:
+            plan = " ".join(row[3] for row in connection.execute(
+                "EXPLAIN QUERY PLAN SELECT rowid FROM redirects WHERE expires_at <= 1"
+            ))
+        finally:
+            connection.close()
+        assert "idx_redirects_expires_at" in plan
+
+    def test_batch_and_export_carry_expiry(self, temp_db):
+        apply_batch([
+            {"op": "create", "alias": "a", "redirect": "https://a.example", "expires_at": 4102444800},
+            {"op": "update", "alias": "ex", "redirect": "https://ex.example", "expires_at": 4102444801},
+        ], temp_db)
+        assert load_expiries(temp_db) == {"a": 4102444800, "ex": 4102444801}
+        exported = export_redirects(temp_db)
+        delete_alias("a", temp_db)
+        import_redirects(exported, temp_db)
+        assert load_expiries(temp_db)["a"] == 4102444800
+
+
+class TestChangesSince:
+    """Tests for delta sync versions and tombstones."""
+
+    def test_every_write_moves_the_version(self, temp_db):
+        start = sync_version(temp_db)
+        add_alias("a", "https://a.example", temp_db)
+        update_alias("a", "https://a2.example", temp_db)
+        set_alias_expiry("a", 4102444800, temp_db)
+        rename_alias("a", "b", db_path=temp_db)
+        delete_alias("b", temp_db)
+        assert sync_version(temp_db) == start + 6
+
+    def test_reports_changed_and_deleted(self, temp_db):
+        add_alias("gone", "https://gone.example", temp_db)
+        since = sync_version(temp_db)
+        add_alias("new", "https://new.example", temp_db)
+        update_alias("ex", "https://ex.example", temp_db)
+        delete_alias("gone", temp_db)
+        rename_alias("new", "renamed", db_path=temp_db)
+        changes = changes_since(since, temp_db)
+        assert changes["version"] == sync_version(temp_db)
+        assert changes["reset"] is False
+        assert [item["alias"] for item in changes["changed"]] == ["ex", "renamed"]
+        assert changes["changed"][1] == {"alias": "renamed", "redirect": "https://new.example", "expires_at": None}
+        assert changes["deleted"] == ["gone", "new"]
+        assert changes_since(changes["version"], temp_db)["changed"] == []
+
+    def test_readding_clears_tombstone(self, temp_db):
+        since = sync_version(temp_db)
+        delete_alias("ex", temp_db)
+        add_alias("ex", "https://back.example", temp_db)
+        changes = changes_since(since, temp_db)
+        assert changes["deleted"] == []
+        assert [item["alias"] for item in changes["changed"]] == ["ex"]
+
+    def test_bulk_deletes_leave_tombstones(self, temp_db):
+        add_alias("tmp", "https://tmp.example", temp_db, expires_at=100)
+        since = sync_version(temp_db)
+        sweep_expired(temp_db, now=200)
+        assert changes_since(since, temp_db)["deleted"] == ["tmp"]
+        since = sync_version(temp_db)
+        import_redirects(export_redirects(temp_db), temp_db, replace=True)
+        changes = changes_since(since, temp_db)
+        assert changes["deleted"] == []
+        assert [item["alias"] for item in changes["changed"]] == ["ex"]
+
+    def test_reset_from_zero_or_future_version(self, temp_db):
+        add_alias("a", "https://a.example", temp_db)
+        delete_alias("a", temp_db)
+        for since in (0, sync_version(temp_db) + 10):
+            changes = changes_since(since, temp_db)
+            assert changes["reset"] is True
+            assert [item["alias"] for item in changes["changed"]] == ["ex"]
+            assert changes["deleted"] == []
+
+    def test_migration_versions_existing_rows(self, temp_db):
+        import sqlite3
+        connection = sqlite3.connect(temp_db)
+        connection.execute("UPDATE redirects SET version = NULL")
+        connection.execute("PRAGMA user_version = 0")
+        connection.commit()
+        connection.close()
+        before = sync_version(temp_db)
+        migrate_database(temp_db)
+        assert [item["alias"] for item in changes_since(before, temp_db)["changed"]] == ["ex"]
+
+    def test_migrations_run_once(self, temp_db, monkeypatch):
+        """Test that a migrated database skips the full-table data migrations."""
+        import sqlite3
+        from tiny_redirect import data as data_module
+        connection = sqlite3.connect(temp_db)
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == data_module.DATA_MIGRATIONS[-1][0]
+        connection.close()
+
+        def fail(cursor):
+            raise AssertionError("data migration ran again")
+
+        monkeypatch.setattr(data_module, "DATA_MIGRATIONS",
+                            [(version, fail) for version, _ in data_module.DATA_MIGRATIONS])
+        migrate_database(temp_db)
+
+
+def tredirects(*items):
+    import json
+    return json.dumps({"file_type": "tredirects", "version": "1.0", "redirects": list(items)})
+
+
+class TestDiffImport:
+    """Tests for the dry-run import diff."""
+
+    def test_categories(self, temp_db):
+        add_alias("keep", "https://keep.example", temp_db)
+        add_alias("moved", "https://old.example", temp_db)
+        payload = tredirects(
+            {"alias": "new", "redirect": "new.example"},
+            {"alias": "keep", "redirect": "https://keep.example"},
+            {"alias": "moved", "redirect": "https://new.example"},
+            {"alias": "add", "redirect": "https://reserved.example"},
+            {"alias": "new", "redirect": "https://other.example"},
+            {"redirect": "https://no-alias.example"},
+        )
+        diff = diff_import(payload, temp_db)
+        assert diff["counts"] == {"added": 1, "conflicting": 2, "identical": 1, "invalid": 2, "removed": 0}
+        assert diff["added"] == [{"alias": "new", "redirect": "http://new.example"}]
+        assert diff["conflicting"][0] == {
+            "alias": "moved", "current": "https://old.example", "redirect": "https://new.example"
+        }
+        # The second "new" conflicts with the first one in the file
+        assert diff["conflicting"][1]["current"] == "http://new.example"
+        assert "reserved" in diff["invalid"][0]["error"]
+        assert diff["next"] is None
+        # Nothing was written
+        assert find_alias("new", temp_db) is None
+        assert find_alias("moved", temp_db) == "https://old.example"
+
+    def test_replace_lists_removed_aliases(self, temp_db):
+        add_alias("moved", "https://old.example", temp_db)
+        diff = diff_import(tredirects({"alias": "moved", "redirect": "https://new.example"}), temp_db, replace=True)
+        assert diff["counts"]["conflicting"] == 1
+        assert diff["removed"] == [{"alias": "ex", "redirect": "https://example.com"}]
+
+    def test_case_insensitive_collisions_are_invalid(self, temp_db):
+        update_setting("case-insensitive", "True", temp_db)
+        diff = diff_import(tredirects({"alias": "EX", "redirect": "https://x.example"}), temp_db)
+        assert diff["counts"]["invalid"] == 1
+        assert "collides with existing alias 'ex'" in diff["invalid"][0]["error"]
+
+    def test_pagination(self, temp_db):
+        payload = tredirects(*({"alias": f"a{i}", "redirect": "https://a.example"} for i in range(25)))
+        first = diff_import(payload, temp_db, limit=10)
+        assert [item["alias"] for item in first["added"]] == [f"a{i}" for i in range(10)]
+        assert first["next"] == 10
+        last = diff_import(payload, temp_db, offset=20, limit=10)
+        assert len(last["added"]) == 5
+        assert last["next"] is None
+
+    def test_rejects_other_files(self, temp_db):
+        with pytest.raises(ValidationError, match="not a tredirects.json"):
+            diff_import("[]", temp_db)
+
+    def test_large_file_is_fast(self, temp_db):
+        import time
+        payload = tredirects(*({"alias": f"a{i}", "redirect": f"https://example.com/{i}"} for i in range(100000)))
+        started = time.perf_counter()
+        diff = diff_import(payload, temp_db)
+        assert diff["counts"]["added"] == 100000
+        assert time.perf_counter() - started < 2.0
+
+
+class TestNamespaces:
+    """Tests for aliases scoped by namespace."""
+
+    def test_validate_namespace(self):
+        assert validate_namespace("") == ""
+        assert validate_namespace("wiki-2") == "wiki-2"
+        for bad in ("Wiki", "-wiki", "wiki-", "a.b", "x" * 64, None):
+            with pytest.raises(ValidationError):
+                validate_namespace(bad)
+
+    def test_same_alias_in_two_namespaces(self, temp_db):
+        add_alias("docs", "https://docs.example", temp_db, namespace="wiki")
+        assert find_alias("docs", temp_db) is None
+        assert find_alias("docs", temp_db, namespace="wiki") == "https://docs.example"
+        add_alias("docs", "https://default.example", temp_db)
+        update_alias("docs", "https://new.example", temp_db, namespace="wiki")
+        assert find_alias("docs", temp_db) == "https://default.example"
+        assert load_redirects({"redirects": {}}, temp_db, "wiki")["redirects"] == {"docs": "https://new.example"}
+        with pytest.raises(ValidationError, match="already exists"):
+            add_alias("docs", "https://x.example", temp_db, namespace="wiki")
+        assert list_namespaces(temp_db) == ["wiki"]
+        delete_alias("docs", temp_db, namespace="wiki")
+        assert find_alias("docs", temp_db) == "https://default.example"
+        assert list_namespaces(temp_db) == []
+
+    def test_batch_operations_name_their_namespace(self, temp_db):
+        result = apply_batch([
+            {"op": "create", "alias": "a", "redirect": "https://a.example"},
+            {"op": "create", "alias": "a", "redirect": "https://b.example", "namespace": "team"},
+        ], temp_db, namespace="wiki")
+        assert result["committed"]
+        assert result["results"][1]["namespace"] == "team"
+        assert find_alias("a", temp_db, namespace="wiki") == "https://a.example"
+        assert find_alias("a", temp_db, namespace="team") == "https://b.example"
+        assert find_alias("a", temp_db) is None
+
+    def test_changes_and_replace_import_are_scoped(self, temp_db):
+        since = sync_version(temp_db)
+        add_alias("docs", "https://docs.example", temp_db, namespace="wiki")
+        assert changes_since(since, temp_db)["changed"] == []
+        assert [item["alias"] for item in changes_since(since, temp_db, "wiki")["changed"]] == ["docs"]
+        import_redirects(export_redirects(temp_db), temp_db, replace=True)
+        assert find_alias("docs", temp_db, namespace="wiki") == "https://docs.example"
+        assert changes_since(since, temp_db, "wiki")["deleted"] == []
+
+    def test_migration_rebuilds_old_table(self, temp_db):
+        import sqlite3
+        connection = sqlite3.connect(temp_db)
+        connection.executescript(
+            """
+            DROP TABLE redirects;
+            DROP TABLE redirect_tombstones;
+            CREATE TABLE redirects (alias TEXT UNIQUE, redirect TEXT, alias_key TEXT, expires_at REAL,
+                                    version INTEGER);
+            CREATE TABLE redirect_tombstones (alias TEXT PRIMARY KEY, version INTEGER NOT NULL);
+            INSERT INTO redirects (alias, redirect) VALUES ('zz', 'https://z.example'), ('aa', 'https://a.example');
+            INSERT INTO redirect_tombstones VALUES ('gone', 1);
+            """
+        )
+        connection.commit()
+        connection.close()
+        migrate_database(temp_db)
+        migrate_database(temp_db)
+        assert list(load_redirects({"redirects": {}}, temp_db)["redirects"]) == ["zz", "aa"]
+        add_alias("zz", "https://other.example", temp_db, namespace="wiki")
+        assert find_alias("zz", temp_db) == "https://z.example"
+        assert changes_since(1, temp_db)["deleted"] == []
+
+
+class TestEditOperations:
+    """Tests for single-statement update and rename."""
+
+    def test_update_alias(self, temp_db):
+        update_alias("ex", "https://new.example", temp_db)
+        assert load_data(temp_db)["redirects"]["ex"] == "https://new.example"
+
+    def test_update_missing_alias(self, temp_db):
+        with pytest.raises(ValidationError, match="not found"):
+            update_alias("missing", "https://new.example", temp_db)
+
+    def test_rename_alias_keeps_redirect(self, temp_db):
+        rename_alias("ex", "example", db_path=temp_db)
+        redirects = load_data(temp_db)["redirects"]
+        assert redirects == {"example": "https://example.com"}
+        assert find_alias("EXAMPLE", temp_db, case_insensitive=True) == "https://example.com"
+
+    def test_rename_alias_with_redirect(self, temp_db):
+        rename_alias("ex", "example", "https://other.example", temp_db)
+        assert load_data(temp_db)["redirects"] == {"example": "https://other.example"}
+
+    def test_rename_conflict_keeps_original(self, temp_db):
+        add_alias("taken", "https://taken.example", temp_db)
+        with pytest.raises(ValidationError, match="already exists"):
+            rename_alias("ex", "taken", db_path=temp_db)
+        redirects = load_data(temp_db)["redirects"]
+        assert redirects["ex"] == "https://example.com"
+        assert redirects["taken"] == "https://taken.example"
+
+    def test_rename_missing_alias(self, temp_db):
+        with pytest.raises(ValidationError, match="not found"):
+            rename_alias("missing", "other", db_path=temp_db)
+
+    def test_rename_to_segments_needs_prefix_target(self, temp_db):
+        with pytest.raises(ValidationError, match="can only contain"):
+            rename_alias("ex", "team/ex", db_path=temp_db)
+        add_alias("wiki", "https://wiki.example/{rest}", temp_db)
+        rename_alias("wiki", "team/wiki", db_path=temp_db)
+        assert "team/wiki" in load_data(temp_db)["redirects"]
+
+    def test_rename_case_insensitive_collision(self, temp_db):
+        update_setting("case-insensitive", "True", temp_db)
+        add_alias("wiki", "https://wiki.example", temp_db)
+        with pytest.raises(ValidationError, match="collides"):
+            rename_alias("ex", "WIKI", db_path=temp_db)
+        # Changing only the case of the alias itself is allowed
+        rename_alias("wiki", "Wiki", db_path=temp_db)
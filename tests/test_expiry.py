@@ -0,0 +1,33 @@
+"""Tests for expiry.py - the background expiry sweeper."""
+
+import time
+
+from tiny_redirect import data
+from tiny_redirect.expiry import ExpirySweeper
+
+
+class TestExpirySweeper:
+    """Tests for ExpirySweeper."""
+
+    def test_next_wait(self, temp_db):
+        sweeper = ExpirySweeper(temp_db, max_interval=30)
+        assert sweeper.next_wait() == 30
+        data.add_alias("tmp", "https://tmp.example", temp_db, expires_at=time.time() + 5)
+        assert 0 < sweeper.next_wait() <= 5
+        data.set_alias_expiry("tmp", 1, temp_db)
+        assert sweeper.next_wait() == 0
+
+    def test_removes_alias_when_it_expires(self, temp_db):
+        sweeper = ExpirySweeper(temp_db, max_interval=30)
+        sweeper.start()
+        try:
+            # Added after the sweeper went to sleep: the write wakes it
+            data.add_alias("tmp", "https://tmp.example", temp_db, expires_at=time.time() + 0.1)
+            deadline = time.time() + 5
+            while "tmp" in data.load_data(temp_db)["redirects"] and time.time() < deadline:
+                time.sleep(0.02)
+        finally:
+            sweeper.stop()
+        assert "tmp" not in data.load_data(temp_db)["redirects"]
+        from tiny_redirect.history import alias_history
+        assert alias_history("tmp", temp_db)[0]["source"] == "expiry"
@@ -0,0 +1,163 @@
+"""Tests for history.py - change history, retention and point-in-time restore."""
+
+import sqlite3
+import time
+
+import pytest
+
+from tiny_redirect import data
+from tiny_redirect.data import ValidationError
+from tiny_redirect.history import (
+    HistoryCompactor,
+    alias_history,
+    compact_history,
+    restore_alias,
+    target_at,
+)
+
+
+def count_rows(db_path, table):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        connection.close()
+
+
+class TestRecording:
+    """Tests for the entries written by data.py."""
+
+    def test_add_edit_delete(self, temp_db):
+        data.add_alias("wiki", "https://wiki.example", temp_db)
+        data.update_alias("wiki", "https://wiki2.example", temp_db)
+        data.delete_alias("wiki", temp_db)
+        entries = alias_history("wiki", temp_db)
+        assert [(e["action"], e["before"], e["after"]) for e in entries] == [
+            ("delete", "https://wiki2.example", None),
+            ("edit", "https://wiki.example", "https://wiki2.example"),
+            ("add", None, "https://wiki.example"),
+        ]
+
+    def test_unchanged_edit_is_not_recorded(self, temp_db):
+        data.update_alias("ex", "https://example.com", temp_db)
+        assert alias_history("ex", temp_db) == []
+
+    def test_rename_is_listed_under_both_names(self, temp_db):
+        data.rename_alias("ex", "example", db_path=temp_db)
+        (entry,) = alias_history("ex", temp_db)
+        assert alias_history("example", temp_db) == [entry]
+        assert (entry["action"], entry["old_alias"], entry["alias"]) == ("rename", "ex", "example")
+
+    def test_failed_write_records_nothing(self, temp_db):
+        with pytest.raises(ValidationError):
+            data.add_alias("ex", "https://dup.example", temp_db)
+        assert alias_history("ex", temp_db) == []
+
+    def test_strings_are_stored_once(self, temp_db):
+        for _ in range(10):
+            data.update_alias("ex", "https://a.example", temp_db)
+            data.update_alias("ex", "https://b.example", temp_db)
+        assert count_rows(temp_db, "history") == 20
+        # "ex", the two targets and the original target
+        assert count_rows(temp_db, "history_strings") == 4
+
+    def test_change_source(self, temp_db):
+        with data.change_source("web 10.0.0.1"):
+            data.delete_alias("ex", temp_db)
+        assert alias_history("ex", temp_db)[0]["source"] == "web 10.0.0.1"
+
+    def test_replace_import_records_deletes(self, temp_db):
+        data.import_redirects('{"file_type": "tredirects", "version": "1.0", "redirects": []}',
+                              temp_db, replace=True)
+        assert alias_history("ex", temp_db)[0]["action"] == "delete"
+
+    def test_paging(self, temp_db):
+        for index in range(5):
+            data.update_alias("ex", f"https://{index}.example", temp_db)
+        first = alias_history("ex", temp_db, limit=3)
+        second = alias_history("ex", temp_db, limit=3, before=first[-1]["id"])
+        assert len(first) == 3 and len(second) == 2
+        assert second[-1]["before"] == "https://example.com"
+
+    def test_lookup_uses_index(self, temp_db):
+        connection = sqlite3.connect(temp_db)
+        try:
+            plan = " ".join(row[3] for row in connection.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM history WHERE alias_id = 1 OR old_alias_id = 1"
+            ))
+        finally:
+            connection.close()
+        assert "idx_history_alias" in plan and "SCAN history" not in plan
+
+
+class TestRestore:
+    """Tests for point-in-time restore."""
+
+    def test_target_at(self, temp_db):
+        data.add_alias("wiki", "https://one.example", temp_db)
+        between = time.time()
+        time.sleep(0.01)
+        data.update_alias("wiki", "https://two.example", temp_db)
+        assert target_at("wiki", between, temp_db) == "https://one.example"
+        assert target_at("wiki", time.time(), temp_db) == "https://two.example"
+        # Added later, so it did not exist yet
+        assert target_at("wiki", 0, temp_db) is None
+        # Existed before the first recorded change
+        with pytest.raises(ValidationError):
+            target_at("ex", 0, temp_db)
+
+    def test_restore_edit_and_rename(self, temp_db):
+        data.add_alias("wiki", "https://one.example", temp_db)
+        before_changes = time.time()
+        time.sleep(0.01)
+        data.rename_alias("wiki", "docs", "https://two.example", temp_db)
+        assert restore_alias("wiki", before_changes, temp_db) == "https://one.example"
+        assert restore_alias("docs", before_changes, temp_db) is None
+        assert data.find_alias("wiki", temp_db) == "https://one.example"
+        assert data.find_alias("docs", temp_db) is None
+        assert alias_history("docs", temp_db)[0]["action"] == "delete"
+
+
+    def test_namespaces_have_separate_history(self, temp_db):
+        data.add_alias("wiki", "https://one.example", temp_db)
+        data.add_alias("wiki", "https://team.example", temp_db, namespace="team")
+        before_changes = time.time()
+        time.sleep(0.01)
+        data.delete_alias("wiki", temp_db, namespace="team")
+        assert [entry["action"] for entry in alias_history("wiki", temp_db)] == ["add"]
+        entries = alias_history("wiki", temp_db, namespace="team")
+        assert [entry["action"] for entry in entries] == ["delete", "add"]
+        assert entries[0]["namespace"] == "team"
+        assert restore_alias("wiki", before_changes, temp_db, namespace="team") == "https://team.example"
+        assert data.find_alias("wiki", temp_db, namespace="team") == "https://team.example"
+        with pytest.raises(ValidationError):
+            target_at("wiki", 0, temp_db, namespace="other")
+
+class TestCompaction:
+    """Tests for retention limits."""
+
+    def test_keep_per_alias(self, temp_db):
+        data.add_alias("other", "https://other.example", temp_db)
+        for index in range(10):
+            data.update_alias("ex", f"https://{index}.example", temp_db)
+        removed = compact_history(temp_db, keep=3, max_age=0, batch_size=2)
+        assert removed["entries"] == 7
+        assert [e["after"] for e in alias_history("ex", temp_db)] == [
+            "https://9.example", "https://8.example", "https://7.example"
+        ]
+        assert len(alias_history("other", temp_db)) == 1
+        # Targets only the dropped entries used are gone too
+        assert removed["strings"] == 7
+
+    def test_max_age(self, temp_db):
+        data.update_alias("ex", "https://old.example", temp_db)
+        later = time.time() + 100
+        assert compact_history(temp_db, keep=0, max_age=50, now=later)["entries"] == 1
+        assert alias_history("ex", temp_db) == []
+        assert count_rows(temp_db, "history_strings") == 0
+
+    def test_compactor_run_once(self, temp_db):
+        data.update_alias("ex", "https://a.example", temp_db)
+        data.update_alias("ex", "https://b.example", temp_db)
+        compactor = HistoryCompactor(temp_db, interval=3600, keep=1)
+        assert compactor.run_once()["entries"] == 1
@@ -0,0 +1,127 @@
+"""Tests for linkcheck.py - background link-health checks against a local server."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tiny_redirect import data
+from tiny_redirect.linkcheck import LinkChecker, next_interval
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """/ok answers, /missing is a 404, /nohead refuses HEAD, /slow takes a while"""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def _answer(self, with_body):
+        with StandInHandler.lock:
+            StandInHandler.active += 1
+            StandInHandler.peak = max(StandInHandler.peak, StandInHandler.active)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(0.2)
+            if self.path.startswith("/missing"):
+                status = 404
+            elif self.path.startswith("/nohead") and not with_body:
+                status = 405
+            else:
+                status = 200
+            self.send_response(status)
+            self.send_header("Content-Length", "2" if with_body else "0")
+            self.end_headers()
+            if with_body:
+                self.wfile.write(b"ok")
+        finally:
+            with StandInHandler.lock:
+                StandInHandler.active -= 1
+
+    def do_HEAD(self):
+        self._answer(with_body=False)
+
+    def do_GET(self):
+        self._answer(with_body=True)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StandInHandler.peak = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestLinkChecker:
+    """Tests for checking targets and storing the results."""
+
+    def test_results_are_stored(self, temp_db, stand_in):
+        data.delete_alias("ex", temp_db)
+        data.add_alias("good", f"{stand_in}/ok", temp_db)
+        data.add_alias("gone", f"{stand_in}/missing", temp_db)
+        data.add_alias("nohead", f"{stand_in}/nohead", temp_db)
+        data.add_alias("jira", f"{stand_in}/ok/{{rest}}", temp_db)
+        assert LinkChecker(temp_db).run_once() == 4
+        status = data.load_link_status(temp_db)
+        assert status[f"{stand_in}/ok"]["ok"] == 1
+        assert status[f"{stand_in}/missing"]["status"] == 404
+        assert status[f"{stand_in}/missing"]["ok"] == 0
+        assert status[f"{stand_in}/nohead"]["status"] == 200
+        assert status[f"{stand_in}/ok/{{rest}}"]["ok"] == 1
+
+    def test_unreachable_target(self, temp_db):
+        data.delete_alias("ex", temp_db)
+        data.add_alias("down", "http://127.0.0.1:9/", temp_db)
+        LinkChecker(temp_db, timeout=1).run_once()
+        status = data.load_link_status(temp_db)["http://127.0.0.1:9/"]
+        assert status["ok"] == 0 and status["status"] is None
+        assert "ConnectionError" in status["error"]
+
+    def test_only_due_targets_are_rechecked(self, temp_db, stand_in):
+        data.delete_alias("ex", temp_db)
+        data.add_alias("good", f"{stand_in}/ok", temp_db)
+        checker = LinkChecker(temp_db, interval=100)
+        now = time.time()
+        assert checker.run_once(now) == 1
+        assert checker.run_once(now + 50) == 0
+        assert checker.run_once(now + 101) == 1
+
+    def test_removed_targets_are_forgotten(self, temp_db, stand_in):
+        data.delete_alias("ex", temp_db)
+        data.add_alias("good", f"{stand_in}/ok", temp_db)
+        LinkChecker(temp_db).run_once()
+        data.delete_alias("good", temp_db)
+        LinkChecker(temp_db).run_once()
+        assert data.load_link_status(temp_db) == {}
+
+    def test_per_host_limit(self, temp_db, stand_in):
+        data.delete_alias("ex", temp_db)
+        for index in range(8):
+            data.add_alias(f"slow{index}", f"{stand_in}/slow/{index}", temp_db)
+        LinkChecker(temp_db, workers=8, per_host=2).run_once()
+        assert StandInHandler.peak <= 2
+        assert len(data.load_link_status(temp_db)) == 8
+
+    def test_next_interval_adapts(self):
+        assert next_interval(True, 1, 100, 1000, 10) == 100
+        assert next_interval(True, 3, 100, 1000, 10) == 400
+        assert next_interval(True, 10, 100, 1000, 10) == 1000
+        assert next_interval(False, 1, 100, 1000, 10) == 10
+        assert next_interval(False, 10, 100, 1000, 10) == 100
+
+    def test_redirects_page_shows_status(self, test_client, temp_db, stand_in):
+        data.delete_alias("ex", temp_db)
+        data.add_alias("good", f"{stand_in}/ok", temp_db)
+        data.add_alias("gone", f"{stand_in}/missing", temp_db)
+        LinkChecker(temp_db).run_once()
+        page = test_client.get('/redirects').text
+        assert ">404</span>" in page
+        assert ">OK</span>" in page
@@ -0,0 +1,163 @@
+"""Tests for ratelimit.py - token buckets and admission control."""
+
+import threading
+
+import pytest
+from bottle import Bottle
+from webtest import TestApp
+
+from tiny_redirect.ratelimit import RateLimitPlugin, TokenBucketLimiter, parse_limits, parse_proxies
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucketLimiter:
+    """Tests for per-client token buckets."""
+
+    def test_allows_burst_then_limits(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=3, clock=FakeClock())
+        assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+        assert limiter.acquire("a") == pytest.approx(1.0)
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        limiter = TokenBucketLimiter(rate=2.0, burst=1, clock=clock)
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") > 0
+        clock.now += 0.5
+        assert limiter.acquire("a") == 0
+
+    def test_clients_are_independent(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=1, clock=FakeClock())
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") > 0
+        assert limiter.acquire("b") == 0
+
+    def test_client_table_is_bounded(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=1, max_clients=2, clock=FakeClock())
+        for client in ("a", "b", "c"):
+            limiter.acquire(client)
+        assert len(limiter) == 2
+        # "a" was the least recently seen and starts over with a full bucket
+        assert limiter.acquire("a") == 0
+
+
+class TestParseLimits:
+    """Tests for the TINYREDIRECT_RATE_LIMITS format."""
+
+    def test_overrides_named_classes(self):
+        limits = parse_limits("redirect=5:10, import=0")
+        assert limits["redirect"] == (5.0, 10)
+        assert limits["import"][0] == 0
+        assert "admin" in limits
+
+    def test_rejects_malformed_entries(self):
+        with pytest.raises(ValueError, match="class=rate:burst"):
+            parse_limits("redirect")
+        with pytest.raises(ValueError, match="burst >= 1"):
+            parse_limits("redirect=5:0")
+
+
+class TestRateLimitPlugin:
+    """Tests for the Bottle plugin."""
+
+    def make_app(self, plugin):
+        app = Bottle()
+        app.install(plugin)
+
+        @app.route("/go", rate_limit="redirect")
+        def go():
+            return "go"
+
+        @app.route("/admin")
+        def admin():
+            return "admin"
+
+        @app.route("/health", skip=["ratelimit"])
+        def health():
+            return "ok"
+
+        return TestApp(app, extra_environ={"REMOTE_ADDR": "10.0.0.1"})
+
+    def test_rejects_with_retry_after(self):
+        client = self.make_app(RateLimitPlugin({"redirect": (1.0, 2), "admin": (1.0, 1)}))
+        assert client.get("/go").status_int == 200
+        assert client.get("/go").status_int == 200
+        response = client.get("/go", expect_errors=True)
+        assert response.status_int == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        # Other route classes keep their own buckets
+        assert client.get("/admin").status_int == 200
+
+    def test_forwarded_header_does_not_pick_bucket(self):
+        client = self.make_app(RateLimitPlugin({"redirect": (1.0, 1)}))
+        client.get("/go")
+        response = client.get("/go", headers={"X-Forwarded-For": "1.2.3.4"}, expect_errors=True)
+        assert response.status_int == 429
+
+    def test_configure_applies_to_running_routes(self):
+        plugin = RateLimitPlugin({"redirect": (1.0, 1)})
+        client = self.make_app(plugin)
+        client.get("/go")
+        assert client.get("/go", expect_errors=True).status_int == 429
+        plugin.configure({"redirect": (0, 1)})
+        assert all(client.get("/go").status_int == 200 for _ in range(5))
+        plugin.configure({"redirect": (1.0, 1)})
+        client.get("/go")
+        assert client.get("/go", expect_errors=True).status_int == 429
+
+    def test_configure_keeps_unchanged_buckets(self):
+        plugin = RateLimitPlugin({"redirect": (1.0, 1), "admin": (1.0, 1)})
+        client = self.make_app(plugin)
+        client.get("/go")
+        plugin.configure({"redirect": (1.0, 1), "admin": (5.0, 10)}, max_in_flight=8)
+        assert client.get("/go", expect_errors=True).status_int == 429
+        assert plugin.max_in_flight == 8
+
+    def test_forwarded_client_from_trusted_proxy(self):
+        plugin = RateLimitPlugin({"redirect": (1.0, 1)}, trusted_proxies=parse_proxies("10.0.0.0/8"))
+        client = self.make_app(plugin)
+        # The client's own X-Forwarded-For entry is ignored; the proxy's is used
+        headers = {"X-Forwarded-For": "1.2.3.4, 198.51.100.7, 10.0.0.2"}
+        assert client.get("/go", headers=headers).status_int == 200
+        assert client.get("/go", headers=headers, expect_errors=True).status_int == 429
+        other = {"X-Forwarded-For": "1.2.3.4, 198.51.100.8"}
+        assert client.get("/go", headers=other).status_int == 200
+
+    def test_parse_proxies_rejects_garbage(self):
+        with pytest.raises(ValueError, match="Invalid trusted proxy"):
+            parse_proxies("10.0.0.1,proxy.example")
+
+    def test_skipped_routes_are_not_limited(self):
+        client = self.make_app(RateLimitPlugin({"admin": (1.0, 1)}))
+        assert all(client.get("/health").status_int == 200 for _ in range(5))
+
+    def test_in_flight_cap(self):
+        plugin = RateLimitPlugin({}, max_in_flight=1)
+        release = threading.Event()
+        entered = threading.Event()
+        app = Bottle()
+        app.install(plugin)
+
+        @app.route("/slow")
+        def slow():
+            entered.set()
+            release.wait(5)
+            return "done"
+
+        client = TestApp(app)
+        worker = threading.Thread(target=client.get, args=("/slow",))
+        worker.start()
+        entered.wait(5)
+        response = client.get("/slow", expect_errors=True)
+        release.set()
+        worker.join()
+        assert response.status_int == 503
+        assert response.headers["Retry-After"] == "1"
+        assert plugin.in_flight == 0
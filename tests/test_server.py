@@ -0,0 +1,442 @@
+"""Tests for server.py - graceful shutdown and socket hand-over."""
+
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+from bottle import Bottle, redirect, request
+
+from tiny_redirect import server
+from tiny_redirect.server import GracefulServer, LISTEN_FD_ENV
+
+
+def start(adapter, app):
+    """Run adapter in a thread and wait until it is accepting."""
+    thread = threading.Thread(target=adapter.run, args=(app,), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while adapter.server is None or server.current_server is not adapter:
+        assert time.monotonic() < deadline, "server did not start"
+        time.sleep(0.01)
+    return thread
+
+
+def get(port, path="/"):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as reply:
+        return reply.read().decode()
+
+
+@pytest.fixture
+def slow_app():
+    app = Bottle()
+    app.entered = threading.Event()
+    app.release = threading.Event()
+
+    @app.route("/")
+    def index():
+        return "fast"
+
+    @app.route("/slow")
+    def slow():
+        app.entered.set()
+        app.release.wait(5)
+        return "slow done"
+
+    return app
+
+
+def read_response(reader):
+    """Read one HTTP/1.1 response from a socket file; returns (status, headers, body)."""
+    status = int(reader.readline().split()[1])
+    headers = {}
+    while True:
+        line = reader.readline().decode().strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = reader.read(int(headers["content-length"])) if "content-length" in headers else reader.read()
+    return status, headers, body
+
+
+# Larger than the socket buffers, so the server blocks on a slow reader
+LARGE_BODY = 16 * 1024 * 1024
+
+
+@pytest.fixture
+def keep_alive_app():
+    app = Bottle()
+
+    @app.route("/")
+    def index():
+        return "fast"
+
+    @app.route("/go")
+    def go():
+        redirect("https://example.com/target", 303)
+
+    @app.route("/stream")
+    def stream():
+        yield "part one, "
+        yield "part two"
+
+    @app.route("/large")
+    def large():
+        return b"x" * LARGE_BODY
+
+    @app.post("/ignore")
+    def ignore():
+        return "ignored"
+
+    @app.post("/echo")
+    def echo():
+        return request.body.read()
+
+    return app
+
+
+@pytest.fixture
+def keep_alive_server(keep_alive_app):
+    adapter = GracefulServer(port=0, quiet=True, keep_alive_timeout=5, max_keep_alive_requests=3)
+    thread = start(adapter, keep_alive_app)
+    yield adapter
+    adapter.begin_shutdown()
+    thread.join(5)
+
+
+def connect(port):
+    connection = socket.create_connection(("127.0.0.1", port), timeout=5)
+    return connection, connection.makefile("rb")
+
+
+class TestKeepAlive:
+    """Tests for persistent HTTP/1.1 connections."""
+
+    def test_serves_several_requests_on_one_connection(self, keep_alive_server):
+        connection, reader = connect(keep_alive_server.port)
+        with connection, reader:
+            for _ in range(2):
+                connection.sendall(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+                status, headers, body = read_response(reader)
+                assert (status, body) == (200, b"fast")
+                assert headers["content-length"] == "4"
+                assert "connection" not in headers
+
+    def test_answers_pipelined_requests_in_order(self, keep_alive_server):
+        connection, reader = connect(keep_alive_server.port)
+        with connection, reader:
+            connection.sendall(
+                b"GET /go HTTP/1.1\r\nHost: test\r\n\r\n"
+                b"POST /echo HTTP/1.1\r\nHost: test\r\nContent-Length: 5\r\n\r\nhello"
+            )
+            status, headers, body = read_response(reader)
+            assert status == 303
+            assert headers["location"] == "https://example.com/target"
+            assert headers["content-length"] == "0"
+            assert read_response(reader)[2] == b"hello"
+
+    def test_closes_after_max_requests(self, keep_alive_server):
+        connection, reader = connect(keep_alive_server.port)
+        with connection, reader:
+            for number in range(1, 4):
+                connection.sendall(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+                status, headers, body = read_response(reader)
+                assert body == b"fast"
+            assert headers["connection"] == "close"
+            assert reader.read() == b""
+
+    def test_closes_idle_connection(self, keep_alive_app):
+        adapter = GracefulServer(port=0, quiet=True, keep_alive_timeout=0.2)
+        thread = start(adapter, keep_alive_app)
+        try:
+            connection, reader = connect(adapter.port)
+            with connection, reader:
+                connection.sendall(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+                assert read_response(reader)[2] == b"fast"
+                time.sleep(0.5)
+                assert reader.read() == b""
+        finally:
+            adapter.begin_shutdown()
+            thread.join(5)
+
+    def test_idle_timeout_does_not_cut_slow_reader(self, keep_alive_app):
+        adapter = GracefulServer(port=0, quiet=True, keep_alive_timeout=0.2)
+        thread = start(adapter, keep_alive_app)
+        try:
+            connection, reader = connect(adapter.port)
+            with connection, reader:
+                connection.sendall(b"GET /large HTTP/1.1\r\nHost: test\r\n\r\n")
+                status = int(reader.readline().split()[1])
+                headers = dict(
+                    line.decode().strip().lower().split(": ", 1)
+                    for line in iter(reader.readline, b"\r\n")
+                )
+                received = 0
+                while received < LARGE_BODY:
+                    chunk = reader.read1(1024 * 1024)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    # Well past the idle timeout in total
+                    time.sleep(0.05)
+                assert status == 200
+                assert received == int(headers["content-length"]) == LARGE_BODY
+        finally:
+            adapter.begin_shutdown()
+            thread.join(5)
+
+    def test_skips_unread_request_body(self, keep_alive_server):
+        connection, reader = connect(keep_alive_server.port)
+        with connection, reader:
+            connection.sendall(
+                b"POST /ignore HTTP/1.1\r\nHost: test\r\nContent-Length: 11\r\n\r\nGET / HTTP/"
+                b"GET / HTTP/1.1\r\nHost: test\r\n\r\n"
+            )
+            assert read_response(reader)[2] == b"ignored"
+            assert read_response(reader)[2] == b"fast"
+
+    def test_closes_after_response_without_length(self, keep_alive_server):
+        connection, reader = connect(keep_alive_server.port)
+        with connection, reader:
+            connection.sendall(b"GET /stream HTTP/1.1\r\nHost: test\r\n\r\n")
+            status, headers, body = read_response(reader)
+            assert headers["connection"] == "close"
+            assert body == b"part one, part two"
+
+    def test_honours_connection_close(self, keep_alive_server):
+        connection, reader = connect(keep_alive_server.port)
+        with connection, reader:
+            connection.sendall(b"GET / HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+            status, headers, body = read_response(reader)
+            assert headers["connection"] == "close"
+            assert reader.read() == b""
+
+    def test_disabled_answers_one_request_per_connection(self, keep_alive_app):
+        adapter = GracefulServer(port=0, quiet=True, keep_alive_timeout=0)
+        thread = start(adapter, keep_alive_app)
+        try:
+            connection, reader = connect(adapter.port)
+            with connection, reader:
+                connection.sendall(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+                assert reader.readline().startswith(b"HTTP/1.0 200")
+                assert reader.read().endswith(b"fast")
+        finally:
+            adapter.begin_shutdown()
+            thread.join(5)
+
+
+class TestGracefulShutdown:
+    """Tests for draining requests in flight."""
+
+    def test_drains_request_in_flight(self, slow_app):
+        adapter = GracefulServer(port=0, quiet=True, drain_timeout=5)
+        thread = start(adapter, slow_app)
+        results = []
+        client = threading.Thread(target=lambda: results.append(get(adapter.port, "/slow")))
+        client.start()
+        assert slow_app.entered.wait(5)
+
+        server.request_shutdown()
+        time.sleep(0.5)
+        # No longer accepting, but the slow request is still being served
+        with pytest.raises(OSError):
+            get(adapter.port)
+        assert thread.is_alive()
+
+        slow_app.release.set()
+        client.join(5)
+        thread.join(5)
+        assert results == ["slow done"]
+        assert not thread.is_alive()
+        assert server.current_server is None
+
+    def test_runs_shutdown_hooks_after_drain(self, slow_app):
+        calls = []
+        hook = lambda: calls.append("flushed")
+        server.add_shutdown_hook(hook)
+        try:
+            adapter = GracefulServer(port=0, quiet=True)
+            thread = start(adapter, slow_app)
+            assert get(adapter.port) == "fast"
+            adapter.begin_shutdown()
+            thread.join(5)
+        finally:
+            server.remove_shutdown_hook(hook)
+        assert calls == ["flushed"]
+
+    def test_request_shutdown_without_server(self):
+        assert server.request_shutdown() is False
+
+
+class TestRebind:
+    """Tests for moving the listener to a new address."""
+
+    def test_rebind_moves_listener_and_drains_old(self, slow_app):
+        adapter = GracefulServer(port=0, quiet=True, drain_timeout=5)
+        thread = start(adapter, slow_app)
+        old_port = adapter.port
+        results = []
+        client = threading.Thread(target=lambda: results.append(get(old_port, "/slow")))
+        client.start()
+        assert slow_app.entered.wait(5)
+
+        assert server.request_rebind("127.0.0.1", 0) is True
+        new_port = adapter.port
+        assert new_port != old_port
+        assert get(new_port) == "fast"
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                get(old_port)
+            except OSError:
+                break
+            assert time.monotonic() < deadline, "old listener still accepting"
+            time.sleep(0.05)
+
+        slow_app.release.set()
+        client.join(5)
+        assert results == ["slow done"]
+        adapter.begin_shutdown()
+        thread.join(5)
+        assert not thread.is_alive()
+
+    def test_rebind_to_busy_port_keeps_listener(self, slow_app):
+        busy = socket.socket()
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        adapter = GracefulServer(port=0, quiet=True)
+        thread = start(adapter, slow_app)
+        try:
+            with pytest.raises(OSError):
+                adapter.rebind("127.0.0.1", busy.getsockname()[1])
+            assert get(adapter.port) == "fast"
+        finally:
+            busy.close()
+            adapter.begin_shutdown()
+            thread.join(5)
+
+
+class TestSocketHandOver:
+    """Tests for serving on an inherited listening socket."""
+
+    def test_serves_on_inherited_socket(self, slow_app, monkeypatch):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        monkeypatch.setenv(LISTEN_FD_ENV, str(listener.detach()))
+
+        adapter = GracefulServer(port=1, quiet=True)
+        thread = start(adapter, slow_app)
+        assert adapter.port == port
+        assert get(port) == "fast"
+        adapter.begin_shutdown()
+        thread.join(5)
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="socket hand-over is POSIX only")
+    def test_restart_hands_socket_to_new_process(self, slow_app, monkeypatch):
+        child_script = (
+            "import os, socket\n"
+            f"listener = socket.socket(fileno=int(os.environ['{server.LISTEN_FD_ENV}']))\n"
+            f"os.write(int(os.environ['{server.READY_FD_ENV}']), b'1')\n"
+            "connection, _ = listener.accept()\n"
+            "connection.recv(65536)\n"
+            "connection.sendall(b'HTTP/1.0 200 OK\\r\\nContent-Length: 5\\r\\n\\r\\nchild')\n"
+            "connection.close()\n"
+        )
+        monkeypatch.setattr(server, "_restart_command", lambda: [sys.executable, "-c", child_script])
+        adapter = GracefulServer(port=0, quiet=True)
+        thread = start(adapter, slow_app)
+        assert get(adapter.port) == "fast"
+
+        assert adapter.restart() is True
+        thread.join(5)
+        assert not thread.is_alive()
+        # The port stayed open and the new process answers
+        assert get(adapter.port) == "child"
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+class TestUnixSocket:
+    """Tests for unix:/path.sock listeners and systemd socket activation."""
+
+    @staticmethod
+    def get_unix(path, request=b"GET / HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n"):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(5)
+        connection.connect(path)
+        with connection, connection.makefile("rb") as reader:
+            connection.sendall(request)
+            return read_response(reader)
+
+    def test_serves_on_unix_socket(self, slow_app, tmp_path):
+        path = str(tmp_path / "app.sock")
+        adapter = GracefulServer(host=f"unix:{path}", quiet=True, socket_mode=0o600)
+        thread = start(adapter, slow_app)
+        try:
+            status, headers, body = self.get_unix(path)
+            assert (status, body) == (200, b"fast")
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        finally:
+            adapter.begin_shutdown()
+            thread.join(5)
+        assert not thread.is_alive()
+
+    def test_replaces_stale_socket_file(self, slow_app, tmp_path):
+        path = str(tmp_path / "app.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        adapter = GracefulServer(host=f"unix:{path}", quiet=True)
+        thread = start(adapter, slow_app)
+        try:
+            assert self.get_unix(path)[2] == b"fast"
+        finally:
+            adapter.begin_shutdown()
+            thread.join(5)
+
+    def test_refuses_socket_in_use(self, tmp_path):
+        path = str(tmp_path / "app.sock")
+        live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        live.bind(path)
+        live.listen()
+        try:
+            with pytest.raises(OSError, match="in use"):
+                server.DrainingWSGIServer(path, server.QuietHandler)
+        finally:
+            live.close()
+
+    def test_adopts_systemd_socket(self, slow_app, tmp_path, monkeypatch):
+        path = str(tmp_path / "activated.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen()
+        monkeypatch.setattr(server, "SYSTEMD_FIRST_FD", listener.detach())
+        monkeypatch.delenv(LISTEN_FD_ENV, raising=False)
+        monkeypatch.setenv("LISTEN_PID", str(os.getpid()))
+        monkeypatch.setenv("LISTEN_FDS", "1")
+
+        adapter = GracefulServer(port=1, quiet=True)
+        thread = start(adapter, slow_app)
+        try:
+            assert self.get_unix(path)[2] == b"fast"
+            # Adopted once; a restarted process must not pick the variables up
+            assert "LISTEN_FDS" not in os.environ
+        finally:
+            adapter.begin_shutdown()
+            thread.join(5)
+
+    def test_ignores_systemd_variables_for_other_process(self, monkeypatch):
+        monkeypatch.delenv(LISTEN_FD_ENV, raising=False)
+        monkeypatch.setenv("LISTEN_PID", str(os.getpid() + 1))
+        monkeypatch.setenv("LISTEN_FDS", "1")
+        assert server.inherited_listen_fd() is None
+
+    def test_unix_socket_path(self):
+        assert server.unix_socket_path("unix:/run/tiny-redirect.sock") == "/run/tiny-redirect.sock"
+        assert server.unix_socket_path("127.0.0.1") is None
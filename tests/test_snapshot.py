@@ -0,0 +1,141 @@
+"""Tests for snapshot.py - memory-mapped alias snapshot."""
+
+import json
+import os
+
+import pytest
+
+from tiny_redirect import data
+from tiny_redirect.cache import AliasCache
+from tiny_redirect.snapshot import SnapshotReader, compile_snapshot, write_snapshot
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "aliases.snap")
+
+
+@pytest.fixture
+def snapshot_listener(temp_db, snapshot_path):
+    """Recompile the snapshot after every write, as main() does."""
+    def listener(changed_db_path):
+        if changed_db_path == temp_db:
+            compile_snapshot(temp_db, snapshot_path)
+
+    compile_snapshot(temp_db, snapshot_path)
+    data.add_write_listener(listener)
+    yield listener
+    data.remove_write_listener(listener)
+
+
+class TestSnapshotFile:
+    """Tests for writing and reading snapshot files."""
+
+    def test_round_trip(self, snapshot_path):
+        entries = [(f"alias{i}", f"https://example.com/{i}") for i in range(1000)]
+        write_snapshot(entries, snapshot_path, "/db")
+        mapped = SnapshotReader(snapshot_path).current("/db")
+        assert mapped.count == 1000
+        for alias, target in entries:
+            assert mapped.get(alias) == target
+        assert mapped.get("missing") is None
+
+    def test_empty(self, snapshot_path):
+        write_snapshot([], snapshot_path, "/db")
+        assert SnapshotReader(snapshot_path).current("/db").get("x") is None
+
+    def test_prefix_section(self, snapshot_path):
+        write_snapshot([("jira", "https://j.example/{rest}"), ("ex", "https://e.example")],
+                       snapshot_path, "/db")
+        mapped = SnapshotReader(snapshot_path).current("/db")
+        assert mapped.get("jira") is None
+        assert mapped.prefixes.longest_match("jira/A-1") == ("https://j.example/{rest}", "A-1")
+
+    def test_case_insensitive_flag(self, snapshot_path):
+        write_snapshot([("wiki", "https://w.example")], snapshot_path, "/db", case_insensitive=True)
+        assert SnapshotReader(snapshot_path).current("/db").get("WiKi") == "https://w.example"
+
+    def test_other_database_not_current(self, snapshot_path):
+        write_snapshot([("a", "https://a.example")], snapshot_path, "/db")
+        assert SnapshotReader(snapshot_path).current("/other") is None
+
+    def test_missing_or_corrupt_file(self, snapshot_path):
+        reader = SnapshotReader(snapshot_path, check_interval=0)
+        assert reader.current("/db") is None
+        with open(snapshot_path, "wb") as snapshot_file:
+            snapshot_file.write(b"garbage" * 20)
+        assert reader.current("/db") is None
+
+    def test_swap_picked_up_without_restart(self, snapshot_path):
+        """Test that a reader follows a snapshot replaced by another process."""
+        write_snapshot([("a", "https://old.example")], snapshot_path, "/db")
+        reader = SnapshotReader(snapshot_path, check_interval=0)
+        old = reader.current("/db")
+        assert old.get("a") == "https://old.example"
+        write_snapshot([("a", "https://new.example")], snapshot_path, "/db")
+        assert reader.current("/db").get("a") == "https://new.example"
+        # The replaced mapping stays readable for lookups already holding it
+        assert old.get("a") == "https://old.example"
+
+    def test_no_temp_files_left(self, snapshot_path, tmp_path):
+        write_snapshot([("a", "https://a.example")], snapshot_path, "/db")
+        assert os.listdir(tmp_path) == ["aliases.snap"]
+
+
+class TestSnapshotCache:
+    """Tests for AliasCache answering from the snapshot."""
+
+    def test_lookup_without_loading_view(self, temp_db, snapshot_path, snapshot_listener):
+        cache = AliasCache(snapshot=SnapshotReader(snapshot_path))
+        assert cache.get("ex", temp_db) == "https://example.com"
+        assert cache.is_warm(temp_db) is True
+        assert cache.loaded_at is None
+
+    def test_write_recompiles(self, temp_db, snapshot_path, snapshot_listener):
+        cache = AliasCache(snapshot=SnapshotReader(snapshot_path))
+        cache.get("ex", temp_db)
+        data.add_alias("new", "https://new.example", temp_db)
+        assert cache.get("new", temp_db) == "https://new.example"
+        data.delete_alias("new", temp_db)
+        assert cache.get("new", temp_db) is None
+
+    def test_import_compiles_once(self, temp_db, snapshot_path, snapshot_listener):
+        calls = []
+        data.add_write_listener(calls.append)
+        try:
+            data.import_redirects(json.dumps({
+                "file_type": "tredirects",
+                "version": "1.0",
+                "redirects": [{"alias": f"a{i}", "redirect": "https://a.example"} for i in range(20)],
+            }), temp_db)
+        finally:
+            data.remove_write_listener(calls.append)
+        assert calls == [temp_db]
+        cache = AliasCache(snapshot=SnapshotReader(snapshot_path))
+        assert cache.get("a19", temp_db) == "https://a.example"
+
+    def test_falls_back_without_snapshot(self, temp_db, snapshot_path):
+        cache = AliasCache(snapshot=SnapshotReader(snapshot_path))
+        assert cache.get("ex", temp_db) == "https://example.com"
+        assert cache.loaded_at is not None
+
+    def test_stale_snapshot_falls_back(self, temp_db, snapshot_path):
+        """Test that a snapshot not recompiled after a write (e.g. a failed compile) is not served."""
+        compile_snapshot(temp_db, snapshot_path)
+        cache = AliasCache(snapshot=SnapshotReader(snapshot_path))
+        assert cache.get("ex", temp_db) == "https://example.com"
+        data.delete_alias("ex", temp_db)
+        assert cache.snapshot.current(temp_db) is None
+        assert cache.get("ex", temp_db) is None
+
+    def test_older_compile_swapped_in_last_is_not_served(self, temp_db, snapshot_path, tmp_path):
+        """Test that an out-of-order replace by an older compile is rejected."""
+        older_path = str(tmp_path / "older.snap")
+        compile_snapshot(temp_db, older_path)
+        data.update_alias("ex", "https://changed.example", temp_db)
+        compile_snapshot(temp_db, snapshot_path)
+        cache = AliasCache(snapshot=SnapshotReader(snapshot_path, check_interval=0))
+        assert cache.snapshot.current(temp_db) is not None
+        os.replace(older_path, snapshot_path)
+        assert cache.snapshot.current(temp_db) is None
+        assert cache.get("ex", temp_db) == "https://changed.example"
@@ -0,0 +1,96 @@
+"""Tests for store.py - compact alias store."""
+
+import pytest
+
+from tiny_redirect import data
+from tiny_redirect.cache import AliasCache
+from tiny_redirect.store import CompactAliasStore
+
+
+class TestCompactAliasStore:
+    """Tests for lookups and iteration over the packed buffers."""
+
+    ENTRIES = [
+        ("wiki", "https://wiki.example"),
+        ("docs", "https://docs.example"),
+        ("mail", "https://wiki.example"),
+        ("zz", "https://z.example/{rest}"),
+    ]
+
+    def test_get(self):
+        store = CompactAliasStore(self.ENTRIES)
+        for alias, target in self.ENTRIES:
+            assert store.get(alias) == target
+        assert store.get("missing") is None
+        assert store.get("missing", "default") == "default"
+
+    def test_dict_protocol(self):
+        store = CompactAliasStore(self.ENTRIES)
+        assert len(store) == 4
+        assert "docs" in store
+        assert "nope" not in store
+        assert store["mail"] == "https://wiki.example"
+        with pytest.raises(KeyError):
+            store["nope"]
+
+    def test_items_sorted(self):
+        store = CompactAliasStore(self.ENTRIES)
+        assert list(store.items()) == sorted(self.ENTRIES)
+        assert list(store) == sorted(alias for alias, _ in self.ENTRIES)
+
+    def test_empty(self):
+        store = CompactAliasStore()
+        assert not store
+        assert store.get("x") is None
+
+    def test_duplicate_last_wins(self):
+        store = CompactAliasStore([("a", "1"), ("a", "2")])
+        assert len(store) == 1
+        assert store.get("a") == "2"
+
+    def test_duplicate_order_not_target_order(self):
+        store = CompactAliasStore([("b", "2"), ("a", "1"), ("a", "2")])
+        assert store.get("a") == "2"
+        store = CompactAliasStore([("b", "1"), ("a", "2"), ("a", "1")])
+        assert store.get("a") == "1"
+
+    def test_targets_deduplicated(self):
+        shared = "https://shared.example/" + "x" * 100
+        store = CompactAliasStore((f"a{i}", shared) for i in range(100))
+        assert len(store._target_blob) == len(shared)
+
+    def test_non_ascii(self):
+        store = CompactAliasStore([("café", "https://c.example"), ("cafe", "https://d.example")])
+        assert store.get("café") == "https://c.example"
+        assert store.get("cafe") == "https://d.example"
+
+
+class TestCompactAliasCache:
+    """Tests for AliasCache backed by the compact store."""
+
+    def test_lookup(self, temp_db):
+        data.add_alias("jira", "https://jira.example/{rest}", temp_db)
+        cache = AliasCache(compact=True)
+        assert cache.get("ex", temp_db) == "https://example.com"
+        assert cache.get("jira", temp_db) is None
+        assert cache.match_prefix("jira/A-1", temp_db) == ("https://jira.example/{rest}", "A-1")
+        assert dict(cache.redirects(temp_db).items()) == {
+            "ex": "https://example.com",
+            "jira": "https://jira.example/{rest}",
+        }
+
+    def test_case_insensitive(self, temp_db):
+        data.update_setting("case-insensitive", "True", temp_db)
+        cache = AliasCache(compact=True)
+        assert cache.get("EX", temp_db) == "https://example.com"
+
+    def test_case_insensitive_duplicates_match_dict_mode(self, temp_db):
+        data.add_alias("Wiki", "https://a.example", temp_db)
+        data.add_alias("wiki", "https://b.example", temp_db)
+        # A newer alias sharing the oldest row's target gives it the lower target index
+        data.add_alias("zzz", "https://a.example", temp_db)
+        data.update_setting("case-insensitive", "True", temp_db)
+        expected = data.find_alias("WIKI", temp_db, case_insensitive=True)
+        assert expected == "https://a.example"
+        assert AliasCache().get("WIKI", temp_db) == expected
+        assert AliasCache(compact=True).get("WIKI", temp_db) == expected
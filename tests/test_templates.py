@@ -0,0 +1,86 @@
+"""Tests for templates.py - template precompilation."""
+
+import marshal
+import shutil
+
+import bottle
+import pytest
+
+from tiny_redirect import templates
+from tiny_redirect.templates import (
+    BYTECODE_FILE,
+    DEFAULT_VIEWS_DIR,
+    build_bytecode,
+    load_bytecode,
+    template_names,
+    warm_templates,
+)
+
+
+@pytest.fixture
+def views_dir(tmp_path):
+    """Copy of the package views that tests may modify."""
+    target = tmp_path / "views"
+    shutil.copytree(DEFAULT_VIEWS_DIR, target)
+    registered = dict(bottle.TEMPLATES)
+    yield str(target)
+    bottle.TEMPLATES.clear()
+    bottle.TEMPLATES.update(registered)
+
+
+class TestWarmTemplates:
+    """Tests for compiling and registering the views at startup."""
+
+    def test_registers_every_view(self, views_dir):
+        lookup = [views_dir]
+        warm_templates(views_dir, lookup)
+        for name in template_names(views_dir):
+            assert "co" in bottle.TEMPLATES[(id(lookup), name)].__dict__
+
+    def test_rendering_matches_uncompiled(self, views_dir):
+        page_data = {"title": "TinyRedirect - Error", "error": "<boom>"}
+        expected = bottle.SimpleTemplate(name="error", lookup=[views_dir]).render(page_data)
+        lookup = [views_dir]
+        warm_templates(views_dir, lookup)
+        assert bottle.template("error", page_data, template_lookup=lookup) == expected
+        assert "&lt;boom&gt;" in expected
+
+    def test_pages_share_compiled_partials(self, views_dir):
+        lookup = [views_dir]
+        warm_templates(views_dir, lookup)
+        error_page = bottle.TEMPLATES[(id(lookup), "error")]
+        noalias_page = bottle.TEMPLATES[(id(lookup), "noalias")]
+        assert error_page.cache is noalias_page.cache
+        assert error_page.cache["header"] is bottle.TEMPLATES[(id(lookup), "header")]
+
+
+class TestBytecode:
+    """Tests for the optional prebuilt bytecode file."""
+
+    def test_build_and_reuse(self, views_dir):
+        build_bytecode(views_dir)
+        assert set(load_bytecode(f"{views_dir}/{BYTECODE_FILE}")) == set(template_names(views_dir))
+        assert warm_templates(views_dir, [views_dir]) == len(template_names(views_dir))
+
+    def test_changed_source_is_recompiled(self, views_dir):
+        build_bytecode(views_dir)
+        with open(f"{views_dir}/error.stpl", "a") as source:
+            source.write("<!-- changed -->\n")
+        lookup = [views_dir]
+        assert warm_templates(views_dir, lookup) == len(template_names(views_dir)) - 1
+        rendered = bottle.template("error", {"title": "t", "error": "e"}, template_lookup=lookup)
+        assert "<!-- changed -->" in rendered
+
+    def test_other_python_version_is_ignored(self, views_dir, monkeypatch):
+        build_bytecode(views_dir)
+        monkeypatch.setattr(templates, "_bytecode_tag", lambda: (b"other", bottle.__version__))
+        assert load_bytecode(f"{views_dir}/{BYTECODE_FILE}") == {}
+        assert warm_templates(views_dir, [views_dir]) == 0
+
+    def test_corrupt_file_is_ignored(self, views_dir):
+        with open(f"{views_dir}/{BYTECODE_FILE}", "wb") as bytecode_file:
+            bytecode_file.write(b"not marshal data")
+        assert load_bytecode(f"{views_dir}/{BYTECODE_FILE}") == {}
+        with open(f"{views_dir}/{BYTECODE_FILE}", "wb") as bytecode_file:
+            marshal.dump(["unexpected"], bytecode_file)
+        assert load_bytecode(f"{views_dir}/{BYTECODE_FILE}") == {}
@@ -0,0 +1,52 @@
+"""Tests for trie.py - path-forwarding alias matching."""
+
+from tiny_redirect.trie import PrefixTrie, expand_target, is_prefix_target
+
+
+class TestExpandTarget:
+    """Tests for filling {rest} templates."""
+
+    def test_is_prefix_target(self):
+        assert is_prefix_target("https://x.example/{rest}") is True
+        assert is_prefix_target("https://x.example/") is False
+
+    def test_rest_only(self):
+        assert expand_target("https://x.example/{rest}", "a/b") == "https://x.example/a/b"
+
+    def test_query_appended(self):
+        assert expand_target("https://x.example/{rest}", "a", "q=1") == "https://x.example/a?q=1"
+
+    def test_query_merged(self):
+        assert expand_target("https://x.example/{rest}?s=1", "a", "q=1") == "https://x.example/a?s=1&q=1"
+
+    def test_rest_reencoded(self):
+        assert expand_target("https://x.example/{rest}", "a b") == "https://x.example/a%20b"
+
+
+class TestPrefixTrie:
+    """Tests for longest-prefix matching."""
+
+    def test_no_match(self):
+        trie = PrefixTrie([("jira", "j/{rest}")])
+        assert trie.longest_match("wiki/page") is None
+
+    def test_match_with_rest(self):
+        trie = PrefixTrie([("jira", "j/{rest}")])
+        assert trie.longest_match("jira/ABC-1") == ("j/{rest}", "ABC-1")
+
+    def test_match_without_rest(self):
+        trie = PrefixTrie([("jira", "j/{rest}")])
+        assert trie.longest_match("jira") == ("j/{rest}", "")
+
+    def test_longest_match(self):
+        trie = PrefixTrie([("a", "1/{rest}"), ("a/b", "2/{rest}")])
+        assert trie.longest_match("a/b/c") == ("2/{rest}", "c")
+        assert trie.longest_match("a/c") == ("1/{rest}", "c")
+
+    def test_intermediate_node_without_target(self):
+        trie = PrefixTrie([("a/b/c", "3/{rest}")])
+        assert trie.longest_match("a/b") is None
+
+    def test_len(self):
+        trie = PrefixTrie([("a", "1"), ("a/b", "2"), ("a", "3")])
+        assert len(trie) == 2